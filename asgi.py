@@ -0,0 +1,8 @@
+"""ASGI entry point: the async POS reads (pos_api.py) in front of the Flask app.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+from app import app as flask_app
+from pos_api import create_asgi_app
+
+app = create_asgi_app(flask_app)
@@ -0,0 +1,334 @@
+"""Buffered, append-only audit log.
+
+Routes call record() after a change has been committed:
+
+    db.session.commit()
+    audit.record('update', 'product', product.id, f'Edited product {product.name}',
+                 changes=audit.diff(before, product))
+
+record() only appends to an in-process buffer. A background thread
+writes the buffer to audit_logs in one INSERT when it reaches
+AUDIT_BUFFER_SIZE entries or every AUDIT_FLUSH_INTERVAL seconds, so
+auditing adds almost nothing to request latency. Anything still
+buffered is flushed at exit; a hard crash can lose the last few
+seconds of entries.
+
+A batch that fails to insert is retried on the next flush, up to
+AUDIT_MAX_RETRIES times. After that its entries are written one at a
+time, and any entry that still fails goes to the dead-letter log, a
+JSON line per entry with the error (instance/audit_dead_letters.jsonl
+unless AUDIT_DEAD_LETTER_FILE is set). The buffer holds at most
+AUDIT_MAX_BUFFERED entries while the database is unreachable; older
+entries beyond that go to the dead-letter log too.
+
+Audit ids are time ordered (milliseconds since 2020 in the high bits),
+so "newest first" and time-range filters are primary key range scans,
+and keyset pagination is just `id < last_seen_id`. The middle bits are
+the process's worker slot, so two processes never issue the same id.
+Each process claims a free slot in audit_worker_slots when it first
+records an entry, keeps it with a heartbeat from the flusher thread,
+and frees it at exit; a slot whose heartbeat is AUDIT_WORKER_SLOT_STALE
+old is reused. Set AUDIT_WORKER_ID instead to give each process its
+slot by configuration. On Postgres the
+table is range partitioned on id, one partition per month, created on
+demand by the flusher. Rows can't be updated or deleted (triggers on
+both SQLite and Postgres); old months are dropped as partitions.
+"""
+import atexit
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_request_context
+from flask_login import current_user
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AuditLog, AuditWorkerSlot
+
+EPOCH = datetime(2020, 1, 1)
+_SEQUENCE_BITS = 12
+_WORKER_BITS = 10
+_HEARTBEAT_SECONDS = 60
+
+_buffer = []
+_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_dead_letter_lock = threading.Lock()
+_wakeup = threading.Event()
+_sequence = itertools.count()
+_flusher = {'pid': None, 'thread': None, 'app': None, 'worker': None, 'owner': None, 'failures': 0}
+_partitions = set()
+_slots = AuditWorkerSlot.__table__
+
+
+def _ms_since_epoch(moment):
+    return int((moment - EPOCH).total_seconds() * 1000)
+
+
+def make_id(moment):
+    """Time-ordered 63 bit id: ms since 2020 | worker slot | sequence"""
+    worker = _flusher['worker']
+    seq = next(_sequence) & ((1 << _SEQUENCE_BITS) - 1)
+    return (_ms_since_epoch(moment) << (_WORKER_BITS + _SEQUENCE_BITS)) | (worker << _SEQUENCE_BITS) | seq
+
+
+def id_floor(moment):
+    """Smallest id that can be issued at or after `moment`"""
+    return max(_ms_since_epoch(moment), 0) << (_WORKER_BITS + _SEQUENCE_BITS)
+
+
+def _month_start(moment, offset=0):
+    month = moment.month - 1 + offset
+    return datetime(moment.year + month // 12, month % 12 + 1, 1)
+
+
+def snapshot(obj, fields):
+    """Current values of `fields` on a model, for diff() after an edit"""
+    return {field: getattr(obj, field) for field in fields}
+
+
+def diff(before, obj):
+    """{field: [old, new]} for the fields in `before` that changed on obj"""
+    changes = {}
+    for field, old in before.items():
+        new = getattr(obj, field)
+        if old != new:
+            changes[field] = [old, new]
+    return changes
+
+
+def record(action, entity_type, entity_id, summary, changes=None, actor=None):
+    """Queue an audit entry. Call it after the change has been committed."""
+    if actor is None and has_request_context() and current_user.is_authenticated:
+        actor = current_user
+    app = current_app._get_current_object()
+    _ensure_flusher(app)
+    now = datetime.utcnow()
+    entry = {
+        'id': make_id(now),
+        'created_at': now,
+        'actor_id': actor.id if actor else None,
+        'actor_name': actor.username if actor else None,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'summary': summary[:255],
+        'changes': json.dumps(changes, default=str) if changes else None,
+    }
+    with _buffer_lock:
+        _buffer.append(entry)
+        overflow = _trim_buffer()
+        pending = len(_buffer)
+    _dead_letter(overflow, 'audit buffer full')
+    if pending >= app.config.get('AUDIT_BUFFER_SIZE', 100):
+        _wakeup.set()
+
+
+def _trim_buffer():
+    """Remove and return the oldest entries over AUDIT_MAX_BUFFERED. Call with _buffer_lock held."""
+    excess = len(_buffer) - current_app.config.get('AUDIT_MAX_BUFFERED', 10000)
+    if excess <= 0:
+        return []
+    overflow = _buffer[:excess]
+    del _buffer[:excess]
+    return overflow
+
+
+def _dead_letter(entries, error):
+    """Append entries that couldn't be written to the dead-letter log"""
+    if not entries:
+        return
+    path = current_app.config.get('AUDIT_DEAD_LETTER_FILE') or \
+        os.path.join(current_app.instance_path, 'audit_dead_letters.jsonl')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _dead_letter_lock, open(path, 'a') as f:
+        for entry in entries:
+            f.write(json.dumps({**entry, 'error': str(error)}, default=str) + '\n')
+    current_app.logger.error('Moved %d audit entries to %s: %s', len(entries), path, error)
+
+
+def _ensure_partitions(conn, entries):
+    if conn.dialect.name != 'postgresql':
+        return
+    for entry in entries:
+        start = _month_start(entry['created_at'])
+        if start in _partitions:
+            continue
+        end = _month_start(start, 1)
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS audit_logs_{start:%Y_%m} PARTITION OF audit_logs '
+            f'FOR VALUES FROM ({id_floor(start)}) TO ({id_floor(end)})'
+        ))
+        _partitions.add(start)
+
+
+def _insert(entries):
+    with db.engine.begin() as conn:
+        _ensure_partitions(conn, entries)
+        conn.execute(insert(AuditLog.__table__), entries)
+
+
+def flush():
+    """Write everything buffered so far. Returns the number of entries written.
+
+    Raises if the batch failed and will be retried.
+    """
+    with _flush_lock:
+        with _buffer_lock:
+            entries = _buffer[:]
+            del _buffer[:]
+        if not entries:
+            return 0
+        try:
+            _insert(entries)
+        except Exception as e:
+            _flusher['failures'] += 1
+            if _flusher['failures'] < current_app.config.get('AUDIT_MAX_RETRIES', 5):
+                # Put them back for the next attempt
+                with _buffer_lock:
+                    _buffer[:0] = entries
+                    overflow = _trim_buffer()
+                _dead_letter(overflow, e)
+                raise
+        else:
+            _flusher['failures'] = 0
+            return len(entries)
+
+        # Out of retries: write the rows that will go in, dead-letter the rest
+        _flusher['failures'] = 0
+        written = 0
+        for entry in entries:
+            try:
+                _insert([entry])
+                written += 1
+            except Exception as e:
+                _dead_letter([entry], e)
+        return written
+
+
+def _claim_worker_slot(app):
+    """This process's worker slot: AUDIT_WORKER_ID, or a free or stale row of audit_worker_slots"""
+    configured = app.config.get('AUDIT_WORKER_ID')
+    if configured is not None:
+        if not 0 <= configured < (1 << _WORKER_BITS):
+            raise ValueError(f'AUDIT_WORKER_ID must be between 0 and {(1 << _WORKER_BITS) - 1}')
+        return configured, None
+
+    owner = f'{socket.gethostname()}:{os.getpid()}'[:80]
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=app.config.get('AUDIT_WORKER_SLOT_STALE', 600))
+    with db.engine.connect() as conn:
+        taken = dict(conn.execute(select(_slots.c.slot, _slots.c.heartbeat_at)).all())
+    free = [slot for slot in range(1 << _WORKER_BITS) if slot not in taken]
+    expired = sorted((slot for slot, heartbeat_at in taken.items() if heartbeat_at < stale), key=taken.get)
+    for slot in free + expired:
+        with db.engine.begin() as conn:
+            if slot in taken:
+                # Only if nobody else has reclaimed it since we looked
+                claimed = conn.execute(update(_slots).where(
+                    _slots.c.slot == slot, _slots.c.heartbeat_at == taken[slot]
+                ).values(owner=owner, heartbeat_at=now)).rowcount
+            else:
+                try:
+                    conn.execute(insert(_slots).values(slot=slot, owner=owner, heartbeat_at=now))
+                    claimed = True
+                except IntegrityError:
+                    claimed = False
+        if claimed:
+            return slot, owner
+    raise RuntimeError('Every audit worker slot is in use; set AUDIT_WORKER_ID for this process')
+
+
+def _heartbeat(app):
+    """Keep this process's slot, or claim another if it was reused while we were stalled"""
+    if _flusher['owner'] is None:
+        return
+    with db.engine.begin() as conn:
+        kept = conn.execute(update(_slots).where(
+            _slots.c.slot == _flusher['worker'], _slots.c.owner == _flusher['owner']
+        ).values(heartbeat_at=datetime.utcnow())).rowcount
+    if not kept:
+        app.logger.warning('Audit worker slot %d was reused; claiming another', _flusher['worker'])
+        worker, owner = _claim_worker_slot(app)
+        _flusher.update(worker=worker, owner=owner)
+
+
+def _release_worker_slot():
+    if _flusher['owner'] is None:
+        return
+    with db.engine.begin() as conn:
+        conn.execute(delete(_slots).where(
+            _slots.c.slot == _flusher['worker'], _slots.c.owner == _flusher['owner']
+        ))
+
+
+def _flush_loop(app):
+    interval = app.config.get('AUDIT_FLUSH_INTERVAL', 2)
+    next_heartbeat = time.monotonic() + _HEARTBEAT_SECONDS
+    while True:
+        _wakeup.wait(interval)
+        _wakeup.clear()
+        with app.app_context():
+            try:
+                flush()
+            except Exception:
+                app.logger.exception('Audit log flush failed')
+            if time.monotonic() >= next_heartbeat:
+                try:
+                    _heartbeat(app)
+                    next_heartbeat = time.monotonic() + _HEARTBEAT_SECONDS
+                except Exception:
+                    app.logger.exception('Audit worker slot heartbeat failed')
+
+
+def _ensure_flusher(app):
+    # Started lazily so forked workers each get their own slot and thread
+    if _flusher['pid'] == os.getpid():
+        return
+    with _buffer_lock:
+        if _flusher['pid'] == os.getpid():
+            return
+        worker, owner = _claim_worker_slot(app)
+        thread = threading.Thread(target=_flush_loop, args=(app,), name='audit-flusher', daemon=True)
+        thread.start()
+        _flusher.update(pid=os.getpid(), thread=thread, app=app, worker=worker, owner=owner, failures=0)
+
+
+def _flush_at_exit():
+    app = _flusher['app']
+    if app is not None and _flusher['pid'] == os.getpid():
+        with app.app_context():
+            flush()
+            _release_worker_slot()
+
+
+atexit.register(_flush_at_exit)
+
+
+def query_entries(actor_id=None, entity_type=None, entity_id=None,
+                  start=None, end=None, before_id=None, limit=50):
+    """One page of entries, newest first, using keyset pagination on id.
+
+    `start`/`end` are dates (inclusive). Returns (entries, next_before_id).
+    """
+    query = AuditLog.query
+    if actor_id:
+        query = query.filter(AuditLog.actor_id == actor_id)
+    if entity_type:
+        query = query.filter(AuditLog.entity_type == entity_type)
+    if entity_id:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if start:
+        query = query.filter(AuditLog.id >= id_floor(datetime.combine(start, datetime.min.time())))
+    if end:
+        query = query.filter(AuditLog.id < id_floor(datetime.combine(end, datetime.min.time()) + timedelta(days=1)))
+    if before_id:
+        query = query.filter(AuditLog.id < before_id)
+    entries = query.order_by(AuditLog.id.desc()).limit(limit + 1).all()
+    next_cursor = entries[limit - 1].id if len(entries) > limit else None
+    return entries[:limit], next_cursor
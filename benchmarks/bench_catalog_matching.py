@@ -0,0 +1,114 @@
+"""Time a full supplier catalog rematch.
+
+Runs in-process against a throwaway SQLite database filled with
+synthetic products and supplier catalog lines. A third of the lines
+reuse a product SKU with different punctuation or case. A third have a
+product's name reworded: tokens shuffled, a size unit split off and an
+extra word added. The rest are unrelated items:
+
+    python benchmarks/bench_catalog_matching.py --products 60000 --lines 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+UNITS = ['ml', 'l', 'g', 'kg', 'pcs']
+EXTRA = ['pack', 'new', 'promo', 'value', 'original']
+
+
+def words(rng, count, length):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return list({''.join(rng.choice(letters) for _ in range(length)) for _ in range(count)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=60000)
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--suppliers', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+
+    from sqlalchemy import insert
+    from app import app, init_db
+    from models import db, Product, Category, Supplier, SupplierProduct, CatalogMatch
+    import catalog_matching
+
+    rng = random.Random(args.seed)
+    brands, kinds, flavours = words(rng, 3000, 7), words(rng, 800, 6), words(rng, 400, 5)
+
+    init_db()
+    with app.app_context():
+        category_id = Category.query.first().id
+        db.session.execute(insert(Supplier.__table__), [
+            {'name': f'Bench Supplier {i}', 'email': f'bench{i}@example.com', 'is_active': True}
+            for i in range(args.suppliers)
+        ])
+        supplier_ids = [s.id for s in Supplier.query]
+
+        products = []
+        for i in range(args.products):
+            size = f'{rng.choice([100, 250, 400, 500, 750, 1000])}{rng.choice(UNITS)}'
+            name = f'{rng.choice(brands)} {rng.choice(flavours)} {rng.choice(kinds)} {size}'
+            products.append({'name': name, 'sku': f'SKU-{i:06d}', 'cost_price': 100.0, 'selling_price': 130.0,
+                             'quantity': 0, 'reorder_level': 10, 'category_id': category_id,
+                             'supplier_id': supplier_ids[0], 'is_active': True})
+        db.session.execute(insert(Product.__table__), products)
+        product_ids = [row.id for row in db.session.query(Product.id).order_by(Product.id)]
+
+        lines, expected, seen = [], {}, set()
+        for i in range(args.lines):
+            kind = i % 3
+            index = rng.randrange(args.products)
+            supplier_id = supplier_ids[i % len(supplier_ids)]
+            if kind == 0 and (supplier_id, index) in seen:
+                kind = 2  # SKUs are unique per supplier
+            if kind == 0:
+                seen.add((supplier_id, index))
+                sku, name = products[index]['sku'].lower().replace('-', ' '), products[index]['name']
+            elif kind == 1:
+                tokens = products[index]['name'].split()
+                size = tokens.pop()
+                digits = size.rstrip('abcdefghijklmnopqrstuvwxyz')
+                tokens += [digits, size[len(digits):], rng.choice(EXTRA)]
+                rng.shuffle(tokens)
+                sku, name = f'S{i}', ' '.join(tokens).title()
+            else:
+                sku, name = f'S{i}', f'{rng.choice(kinds)} {rng.choice(brands)}ish {rng.choice(EXTRA)}'
+            lines.append({'name': name, 'sku': sku, 'price': round(rng.uniform(80, 120), 2),
+                          'category_id': category_id, 'supplier_id': supplier_id})
+            if kind < 2:
+                expected[i] = product_ids[index]
+        for start in range(0, len(lines), 50000):
+            db.session.execute(insert(SupplierProduct.__table__), lines[start:start + 50000])
+        db.session.commit()
+        line_ids = [row.id for row in db.session.query(SupplierProduct.id).order_by(SupplierProduct.id)]
+
+        summary = catalog_matching.rematch_all()
+        links = dict(db.session.query(CatalogMatch.supplier_product_id, CatalogMatch.product_id))
+        found = sum(1 for i, product_id in expected.items() if links.get(line_ids[i]) == product_id)
+        wrong = sum(1 for i, line_id in enumerate(line_ids) if line_id in links and expected.get(i) != links[line_id])
+
+        start = time.perf_counter()
+        catalog_matching.rematch(line_ids[:100])
+        db.session.commit()
+        incremental = time.perf_counter() - start
+
+    print(f"{summary['lines']} catalog lines x {summary['products']} products")
+    print(f"full rematch:        {summary['seconds']:8.1f} s  (index {summary['index_seconds']:.1f} s, "
+          f"{summary['lines'] / summary['seconds']:,.0f} lines/s)")
+    print(f"incremental, 100:    {incremental * 1000:8.1f} ms")
+    print(f"linked {summary['linked']}, expected links found {found}/{len(expected)}, unexpected links {wrong}")
+
+
+if __name__ == '__main__':
+    main()
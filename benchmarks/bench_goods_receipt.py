@@ -0,0 +1,65 @@
+"""Time posting a purchase order delivery into stock.
+
+Runs in-process against a throwaway SQLite database:
+
+    python benchmarks/bench_goods_receipt.py --lines 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=500)
+    parser.add_argument('--partial', action='store_true', help='Receive half of each line.')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+
+    from app import app, init_db
+    from models import db, Product, Category, Supplier, StockMovement
+
+    init_db()
+    with app.app_context():
+        category = Category.query.first()
+        supplier = Supplier.query.first()
+        db.session.add_all([Product(
+            name=f'Bench Product {i}', sku=f'BENCH-{i:05d}', cost_price=10, selling_price=15,
+            quantity=0, reorder_level=10, category_id=category.id, supplier_id=supplier.id
+        ) for i in range(args.lines)])
+        db.session.commit()
+        product_ids = [p.id for p in Product.query.order_by(Product.id)]
+        supplier_id = supplier.id
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'manager', 'password': 'manager123'})
+    items = [{'product_id': pid, 'quantity': 20, 'unit_price': 10} for pid in product_ids]
+    resp = client.post('/manager/purchase-orders/add', data={'supplier_id': supplier_id, 'items': json.dumps(items)})
+    assert resp.json['success'], resp.json
+    order_id = resp.json['order_id']
+    # Only approved, ordered or partial orders can be received
+    resp = client.post(f'/manager/purchase-orders/update-status/{order_id}', data={'status': 'ordered'})
+    assert resp.json['success'], resp.json
+
+    body = {'items': [{'product_id': pid, 'quantity': 10} for pid in product_ids]} if args.partial else {}
+    start = time.perf_counter()
+    resp = client.post(f'/manager/purchase-orders/{order_id}/receive', json=body)
+    elapsed = time.perf_counter() - start
+    assert resp.json['success'], resp.json
+
+    with app.app_context():
+        movements = StockMovement.query.filter_by(reference_type='purchase_order', reference_id=order_id).count()
+    print(f'{args.lines} lines received ({resp.json["status"]}), {movements} stock movements')
+    print(f'receive request: {elapsed * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
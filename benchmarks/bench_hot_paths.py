@@ -0,0 +1,279 @@
+"""Hot-path microbenchmarks with regression gates.
+
+Runs the hottest request paths in-process, through the test client,
+against a fixed synthetic dataset (datagen.generate() with DATASET):
+- process_sale with baskets of 1, 5 and 20 lines
+- search_products, manager_dashboard, manage_reports,
+  get_reports_data, manager_suppliers_data and get_notifications
+- load_user, called directly as Flask-Login does on every request
+
+Each case is called once to warm up (fragment and template caches,
+statement cache). After that it records:
+- wall_ms: fastest of --runs calls, which other load on the machine
+  disturbs least; wall_ms_median and wall_ms_p90 are kept alongside
+- queries: SQL statements one call runs, counted on this thread only
+- peak_kb: peak Python allocation during one call (tracemalloc)
+
+Results are compared with benchmarks/hot_paths_baseline.json. A metric
+that is worse than its baseline by more than the file's tolerance for
+that metric is a regression, and the run exits with status 1. The
+tolerances live in that file, as fractions of the baseline:
+- wall_ms: 50%, loose enough for a shared CI runner. Tighten it on
+  quiet hardware.
+- peak_kb: 20%
+- queries: none, so one extra statement per call is a regression
+
+A case over its wall_ms limit is measured up to twice more and keeps
+its fastest time, so a burst of load elsewhere doesn't fail the gate.
+
+    python benchmarks/bench_hot_paths.py --out results.json
+    python benchmarks/bench_hot_paths.py --update-baseline
+
+The JSON written by --out records the commit, the interpreter and every
+metric, so results can be collected and graphed over time. Wall times
+depend on the machine. Refresh the baseline on the machine that runs
+the gate, or gate only the portable metrics with --gate queries,peak_kb.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE = os.path.join(ROOT, 'benchmarks', 'hot_paths_baseline.json')
+DATASET = {'products': 2000, 'categories': 20, 'suppliers': 20, 'stores': 1, 'cashiers': 3, 'managers': 1,
+           'catalog_extra': 50, 'days': 90, 'sales_per_day': 300, 'seed': 1}
+PASSWORD = 'password123'
+ACCOUNTS = {'cashier': ('gen-cashier-000', PASSWORD), 'manager': ('gen-manager-000', PASSWORD),
+            'admin': ('admin', 'admin123')}
+BASKET_SIZES = (1, 5, 20)
+METRICS = ('wall_ms', 'queries', 'peak_kb')
+DEFAULT_TOLERANCE = {'wall_ms': 0.5, 'queries': 0, 'peak_kb': 0.2}
+CONFIRM_ATTEMPTS = 2
+
+
+class QueryCounter:
+    """before_cursor_execute listener counting statements run by one thread"""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        # Audit and other background flushers run on their own threads
+        if threading.get_ident() == self.thread:
+            self.count += 1
+
+
+def build_cases(app, clients):
+    from app import load_user
+    from models import db, Product, StoreStock, User, MAIN_STORE_ID
+
+    with app.app_context():
+        # Best-stocked products, so benchmark sales never push one to low or out
+        stocked = db.session.query(Product.id, Product.name, Product.selling_price)\
+            .join(StoreStock, StoreStock.product_id == Product.id)\
+            .filter(StoreStock.store_id == MAIN_STORE_ID)\
+            .order_by(StoreStock.quantity.desc()).limit(max(BASKET_SIZES)).all()
+        manager_id = User.query.filter_by(username=ACCOUNTS['manager'][0]).one().id
+
+    def request(role, path, method='GET', body=None):
+        def call():
+            response = clients[role].open(path, method=method, json=body, headers={'Accept-Encoding': 'identity'})
+            response.get_data()
+            assert response.status_code == 200, (path, response.status_code)
+            if response.is_json and response.get_json().get('success') is False:
+                raise AssertionError((path, response.get_json().get('message')))
+        return call
+
+    def sale(size):
+        return {'items': [{'id': product_id, 'name': name, 'price': price, 'quantity': 1}
+                          for product_id, name, price in stocked[:size]], 'payment_method': 'cash'}
+
+    def call_load_user():
+        with app.app_context():
+            load_user(str(manager_id))
+            db.session.remove()
+
+    cases = {f'process_sale[{size}]': request('cashier', '/cashier/process-sale', 'POST', sale(size))
+             for size in BASKET_SIZES}
+    cases.update({
+        'search_products': request('cashier', '/cashier/search-products?q=mi'),
+        'manager_dashboard': request('manager', '/manager/dashboard'),
+        'manage_reports': request('manager', '/manager/reports'),
+        'get_reports_data': request('admin', '/admin/reports/data'),
+        'manager_suppliers_data': request('manager', '/manager/suppliers/json'),
+        'get_notifications': request('manager', '/notifications'),
+        'load_user': call_load_user,
+    })
+    return cases
+
+
+def measure(call, counter, runs):
+    call()
+    times, queries = [], []
+    for _ in range(runs):
+        before = counter.count
+        started = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - started)
+        queries.append(counter.count - before)
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times.sort()
+    return {
+        'wall_ms': round(times[0] * 1000, 3),
+        'wall_ms_median': round(statistics.median(times) * 1000, 3),
+        'wall_ms_p90': round(times[int(len(times) * 0.9)] * 1000, 3),
+        'queries': int(statistics.median(queries)),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, gated):
+    """Regressions of `gated` metrics beyond the baseline's tolerances"""
+    tolerance = {**DEFAULT_TOLERANCE, **baseline.get('tolerance', {})}
+    regressions = []
+    for case, metrics in results.items():
+        base = baseline.get('cases', {}).get(case)
+        if base is None:
+            continue
+        for metric in gated:
+            limit = base[metric] * (1 + tolerance[metric])
+            if metrics[metric] > limit:
+                regressions.append({'case': case, 'metric': metric, 'baseline': base[metric],
+                                    'value': metrics[metric], 'tolerance': tolerance[metric]})
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='Timed calls per case.')
+    parser.add_argument('--cases', help='Comma-separated case names (default: all).')
+    parser.add_argument('--gate', default=','.join(METRICS), help='Metrics that fail the run when they regress.')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='Write these results as the new baseline.')
+    parser.add_argument('--out', help='Write the results as JSON here.')
+    args = parser.parse_args()
+    gated = [metric for metric in args.gate.split(',') if metric]
+    if set(gated) - set(METRICS):
+        parser.error(f'--gate takes {", ".join(METRICS)}')
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import app, init_db
+    import datagen
+
+    init_db()
+    # The slow query log runs an EXPLAIN on slow statements, which would skew the query counts
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+    with app.app_context():
+        datagen.generate(password=PASSWORD, **DATASET)
+
+    clients = {}
+    for role, (username, password) in ACCOUNTS.items():
+        clients[role] = app.test_client()
+        response = clients[role].post('/login', data={'username': username, 'password': password})
+        assert response.status_code == 302, (username, response.status_code)
+
+    cases = build_cases(app, clients)
+    if args.cases:
+        unknown = set(args.cases.split(',')) - set(cases)
+        if unknown:
+            parser.error(f'unknown cases: {", ".join(sorted(unknown))}')
+        cases = {name: call for name, call in cases.items() if name in args.cases.split(',')}
+
+    counter = QueryCounter()
+    event.listen(Engine, 'before_cursor_execute', counter)
+    results = {}
+    print(f'{"case":<26}{"wall ms":>10}{"median":>10}{"p90":>10}{"queries":>9}{"peak KB":>10}', file=sys.stderr)
+    for name, call in cases.items():
+        results[name] = measure(call, counter, args.runs)
+        stats = results[name]
+        print(f'{name:<26}{stats["wall_ms"]:>10.2f}{stats["wall_ms_median"]:>10.2f}{stats["wall_ms_p90"]:>10.2f}'
+              f'{stats["queries"]:>9}'
+              f'{stats["peak_kb"]:>10.1f}', file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if baseline and baseline.get('dataset') != DATASET:
+        print('baseline was recorded on a different dataset; not comparing', file=sys.stderr)
+        baseline = {}
+    regressions = [] if args.update_baseline else compare(results, baseline, gated)
+    # A slow wall time is measured again before it counts: a burst of load elsewhere shouldn't fail the gate
+    for _ in range(CONFIRM_ATTEMPTS):
+        slow = {regression['case'] for regression in regressions if regression['metric'] == 'wall_ms'}
+        if not slow:
+            break
+        for name in slow:
+            retry = measure(cases[name], counter, args.runs)
+            if retry['wall_ms'] < results[name]['wall_ms']:
+                results[name].update({key: retry[key] for key in ('wall_ms', 'wall_ms_median', 'wall_ms_p90')})
+            print(f'{name:<26}{retry["wall_ms"]:>10.2f}  (remeasured)', file=sys.stderr)
+        regressions = compare(results, baseline, gated)
+
+    report = {
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': DATASET,
+        'runs': args.runs,
+        'results': results,
+        'baseline': os.path.relpath(args.baseline, ROOT) if baseline else None,
+        'regressions': regressions,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        cases = {**baseline.get('cases', {}), **results}
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'recorded_at': report['recorded_at'],
+                'commit': report['commit'],
+                'python': report['python'],
+                'dataset': DATASET,
+                'tolerance': baseline.get('tolerance', DEFAULT_TOLERANCE),
+                'cases': {name: {metric: cases[name][metric] for metric in METRICS} for name in sorted(cases)},
+            }, f, indent=2)
+            f.write('\n')
+        print(f'Baseline written to {os.path.relpath(args.baseline, ROOT)}', file=sys.stderr)
+        return
+
+    for regression in regressions:
+        print(f'REGRESSION {regression["case"]} {regression["metric"]}: {regression["value"]} '
+              f'(baseline {regression["baseline"]}, tolerance {regression["tolerance"]:.0%})', file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+    if baseline:
+        print(f'No regressions against {os.path.relpath(args.baseline, ROOT)}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
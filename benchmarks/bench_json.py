@@ -0,0 +1,149 @@
+"""Measure JSON encoding CPU and bytes on the wire for the large JSON endpoints.
+
+Seeds a throwaway SQLite database with products, supplier catalogs,
+notifications and sales. For each endpoint it reports:
+- encode: CPU time to serialize the endpoint's payload with the stdlib
+  provider and with OrjsonProvider (median of --rounds)
+- request: CPU time for the whole request with each provider,
+  uncompressed
+- bytes: body size as sent with no compression, gzip and brotli
+- peak: largest Python allocation while serving the request (tracemalloc),
+  which shows whether the body was built in memory or streamed
+
+    python benchmarks/bench_json.py --products 20000 --catalog 20000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ENDPOINTS = [
+    ('cashier', '/cashier/products'),
+    ('manager', '/manager/suppliers/json'),
+    ('manager', '/notifications'),
+    ('admin', '/admin/reports/data'),
+]
+PASSWORDS = {'admin': 'admin123', 'manager': 'manager123', 'cashier': 'cashier123'}
+
+
+def seed(products, suppliers, catalog, notifications, sales):
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from app import app, init_db
+    from models import db, MAIN_STORE_ID, Notification, Product, Sale, SaleItem, StoreStock, Supplier, SupplierProduct, User
+
+    init_db()
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(insert(Product.__table__), [{
+            'name': f'Product {i} 500ml', 'sku': f'JSON-{i:06d}', 'cost_price': 10.0, 'selling_price': 14.5,
+            'quantity': 50, 'reorder_level': 10, 'stock_status': 'low' if i % 20 == 0 else 'ok',
+            'category_id': 1 + i % 3, 'supplier_id': 1, 'is_active': True,
+            'description': 'Sample product description for the POS catalog',
+        } for i in range(products)])
+        db.session.execute(insert(StoreStock.__table__), [{
+            'store_id': MAIN_STORE_ID, 'product_id': product_id, 'quantity': 50, 'stock_status': 'ok',
+        } for (product_id,) in db.session.query(Product.id)])
+        db.session.execute(insert(Supplier.__table__), [{
+            'name': f'Supplier {i} Ltd', 'contact_person': 'Jane Doe', 'email': f'supplier{i}@bench.test',
+            'phone': '+254700000000', 'address': 'Nairobi, Kenya', 'is_active': True,
+        } for i in range(suppliers)])
+        supplier_ids = [supplier_id for (supplier_id,) in db.session.query(Supplier.id)]
+        db.session.execute(insert(SupplierProduct.__table__), [{
+            'supplier_id': supplier_ids[i % len(supplier_ids)], 'name': f'Catalog item {i}', 'sku': f'CAT-{i:06d}',
+            'price': 9.75, 'category_id': 1 + i % 3, 'description': 'Supplier catalog line', 'unit': 'piece',
+            'created_at': now,
+        } for i in range(catalog)])
+        for user in User.query.all():
+            db.session.execute(insert(Notification.__table__), [{
+                'user_id': user.id, 'title': f'Low stock {i}', 'message': f'Product {i} is running low',
+                'type': 'low_stock', 'is_read': False, 'created_at': now, 'related_type': 'product',
+                'related_id': i + 1,
+            } for i in range(notifications)])
+        cashier = User.query.filter_by(role='cashier').first()
+        for i in range(sales):
+            sale = Sale(sale_number=f'JSON-SALE-{i:06d}', total_amount=29.0, payment_method='cash',
+                        cashier_id=cashier.id, sale_date=now - timedelta(days=i % 30), store_id=MAIN_STORE_ID)
+            db.session.add(sale)
+            db.session.flush()
+            db.session.execute(insert(SaleItem.__table__), [{
+                'sale_id': sale.id, 'product_id': 1 + (i + k) % products, 'quantity': 1, 'unit_price': 14.5,
+                'subtotal': 14.5,
+            } for k in range(2)])
+        db.session.commit()
+
+
+def median_cpu(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.process_time()
+        fn()
+        samples.append(time.process_time() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--suppliers', type=int, default=50)
+    parser.add_argument('--catalog', type=int, default=20000)
+    parser.add_argument('--notifications', type=int, default=50)
+    parser.add_argument('--sales', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    seed(args.products, args.suppliers, args.catalog, args.notifications, args.sales)
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import app
+    from json_provider import OrjsonProvider
+    import compression
+
+    providers = {'json': DefaultJSONProvider(app), 'orjson': OrjsonProvider(app)}
+    clients = {}
+    for role, password in PASSWORDS.items():
+        clients[role] = app.test_client()
+        clients[role].post('/login', data={'username': role, 'password': password})
+
+    def get(role, url, encoding='identity'):
+        response = clients[role].get(url, headers={'Accept-Encoding': encoding})
+        assert response.status_code == 200, (url, response.status_code)
+        return response.get_data()
+
+    print(f'brotli: {"yes" if compression.brotli else "not installed"}')
+    print(f'{"endpoint":<26}{"encode json":>12}{"orjson":>9}{"request json":>14}{"orjson":>9}'
+          f'{"raw":>11}{"gzip":>10}{"br":>10}{"peak":>10}')
+    for role, url in ENDPOINTS:
+        app.json = providers['json']
+        payload = app.json.loads(get(role, url))
+        with app.app_context():
+            encode = {name: median_cpu(lambda: provider.dumps(payload, separators=(',', ':')), args.rounds)
+                      for name, provider in providers.items()}
+        request_cpu = {}
+        for name, provider in providers.items():
+            app.json = provider
+            get(role, url)  # warm up
+            request_cpu[name] = median_cpu(lambda: get(role, url), args.rounds)
+
+        sizes = {encoding: len(get(role, url, encoding)) for encoding in ('identity', 'gzip', 'br')}
+        tracemalloc.start()
+        get(role, url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f'{url:<26}{encode["json"] * 1000:>9.1f} ms{encode["orjson"] * 1000:>6.1f} ms'
+              f'{request_cpu["json"] * 1000:>11.1f} ms{request_cpu["orjson"] * 1000:>6.1f} ms'
+              f'{sizes["identity"] / 1024:>8.1f} KB{sizes["gzip"] / 1024:>7.1f} KB{sizes["br"] / 1024:>7.1f} KB'
+              f'{peak / 1024 / 1024:>7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Measure the request overhead of the metrics middleware.
+
+Times the same cheap request with METRICS_ENABLED on and off, alternating
+rounds so both see the same machine noise:
+
+    python benchmarks/bench_metrics_overhead.py --requests 2000 --rounds 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class FakeConnection:
+    info = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+
+    from app import app, init_db
+    import metrics
+    import stores
+    from models import db, Product, Category, Supplier, MAIN_STORE_ID
+
+    init_db()
+    with app.app_context():
+        category = Category.query.first()
+        supplier = Supplier.query.first()
+        products = [Product(
+            name=f'Milk {i}', sku=f'MILK-{i:04d}', cost_price=10, selling_price=15,
+            quantity=0, category_id=category.id, supplier_id=supplier.id
+        ) for i in range(200)]
+        db.session.add_all(products)
+        db.session.flush()
+        for product in products:
+            stores.adjust(MAIN_STORE_ID, product, 100)
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'cashier', 'password': 'cashier123'})
+
+    def run():
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.get('/cashier/search-products?q=milk')
+        return (time.perf_counter() - start) / args.requests
+
+    run()  # warm up
+    timings = {True: [], False: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            app.config['METRICS_ENABLED'] = enabled
+            timings[enabled].append(run())
+
+    off = statistics.median(timings[False])
+    on = statistics.median(timings[True])
+
+    # End to end numbers are noisy at this scale, so also time the hooks
+    # themselves: one request's worth of middleware plus two SQL statements.
+    app.config['METRICS_ENABLED'] = True
+    response = app.response_class('x' * 1000)
+    with app.test_request_context('/cashier/search-products?q=milk'):
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            metrics._before_request()
+            for _ in range(2):
+                metrics._before_cursor_execute(FakeConnection, None, None, None, None, False)
+                metrics._after_cursor_execute(FakeConnection, None, None, None, None, False)
+            metrics._after_request(response)
+            metrics._teardown_request(None)
+        hooks = (time.perf_counter() - start) / args.requests
+
+    print(f'{args.requests} requests x {args.rounds} rounds of GET /cashier/search-products')
+    print(f'metrics off: {off * 1e6:8.1f} us/request')
+    print(f'metrics on:  {on * 1e6:8.1f} us/request')
+    print(f'end to end:  {(on - off) * 1e6:8.1f} us/request ({(on - off) / off * 100:.2f}%)')
+    print(f'hook cost:   {hooks * 1e6:8.1f} us/request ({hooks / off * 100:.2f}% of a request)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Compare the async POS API with gunicorn sync workers under concurrent terminals.
+
+Starts two servers against the same throwaway SQLite database:
+- gunicorn with --workers sync workers (app:app)
+- one uvicorn process (asgi:app)
+
+Each then gets the same load at every --concurrency level. Every
+simulated terminal is a coroutine on one connection per request. It
+sends POS reads (product search, and sales history every fifth request)
+for --seconds, with a signed-in cashier's session cookie:
+
+    python benchmarks/bench_pos_api.py --workers 4 --concurrency 10,100,1000,3000
+
+Reports requests/s, p50/p99 latency and failed requests (refused, reset
+or timed out) per server and level. Needs a high open-file limit for
+large concurrency levels; the script raises its soft limit to the hard
+limit.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORDS = ['milk', 'bread', 'sugar', 'rice', 'soap', 'tea', 'salt', 'flour', 'oil', 'juice']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(products):
+    from sqlalchemy import insert
+    from app import app, init_db
+    from models import db, Category, Product, StoreStock, Supplier, MAIN_STORE_ID
+
+    init_db()
+    with app.app_context():
+        category_id = Category.query.first().id
+        supplier_id = Supplier.query.first().id
+        db.session.execute(insert(Product.__table__), [{
+            'name': f'{WORDS[i % len(WORDS)]} {i}', 'sku': f'POS-{i:06d}', 'cost_price': 10.0,
+            'selling_price': 15.0, 'quantity': 100, 'reorder_level': 10, 'stock_status': 'ok',
+            'category_id': category_id, 'supplier_id': supplier_id, 'is_active': True,
+        } for i in range(products)])
+        db.session.execute(insert(StoreStock.__table__), [{
+            'store_id': MAIN_STORE_ID, 'product_id': product_id, 'quantity': 100, 'stock_status': 'ok',
+        } for (product_id,) in db.session.query(Product.id)])
+        db.session.commit()
+
+
+def start(command, env, port):
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    while True:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1).read()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f'{command[2]} exited')
+            time.sleep(0.1)
+
+
+def session_cookie(port):
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    body = urllib.parse.urlencode({'username': 'cashier', 'password': 'cashier123'}).encode()
+    opener.open(f'http://127.0.0.1:{port}/login', data=body, timeout=10).read()
+    return next(cookie.value for cookie in jar if cookie.name == 'session')
+
+
+async def request(port, path, cookie, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: session={cookie}\r\n'
+                     f'Connection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        return int(response[9:12])
+    finally:
+        writer.close()
+
+
+async def terminal(port, cookie, deadline, timeout, latencies, failures, rng):
+    count = 0
+    while time.perf_counter() < deadline:
+        count += 1
+        path = '/cashier/sales-history' if count % 5 == 0 else f'/cashier/search-products?q={rng.choice(WORDS)}'
+        started = time.perf_counter()
+        try:
+            status = await request(port, path, cookie, timeout)
+        except (OSError, asyncio.TimeoutError, ValueError):
+            failures.append(1)
+            await asyncio.sleep(0.05)
+            continue
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            failures.append(status)
+
+
+async def load(port, cookie, concurrency, seconds, timeout):
+    latencies, failures = [], []
+    rng = random.Random(concurrency)
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(terminal(port, cookie, deadline, timeout, latencies, failures, rng)
+                           for _ in range(concurrency)))
+    return latencies, failures
+
+
+def percentile(values, pct):
+    return sorted(values)[min(len(values) - 1, int(len(values) * pct / 100))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn sync workers')
+    parser.add_argument('--concurrency', default='10,100,1000')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds.')
+    parser.add_argument('--products', type=int, default=20000)
+    args = parser.parse_args()
+
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    seed(args.products)
+    env = dict(os.environ)
+    config = os.path.join(tmpdir, 'gunicorn.conf.py')
+    open(config, 'w').close()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    sync_port, async_port = free_port(), free_port()
+    servers = {
+        f'gunicorn sync x{args.workers}': (sync_port, [
+            sys.executable, '-m', 'gunicorn', 'app:app', '-c', config, '-w', str(args.workers),
+            '-b', f'127.0.0.1:{sync_port}', '--backlog', '4096', '--log-level', 'warning']),
+        'uvicorn async x1': (async_port, [
+            sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(async_port),
+            '--backlog', '4096', '--log-level', 'warning']),
+    }
+
+    print(f'{"server":<22}{"terminals":>10}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"failed":>10}')
+    for name, (port, command) in servers.items():
+        process = start(command, env, port)
+        try:
+            cookie = session_cookie(port)
+            for concurrency in levels:
+                latencies, failures = asyncio.run(load(port, cookie, concurrency, args.seconds, args.timeout))
+                print(f'{name:<22}{concurrency:>10}{len(latencies) / args.seconds:>10.0f}'
+                      f'{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}'
+                      f'{len(failures):>10}')
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
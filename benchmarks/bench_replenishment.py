@@ -0,0 +1,155 @@
+"""Compare the vectorized replenishment engine with a naive per-product loop.
+
+Works on synthetic sales history (no database), so it measures only the
+reorder maths and the scatter of grouped query rows into the matrix:
+
+    python benchmarks/bench_replenishment.py --products 100000 --days 365
+
+The naive loop is run on --naive-products products and extrapolated.
+
+With --database, a throwaway SQLite database is filled by datagen (as
+`flask generate-data` does) instead, and the whole of suggest_orders()
+is timed, loading the daily sales included. The grouped query is also
+read through the ORM, for comparison with load_daily_sales():
+
+    python benchmarks/bench_replenishment.py --database --products 20000 --days 365 --sales-per-day 1500
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from replenishment import compute_replenishment, daily_matrix  # noqa: E402
+
+LEAD_TIME, REVIEW, Z, HALF_LIFE = 7, 14, 1.65, 14
+
+
+def naive(daily, quantity, reorder_level):
+    """What a straightforward per-product implementation looks like"""
+    days = len(daily[0]) if daily else 0
+    weights = [0.5 ** ((days - 1 - d) / HALF_LIFE) for d in range(days)]
+    total = sum(weights)
+    weights = [w / total for w in weights]
+
+    order_qty = []
+    for units, qty, level in zip(daily, quantity, reorder_level):
+        velocity = 0.0
+        square = 0.0
+        for w, u in zip(weights, units):
+            velocity += w * u
+            square += w * u * u
+        std = math.sqrt(max(square - velocity * velocity, 0))
+        reorder_point = max(level, math.ceil(velocity * LEAD_TIME + Z * std * math.sqrt(LEAD_TIME)))
+        order_up_to = max(reorder_point + math.ceil(velocity * REVIEW), 2 * level)
+        order_qty.append(max(order_up_to - qty, 0) if qty <= reorder_point else 0)
+    return order_qty
+
+
+def database(args):
+    """Time suggest_orders() and its sales load on a generated database"""
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    from app import app, init_db
+    import datagen
+    from models import db, Product, Sale, SaleItem
+    from replenishment import load_daily_sales, suggest_orders
+
+    init_db()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+    app.config['REPLENISHMENT_HISTORY_DAYS'] = args.days
+    with app.app_context():
+        counts = datagen.generate(products=args.products, days=args.days, sales_per_day=args.sales_per_day,
+                                  seed=args.seed)
+        print(f'{counts["products"]:,} products, {counts["sale_items"]:,} sale items over {args.days} days '
+              f'(generated in {counts["seconds"]:.0f}s)')
+
+        product_ids = np.fromiter((product_id for (product_id,) in db.session.query(Product.id)
+                                   .filter(Product.is_active == True).order_by(Product.id)), dtype=np.int64)
+        now = datetime.utcnow()
+        end = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        start = end - timedelta(days=args.days)
+
+        # The grouped query as ORM rows, zipped in Python (the old load_daily_sales)
+        began = time.perf_counter()
+        day = db.func.date(Sale.sale_date)
+        rows = db.session.query(SaleItem.product_id, day, db.func.sum(SaleItem.quantity))\
+            .join(Sale, SaleItem.sale_id == Sale.id)\
+            .filter(Sale.sale_date >= start, Sale.sale_date < end)\
+            .group_by(SaleItem.product_id, day).all()
+        ids, dates, units = zip(*rows) if rows else ((), (), ())
+        orm = time.perf_counter() - began
+
+        began = time.perf_counter()
+        daily = load_daily_sales(product_ids, args.days)
+        cursor = time.perf_counter() - began
+        assert int(daily.sum()) == sum(units), (int(daily.sum()), sum(units))
+
+        began = time.perf_counter()
+        suggestions = suggest_orders()
+        total = time.perf_counter() - began
+
+    print(f'{len(rows):,} grouped (product, day) rows')
+    print(f'ORM rows + zip:            {orm:8.3f}s')
+    print(f'load_daily_sales:          {cursor:8.3f}s')
+    print(f'suggest_orders:            {total:8.3f}s  ({len(suggestions):,} suggestions)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--naive-products', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database', action='store_true', help='Time suggest_orders() on a generated database.')
+    parser.add_argument('--sales-per-day', type=int, default=1500, help='With --database.')
+    args = parser.parse_args()
+    if args.database:
+        return database(args)
+
+    rng = np.random.default_rng(args.seed)
+    product_ids = np.arange(1, args.products + 1, dtype=np.int64)
+    rates = rng.gamma(0.6, 3.0, size=args.products)
+    quantity = rng.integers(0, 200, size=args.products).astype(np.float64)
+    reorder_level = rng.integers(5, 30, size=args.products).astype(np.float64)
+
+    # Grouped query rows: one (product, day, units) row per product-day with sales
+    units = rng.poisson(rates[:, None], size=(args.products, args.days)).astype(np.float32)
+    row_idx, day_idx = np.nonzero(units)
+    sale_product_ids = product_ids[row_idx]
+    row_units = units[row_idx, day_idx]
+    print(f'{args.products} products x {args.days} days, {len(row_units):,} grouped rows')
+
+    start = time.perf_counter()
+    daily = daily_matrix(product_ids, sale_product_ids, day_idx.astype(np.int64), row_units, args.days)
+    scatter = time.perf_counter() - start
+    assert np.array_equal(daily, units)
+
+    start = time.perf_counter()
+    result = compute_replenishment(daily, quantity, reorder_level, LEAD_TIME, REVIEW, Z, HALF_LIFE)
+    vectorized = time.perf_counter() - start
+
+    n = min(args.naive_products, args.products)
+    sample = units[:n].tolist()
+    start = time.perf_counter()
+    expected = naive(sample, quantity[:n].tolist(), reorder_level[:n].tolist())
+    naive_time = (time.perf_counter() - start) * args.products / n
+
+    mismatches = int(np.count_nonzero(result['order_qty'][:n] != np.array(expected)))
+    print(f'scatter rows into matrix:  {scatter:8.3f}s')
+    print(f'vectorized engine:         {vectorized:8.3f}s  ({scatter + vectorized:.3f}s with scatter)')
+    print(f'naive loop (extrapolated): {naive_time:8.3f}s  from {n} products')
+    print(f'speedup: {naive_time / vectorized:.0f}x, '
+          f'{int(np.count_nonzero(result["order_qty"])):,} products to reorder, '
+          f'{mismatches} mismatches vs naive')
+
+
+if __name__ == '__main__':
+    main()
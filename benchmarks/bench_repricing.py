@@ -0,0 +1,95 @@
+"""Time bulk repricing against one edit per product.
+
+Runs in-process against a throwaway SQLite database:
+
+    python benchmarks/bench_repricing.py --products 100000 --categories 30
+
+Preview and apply are timed for one category and for the whole
+catalog. The per-product loop (load, change, commit, as edit_product
+does) is run on --naive-products products and extrapolated to the
+category.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--categories', type=int, default=30)
+    parser.add_argument('--naive-products', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+
+    from sqlalchemy import insert
+    from app import app, init_db
+    from models import db, Product, Category, Supplier, User, PriceHistory
+    import category_tree
+    import pricing
+
+    rng = random.Random(args.seed)
+    init_db()
+    with app.app_context():
+        db.session.execute(insert(Category.__table__), [
+            {'name': f'Bench Category {i}'} for i in range(args.categories)
+        ])
+        category_tree.rebuild()
+        category_ids = [c.id for c in Category.query.filter(Category.name.like('Bench Category %'))]
+        supplier_id = Supplier.query.first().id
+        user_id = User.query.filter_by(username='manager').first().id
+        products = []
+        for i in range(args.products):
+            cost = round(rng.uniform(10, 500), 2)
+            products.append({'name': f'Bench Product {i}', 'sku': f'BENCH-{i:06d}', 'cost_price': cost,
+                             'selling_price': round(cost * rng.uniform(1.1, 1.6), 2), 'quantity': 10,
+                             'reorder_level': 5, 'category_id': category_ids[i % len(category_ids)],
+                             'supplier_id': supplier_id, 'is_active': True})
+        db.session.execute(insert(Product.__table__), products)
+        db.session.commit()
+
+        results = []
+        for label, filters in (('category', {'category_id': category_ids[0]}),
+                               ('catalog', {'supplier_id': supplier_id})):
+            start = time.perf_counter()
+            preview = pricing.preview('percent', 5, filters)
+            preview_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            change = pricing.create_change('percent', 5, filters, user_id)
+            db.session.commit()
+            apply_seconds = time.perf_counter() - start
+            results.append((label, preview['matched'], change.products_changed, preview_seconds, apply_seconds))
+
+        ids = [row.id for row in db.session.query(Product.id).filter(
+            Product.category_id == category_ids[1]).limit(args.naive_products)]
+        start = time.perf_counter()
+        for product_id in ids:
+            product = db.session.get(Product, product_id)
+            old_price = product.selling_price
+            product.selling_price = round(old_price * 1.05, 2)
+            pricing.record_edit(product, old_price)
+            db.session.commit()
+        naive_per_product = (time.perf_counter() - start) / len(ids)
+        history = PriceHistory.query.count()
+
+    for label, matched, changed, preview_seconds, apply_seconds in results:
+        print(f'{label:9s} {matched:7d} products  preview {preview_seconds * 1000:8.1f} ms  '
+              f'apply {apply_seconds * 1000:8.1f} ms  ({changed} changed)')
+    category_size = results[0][1]
+    print(f'per-product edits: {naive_per_product * 1000:.2f} ms each, '
+          f'~{naive_per_product * category_size:.1f} s for the category')
+    print(f'{history} price history rows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Compare one POST /cashier/process-sale per sale with batched /cashier/sync-sales.
+
+Runs in-process against a throwaway SQLite database:
+
+    python benchmarks/bench_sale_sync.py --sales 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_cart(products, size):
+    return [{'id': p.id, 'name': p.name, 'price': p.selling_price, 'quantity': 1}
+            for p in products[:size]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sales', type=int, default=1000)
+    parser.add_argument('--basket', type=int, default=3)
+    parser.add_argument('--products', type=int, default=50)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+
+    from app import app, init_db
+    import stores
+    from models import db, Product, Category, Supplier, MAIN_STORE_ID
+
+    init_db()
+    with app.app_context():
+        category = Category.query.first()
+        supplier = Supplier.query.first()
+        products = [Product(
+            name=f'Bench Product {i}', sku=f'BENCH-{i:05d}', cost_price=10, selling_price=15,
+            quantity=0, reorder_level=10, category_id=category.id, supplier_id=supplier.id
+        ) for i in range(args.products)]
+        db.session.add_all(products)
+        db.session.flush()
+        # Sales draw on the till's store, so the opening stock goes there
+        for product in products:
+            stores.adjust(MAIN_STORE_ID, product, 10 ** 7)
+        db.session.commit()
+        products = Product.query.order_by(Product.id).all()
+        cart = make_cart(products, args.basket)
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'cashier', 'password': 'cashier123'})
+
+    start = time.perf_counter()
+    for _ in range(args.sales):
+        resp = client.post('/cashier/process-sale', json={'items': cart, 'payment_method': 'cash'})
+        assert resp.json['success'], resp.json
+    single = time.perf_counter() - start
+
+    queued = [{'client_id': uuid.uuid4().hex, 'items': cart, 'payment_method': 'cash'}
+              for _ in range(args.sales)]
+    start = time.perf_counter()
+    resp = client.post('/cashier/sync-sales', json={'sales': queued})
+    batch = time.perf_counter() - start
+    assert resp.json['synced'] == args.sales, resp.json
+
+    print(f'{args.sales} sales, {args.basket} items each')
+    print(f'process-sale (one request per sale): {single:8.3f}s  {args.sales / single:10.1f} sales/s')
+    print(f'sync-sales (one batch request):      {batch:8.3f}s  {args.sales / batch:10.1f} sales/s')
+    print(f'speedup: {single / batch:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
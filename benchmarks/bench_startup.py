@@ -0,0 +1,147 @@
+"""Measure worker boot: import-to-first-request time and per-worker memory.
+
+Cold start runs in fresh interpreters. Each one imports the app, builds a
+test client and serves GET /login, timing each step:
+
+    python benchmarks/bench_startup.py --runs 5
+
+Memory starts gunicorn twice against a throwaway SQLite database, with
+and without --preload, warms every worker with some requests, then
+reads each worker's RSS, PSS and private memory from /proc (Linux only).
+RSS counts pages shared with the master in full; PSS splits them between
+the processes that share them.
+
+    python benchmarks/bench_startup.py --workers 4 --skip-cold-start
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+response = client.get('/login')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import': imported - started, 'first_request': served - imported, 'total': served - started}))
+"""
+
+
+def cold_start(runs, env):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory(pid):
+    """RSS, PSS and private memory of one process in MB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss': values.get('Rss', 0),
+        'pss': values.get('Pss', 0),
+        'private': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+    }
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def serve(workers, preload, env, requests_per_worker, config):
+    port = free_port()
+    # An empty config file, so gunicorn.conf.py's preload_app doesn't apply to both runs
+    command = [sys.executable, '-m', 'gunicorn', 'app:app', '-c', config, '-w', str(workers),
+               '-b', f'127.0.0.1:{port}', '--log-level', 'warning']
+    if preload:
+        command.append('--preload')
+    started = time.perf_counter()
+    master = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        url = f'http://127.0.0.1:{port}/login'
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                break
+            except OSError:
+                if master.poll() is not None:
+                    raise RuntimeError('gunicorn exited')
+                time.sleep(0.05)
+        ready = time.perf_counter() - started
+        # Wait for every worker before warming them up
+        while len(children(master.pid)) < workers:
+            time.sleep(0.05)
+        for _ in range(workers * requests_per_worker):
+            urllib.request.urlopen(url, timeout=5).read()
+        worker_memory = [memory(pid) for pid in children(master.pid)]
+        return ready, memory(master.pid), worker_memory
+    finally:
+        master.terminate()
+        master.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=25, help='Warm-up requests per worker.')
+    parser.add_argument('--skip-cold-start', action='store_true')
+    parser.add_argument('--skip-memory', action='store_true')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(tmpdir, 'bench.db'))
+    subprocess.run([sys.executable, '-c', 'from app import init_db; init_db()'], cwd=ROOT, env=env,
+                   check=True, capture_output=True)
+
+    if not args.skip_cold_start:
+        times = cold_start(args.runs, env)
+        print(f'cold start (median of {args.runs})')
+        print(f"  import app:          {times['import'] * 1000:8.1f} ms")
+        print(f"  first request:       {times['first_request'] * 1000:8.1f} ms")
+        print(f"  import to response:  {times['total'] * 1000:8.1f} ms")
+
+    if not args.skip_memory:
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            sys.exit('memory measurement needs Linux /proc/<pid>/smaps_rollup')
+        config = os.path.join(tmpdir, 'gunicorn.conf.py')
+        open(config, 'w').close()
+        for preload in (False, True):
+            ready, master, workers = serve(args.workers, preload, env, args.requests, config)
+            label = 'with --preload' if preload else 'without --preload'
+            mean = {key: statistics.mean(worker[key] for worker in workers) for key in ('rss', 'pss', 'private')}
+            print(f'gunicorn, {len(workers)} workers, {label}: first response after {ready * 1000:.0f} ms')
+            print(f"  master:      RSS {master['rss']:6.1f} MB  PSS {master['pss']:6.1f} MB")
+            print(f"  per worker:  RSS {mean['rss']:6.1f} MB  PSS {mean['pss']:6.1f} MB  "
+                  f"private {mean['private']:6.1f} MB")
+            print(f"  total PSS:   {master['pss'] + sum(worker['pss'] for worker in workers):6.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
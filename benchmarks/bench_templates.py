@@ -0,0 +1,158 @@
+"""Measure page render time with and without fragment and bytecode caching.
+
+Seeds a throwaway SQLite database with --categories categories and
+--suppliers suppliers, plus one signed-in user per role. Then:
+
+- first request: each page's first render in a fresh interpreter, which
+  includes loading its templates. Runs without the bytecode cache, with
+  an empty one (compile and write), and with a filled one (load).
+- steady state: median time per request for each page over --requests
+  requests, with FRAGMENT_CACHE_SIZE = 0 and with fragment caching on.
+
+    python benchmarks/bench_templates.py --suppliers 2000 --requests 50
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = {
+    'admin': 'admin123',
+    'manager': 'manager123',
+    'cashier': 'cashier123',
+    'supplier': 'supplier123',
+}
+PAGES = [
+    ('admin', '/admin/dashboard'),
+    ('manager', '/manager/dashboard'),
+    ('manager', '/manager/products'),
+    ('manager', '/manager/purchase-orders'),
+    ('cashier', '/cashier/dashboard'),
+    ('supplier', '/supplier/dashboard'),
+]
+
+CHILD = """
+import json, sys, time
+import app as appmod
+from config import Config
+from benchmarks.bench_templates import PAGES, clients
+
+class BenchConfig(Config):
+    TEMPLATE_BYTECODE_CACHE = {bytecode!r}
+    TEMPLATE_CACHE_FOLDER = {folder!r}
+
+application = appmod.create_app(BenchConfig)
+users = clients(application)
+times = {{}}
+for role, url in PAGES:
+    started = time.perf_counter()
+    response = users[role].get(url)
+    times[url] = time.perf_counter() - started
+    assert response.status_code == 200, (url, response.status_code)
+print(json.dumps(times))
+"""
+
+
+def seed(categories, suppliers):
+    from sqlalchemy import insert
+    from app import app, init_db
+    from models import db, Category, Supplier, User
+
+    init_db()
+    with app.app_context():
+        db.session.execute(insert(Category.__table__), [
+            {'name': f'Category {i}', 'description': 'Benchmark category'} for i in range(categories)
+        ])
+        db.session.execute(insert(Supplier.__table__), [{
+            'name': f'Supplier {i} Ltd', 'contact_person': 'Jane Doe', 'email': f'supplier{i}@bench.test',
+            'phone': '+254700000000', 'is_active': True,
+        } for i in range(suppliers)])
+        user = User(username='supplier', email='supplier@bench.test', role='supplier', is_active=True)
+        user.set_password(USERS['supplier'])
+        db.session.add(user)
+        db.session.flush()
+        Supplier.query.filter_by(email='supplier0@bench.test').one().user_id = user.id
+        db.session.commit()
+
+
+def clients(app):
+    users = {}
+    for username, password in USERS.items():
+        client = app.test_client()
+        response = client.post('/login', data={'username': username, 'password': password})
+        assert response.status_code == 302, (username, response.status_code)
+        users[username] = client
+    return users
+
+
+def first_request(env, bytecode, folder):
+    code = CHILD.format(bytecode=bytecode, folder=folder)
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def steady_state(requests, fragment_cache_size):
+    import fragment_cache
+    from app import app
+
+    app.config['FRAGMENT_CACHE_SIZE'] = fragment_cache_size
+    app.jinja_env.bytecode_cache = None  # don't write into instance/
+    fragment_cache.clear()
+    users = clients(app)
+    times = {}
+    for role, url in PAGES:
+        users[role].get(url)  # load the template (and fill the fragments)
+        samples = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = users[role].get(url)
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200, (url, response.status_code)
+        times[url] = statistics.median(samples)
+    return times
+
+
+def report(title, columns, results):
+    print(title)
+    print(f'  {"page":<28}' + ''.join(f'{column:>16}' for column in columns))
+    for _, url in PAGES:
+        print(f'  {url:<28}' + ''.join(f'{results[column][url] * 1000:>13.2f} ms' for column in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--categories', type=int, default=200)
+    parser.add_argument('--suppliers', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=30)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    seed(args.categories, args.suppliers)
+    env = dict(os.environ)
+
+    folder = os.path.join(tmpdir, 'jinja_cache')
+    first = {'no bytecode': first_request(env, False, folder)}
+    shutil.rmtree(folder, ignore_errors=True)
+    first['cold cache'] = first_request(env, True, folder)
+    first['warm cache'] = first_request(env, True, folder)
+    report('first request in a new process', list(first), first)
+
+    steady = {
+        'no fragments': steady_state(args.requests, 0),
+        'fragments': steady_state(args.requests, 500),
+    }
+    report(f'steady state (median of {args.requests})', list(steady), steady)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""User flows for benchmarks/load_test.py.
+
+Each scenario runs one iteration of a role's work: one customer served,
+one round of manager chores, and so on. It goes through the same URLs,
+in the same order and with the same payloads as the pages' JavaScript.
+`user` is a load_test.VirtualUser. Its get/post/post_json record each
+request under a route name, and think() sleeps like a person between
+steps.
+"""
+import json
+import uuid
+
+# Product names are built from these in seed(), so type-ahead searches find them
+WORDS = ['milk', 'bread', 'sugar', 'rice', 'soap', 'tea', 'salt', 'flour', 'oil', 'juice',
+         'maize', 'beans', 'coffee', 'butter', 'water', 'cereal']
+
+
+def cashier(user):
+    """One customer: type-ahead search per item, checkout, print the receipt"""
+    cart = {}
+    for _ in range(user.rng.randint(1, 4)):
+        word = user.rng.choice(WORDS)
+        products = []
+        # The POS searches from the second keystroke on
+        for length in range(2, len(word) + 1):
+            data = user.get(f'/cashier/search-products?q={word[:length]}', '/cashier/search-products')
+            products = (data or {}).get('products') or products
+            user.think(0.2)
+        in_stock = [product for product in products if product['quantity'] > 0]
+        if in_stock:
+            product = user.rng.choice(in_stock)
+            cart.setdefault(product['id'], dict(product, quantity=0))['quantity'] += 1
+        user.think(1)
+    if not cart:
+        return
+
+    data = user.post_json('/cashier/process-sale', {
+        'items': [{'id': item['id'], 'name': item['name'], 'price': item['selling_price'],
+                   'quantity': item['quantity']} for item in cart.values()],
+        'payment_method': user.rng.choice(['cash', 'cash', 'mpesa', 'card']),
+    }, headers={'Idempotency-Key': uuid.uuid4().hex})
+    if data and data.get('success'):
+        user.think(0.5)
+        user.get(f"/cashier/sale-receipt/{data['sale']['id']}", '/cashier/sale-receipt/<id>')
+    user.think(8)
+
+
+def manager(user):
+    """Dashboard, reports, a stock adjustment and a purchase order"""
+    user.get('/manager/dashboard')
+    user.think(5)
+    user.get('/manager/reports')
+    user.think(10)
+    product_id = user.rng.choice(user.context['product_ids'])
+    user.post(f'/manager/products/stock/{product_id}', '/manager/products/stock/<id>', {
+        'adjustment': user.rng.randint(1, 20),
+        'adjustment_type': 'add',
+        'reason': 'restock',
+    })
+    user.think(5)
+    user.get('/manager/purchase-orders')
+    user.think(10)
+    lines = [{'product_id': product_id, 'quantity': user.rng.randint(5, 50), 'unit_price': 10.0}
+             for product_id in user.rng.sample(user.context['product_ids'], 2)]
+    user.post('/manager/purchase-orders/add', data={
+        'supplier_id': user.rng.choice(user.context['supplier_ids']),
+        'items': json.dumps(lines),
+        'notes': 'load test',
+    }, headers={'Idempotency-Key': uuid.uuid4().hex})
+    user.think(15)
+
+
+def supplier(user):
+    """Dashboard, move orders along (confirm, ship, deliver) and edit a catalog price"""
+    user.get('/supplier/dashboard')
+    user.think(3)
+    for status, action in (('pending', 'confirm'), ('approved', 'ordered'), ('ordered', 'delivered')):
+        orders = (user.get(f'/supplier/orders?status={status}', '/supplier/orders') or {}).get('orders') or []
+        if not orders:
+            continue
+        order_id = orders[-1]['id']  # newest first, so the oldest on the page
+        if action == 'confirm':
+            user.post(f'/supplier/orders/{order_id}/confirm', '/supplier/orders/<id>/confirm')
+        else:
+            user.post_json(f'/supplier/orders/{order_id}/update-status', {'status': action},
+                           route='/supplier/orders/<id>/update-status')
+        user.think(3)
+
+    products = (user.get('/supplier/products') or {}).get('products') or []
+    if products:
+        product = user.rng.choice(products)
+        user.think(5)
+        user.post_json(f"/supplier/products/{product['id']}/edit",
+                       {'price': round(product['price'] * user.rng.uniform(0.95, 1.05), 2)},
+                       route='/supplier/products/<id>/edit')
+    user.think(20)
+
+
+def notifications(user):
+    """The notification bell polling in an open tab"""
+    user.get('/notifications')
+    user.think(user.context['poll_interval'], jitter=False)
+
+
+SCENARIOS = {
+    'cashier': cashier,
+    'manager': manager,
+    'supplier': supplier,
+    'notifications': notifications,
+}
+# Which seeded accounts each scenario signs in with
+ACCOUNT_ROLES = {
+    'cashier': 'cashier',
+    'manager': 'manager',
+    'supplier': 'supplier',
+    'notifications': 'manager',
+}
@@ -0,0 +1,481 @@
+"""Scenario-based load test: how many lanes one deployment can serve.
+
+Virtual users sign in with their own accounts and repeat a role's real
+flow (benchmarks/load_scenarios.py):
+- cashier: type-ahead search-products, process-sale, sale-receipt
+- manager: dashboard, reports, a stock adjustment and a purchase order
+- supplier: dashboard, confirm/ship/deliver orders, catalog price edits
+- notifications: /notifications polled every --poll-interval seconds
+
+--mix weights the scenarios. --stages ramps the number of virtual users
+like k6: each `duration:users` stage moves linearly from the previous
+target to `users` (30s, 2m or plain seconds). Users leaving in a
+ramp-down stop after their current request.
+
+By default a throwaway SQLite database is seeded and gunicorn is started
+on it (--server uvicorn runs asgi:app instead):
+
+    python benchmarks/load_test.py --workers 4 --mix cashier=80,manager=5,supplier=5,notifications=10 \\
+        --stages 30s:50,2m:50,30s:200,2m:200 --out report.json
+
+To test a running instance, pass --url. The harness still needs the
+instance's database (DATABASE_URL) to find the accounts and products.
+--seed creates them first.
+
+The report is JSON: run settings, and for each route its request count,
+throughput, latency percentiles (successful requests only) and error
+rate by reason, plus a timeline of requests, errors and active users per
+--interval. A request is an error if it fails to connect, times out,
+returns an unexpected status, or returns JSON with "success": false.
+A summary table goes to stderr.
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from http.cookies import SimpleCookie
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_scenarios import ACCOUNT_ROLES, SCENARIOS, WORDS  # noqa: E402
+
+PASSWORD = 'loadtest123'
+EMAIL_DOMAIN = 'loadtest.invalid'
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Stopped(Exception):
+    """The user was ramped down"""
+
+
+class Recorder:
+    """Latencies and errors per route, and a timeline, shared by every user thread"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+        self.timeline = defaultdict(lambda: {'requests': 0, 'errors': 0, 'users': 0})
+        self.lock = threading.Lock()
+
+    def record(self, route, seconds, error=None):
+        bucket = int((time.perf_counter() - self.started) / self.interval)
+        with self.lock:
+            self.timeline[bucket]['requests'] += 1
+            if error:
+                self.errors[route][error] += 1
+                self.timeline[bucket]['errors'] += 1
+            else:
+                self.latencies[route].append(seconds)
+
+    def users(self, count):
+        bucket = int((time.perf_counter() - self.started) / self.interval)
+        with self.lock:
+            self.timeline[bucket]['users'] = max(self.timeline[bucket]['users'], count)
+
+
+def _error_reason(message):
+    # "Insufficient stock for Milk 12" and "... Milk 13" are one reason
+    return 'failed: ' + re.sub(r'\d+', 'N', str(message))[:60]
+
+
+class VirtualUser(threading.Thread):
+    """One person at a terminal or browser, running a scenario in a loop"""
+
+    def __init__(self, scenario, account, target, context, recorder, think_scale, timeout, seed):
+        super().__init__(daemon=True)
+        self.scenario = scenario
+        self.account = account
+        self.host, self.port = target
+        self.context = context
+        self.recorder = recorder
+        self.think_scale = think_scale
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.stopping = threading.Event()
+        self.cookies = {}
+        self.connection = None
+
+    def run(self):
+        try:
+            # Arrivals are spread out instead of all signing in at once
+            self.think(2)
+            self.login()
+            while True:
+                SCENARIOS[self.scenario](self)
+        except Stopped:
+            pass
+        finally:
+            if self.connection:
+                self.connection.close()
+
+    def stop(self):
+        self.stopping.set()
+
+    def think(self, seconds, jitter=True):
+        if jitter:
+            seconds = self.rng.expovariate(1 / seconds)
+        if self.stopping.wait(seconds * self.think_scale):
+            raise Stopped()
+
+    def login(self):
+        self.request('GET', '/login', '/login')
+        self.request('POST', '/login', '/login [POST]', body=urllib.parse.urlencode({
+            'username': self.account, 'password': PASSWORD,
+        }).encode(), content_type='application/x-www-form-urlencoded', expect=302)
+        if 'session' not in self.cookies:
+            raise Stopped()  # the failed sign-in is already recorded
+
+    def get(self, path, route=None):
+        return self.request('GET', path, route or path)
+
+    def post(self, path, route=None, data=None, headers=None):
+        return self.request('POST', path, route or path, body=urllib.parse.urlencode(data or {}).encode(),
+                            content_type='application/x-www-form-urlencoded', headers=headers)
+
+    def post_json(self, path, body, headers=None, route=None):
+        return self.request('POST', path, route or path, body=json.dumps(body).encode(),
+                            content_type='application/json', headers=headers)
+
+    def request(self, method, path, route, body=None, content_type=None, headers=None, expect=200):
+        """Send one request and record it. Returns the decoded JSON body, if any."""
+        if self.stopping.is_set():
+            raise Stopped()
+        send = {'Accept-Encoding': 'gzip', **(headers or {})}
+        if self.cookies:
+            send['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if content_type:
+            send['Content-Type'] = content_type
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request(method, path, body=body, headers=send)
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.connection.close()
+            self.connection = None
+            self.recorder.record(route, time.perf_counter() - started,
+                                 'timeout' if isinstance(e, socket.timeout) else 'connection')
+            return None
+        elapsed = time.perf_counter() - started
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        if response.status != expect:
+            self.recorder.record(route, elapsed, f'http {response.status}')
+            return None
+        data = None
+        if response.headers.get('Content-Type', '').startswith('application/json'):
+            if response.headers.get('Content-Encoding') == 'gzip':
+                payload = gzip.decompress(payload)
+            data = json.loads(payload)
+            if isinstance(data, dict) and data.get('success') is False:
+                self.recorder.record(route, elapsed, _error_reason(data.get('message')))
+                return data
+        self.recorder.record(route, elapsed)
+        return data
+
+
+def parse_duration(text):
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def parse_stages(text):
+    """'30s:50,2m:50' -> [(30.0, 50), (120.0, 50)]"""
+    stages = []
+    for stage in text.split(','):
+        duration, users = stage.split(':')
+        stages.append((parse_duration(duration.strip()), int(users)))
+    return stages
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f'unknown scenario {name!r} (choose from {", ".join(SCENARIOS)})')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def target_users(stages, elapsed):
+    """Users wanted `elapsed` seconds in, or None once the last stage is over"""
+    previous = 0
+    for duration, users in stages:
+        if elapsed < duration:
+            return round(previous + (users - previous) * elapsed / duration)
+        elapsed -= duration
+        previous = users
+    return None
+
+
+def assign_scenarios(mix, count):
+    """Scenario of the 1st, 2nd, ... user: smooth weighted round robin, so any prefix follows the mix"""
+    total = sum(mix.values())
+    credit = dict.fromkeys(mix, 0.0)
+    order = []
+    for _ in range(count):
+        for name in credit:
+            credit[name] += mix[name]
+        name = max(credit, key=credit.get)
+        credit[name] -= total
+        order.append(name)
+    return order
+
+
+def seed(order, products):
+    """Accounts for every virtual user, stocked products and load-test suppliers with catalogs"""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app import app, init_db
+    from models import db, Category, Product, StoreStock, Supplier, SupplierProduct, User, MAIN_STORE_ID
+
+    init_db()
+    password_hash = generate_password_hash(PASSWORD)  # hashing is slow; every account shares one
+    counts = Counter(order)
+    counts['supplier'] = max(counts['supplier'], 1)  # managers' purchase orders need a load-test supplier
+    with app.app_context():
+        category_ids = [category_id for (category_id,) in db.session.query(Category.id)]
+        existing = {username for (username,) in db.session.query(User.username)}
+        accounts = [{
+            'username': f'load{scenario}{i}', 'email': f'load{scenario}{i}@{EMAIL_DOMAIN}',
+            'password_hash': password_hash, 'role': ACCOUNT_ROLES[scenario], 'is_active': True,
+        } for scenario, count in counts.items() for i in range(count)]
+        accounts = [account for account in accounts if account['username'] not in existing]
+        if accounts:
+            db.session.execute(insert(User.__table__), accounts)
+
+        users = db.session.query(User.id, User.username).filter(User.role == 'supplier',
+                                                                User.email.like(f'%@{EMAIL_DOMAIN}'))
+        linked = {user_id for (user_id,) in db.session.query(Supplier.user_id)}
+        for user_id, username in users:
+            if user_id in linked:
+                continue
+            supplier = Supplier(name=f'{username} Ltd', email=f'{username}-co@{EMAIL_DOMAIN}', user_id=user_id,
+                                contact_person=username, is_active=True)
+            db.session.add(supplier)
+            db.session.flush()
+            db.session.execute(insert(SupplierProduct.__table__), [{
+                'supplier_id': supplier.id, 'name': f'{WORDS[i % len(WORDS)]} pack {i}', 'sku': f'{username}-{i}',
+                'price': 9.5, 'category_id': category_ids[i % len(category_ids)], 'unit': 'piece',
+            } for i in range(20)])
+
+        have = db.session.query(Product).filter(Product.sku.like('LOAD-%')).count()
+        if have < products:
+            db.session.execute(insert(Product.__table__), [{
+                'name': f'{WORDS[i % len(WORDS)].title()} {i // len(WORDS) + 1}', 'sku': f'LOAD-{i:06d}',
+                'cost_price': 10.0, 'selling_price': 15.0, 'quantity': 1_000_000, 'reorder_level': 10,
+                'stock_status': 'ok', 'category_id': category_ids[i % len(category_ids)],
+                'supplier_id': 1, 'is_active': True,
+            } for i in range(have, products)])
+            new_ids = db.session.query(Product.id).filter(Product.sku >= f'LOAD-{have:06d}',
+                                                          Product.sku.like('LOAD-%'))
+            db.session.execute(insert(StoreStock.__table__), [{
+                'store_id': MAIN_STORE_ID, 'product_id': product_id, 'quantity': 1_000_000, 'stock_status': 'ok',
+            } for (product_id,) in new_ids])
+        db.session.commit()
+
+
+def load_context(poll_interval):
+    from app import app
+    from models import db, Product, Supplier
+
+    with app.app_context():
+        product_ids = [product_id for (product_id,) in db.session.query(Product.id)
+                       .filter(Product.is_active == True).limit(5000)]
+        supplier_ids = [supplier_id for (supplier_id,) in db.session.query(Supplier.id)
+                        .filter(Supplier.email.like(f'%@{EMAIL_DOMAIN}'))]
+    if not product_ids or not supplier_ids:
+        raise SystemExit('no load-test products or suppliers in the database; run with --seed')
+    return {'product_ids': product_ids, 'supplier_ids': supplier_ids, 'poll_interval': poll_interval}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, workers, port, tmpdir):
+    if server == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                   '--backlog', '4096', '--log-level', 'warning']
+    else:
+        # An empty config file, so gunicorn.conf.py's bind and worker count don't apply
+        config = os.path.join(tmpdir, 'gunicorn.conf.py')
+        open(config, 'w').close()
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '-c', config, '--preload', '-w', str(workers),
+                   '-b', f'127.0.0.1:{port}', '--backlog', '4096', '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=ROOT, env=dict(os.environ))
+    while True:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/login')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise SystemExit(f'{server} exited')
+            time.sleep(0.1)
+
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def build_report(recorder, duration, settings):
+    routes = {}
+    for route in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = sorted(recorder.latencies.get(route, []))
+        errors = recorder.errors.get(route, Counter())
+        count = len(latencies) + sum(errors.values())
+        routes[route] = {
+            'requests': count,
+            'throughput_rps': round(count / duration, 3),
+            'errors': sum(errors.values()),
+            'error_rate': round(sum(errors.values()) / count, 4),
+            'error_reasons': dict(errors.most_common()),
+            'latency_ms': {
+                **{f'p{pct}': round(percentile(latencies, pct) * 1000, 2) for pct in PERCENTILES},
+                'mean': round(sum(latencies) / len(latencies) * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2),
+            } if latencies else None,
+        }
+    requests = sum(route['requests'] for route in routes.values())
+    errors = sum(route['errors'] for route in routes.values())
+    return {
+        'settings': settings,
+        'duration_s': round(duration, 2),
+        'totals': {
+            'requests': requests,
+            'throughput_rps': round(requests / duration, 3),
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0,
+        },
+        'routes': routes,
+        'timeline': [{'t': bucket * recorder.interval, **recorder.timeline[bucket]}
+                     for bucket in sorted(recorder.timeline)],
+    }
+
+
+def print_summary(report, stream):
+    print(f'{"route":<40}{"req":>8}{"rps":>9}{"p50":>9}{"p95":>9}{"p99":>9}{"errors":>9}', file=stream)
+    for route, stats in report['routes'].items():
+        latency = stats['latency_ms'] or {}
+        print(f'{route:<40}{stats["requests"]:>8}{stats["throughput_rps"]:>9.2f}'
+              f'{latency.get("p50", float("nan")):>9.1f}{latency.get("p95", float("nan")):>9.1f}'
+              f'{latency.get("p99", float("nan")):>9.1f}{stats["error_rate"]:>9.2%}', file=stream)
+    totals = report['totals']
+    print(f'total: {totals["requests"]} requests in {report["duration_s"]} s, {totals["throughput_rps"]:.1f} req/s, '
+          f'{totals["error_rate"]:.2%} errors', file=stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='A running instance, e.g. http://127.0.0.1:8000 (default: start one)')
+    parser.add_argument('--seed', action='store_true', help='Create accounts and products in DATABASE_URL first.')
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers, when the harness starts it')
+    parser.add_argument('--mix', default='cashier=80,manager=5,supplier=5,notifications=10')
+    parser.add_argument('--stages', default='30s:20,1m:20')
+    parser.add_argument('--think-scale', type=float, default=1.0,
+                        help='Multiplies every think time; 0 sends requests back to back.')
+    parser.add_argument('--poll-interval', type=float, default=15, help='Seconds between notification polls.')
+    parser.add_argument('--products', type=int, default=2000, help='Products to seed.')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds.')
+    parser.add_argument('--interval', type=float, default=5, help='Timeline bucket in seconds.')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--out', help='Write the JSON report here (default: stdout).')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    stages = parse_stages(args.stages)
+    order = assign_scenarios(mix, max(users for _, users in stages))
+
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    server = None
+    tmpdir = tempfile.mkdtemp()
+    if args.url:
+        target = urllib.parse.urlsplit(args.url)
+        target = (target.hostname, target.port or 80)
+        if args.seed:
+            seed(order, args.products)
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'load.db')
+        seed(order, args.products)
+        port = free_port()
+        server = start_server(args.server, args.workers, port, tmpdir)
+        target = ('127.0.0.1', port)
+    context = load_context(args.poll_interval)
+
+    recorder = Recorder(args.interval)
+    active = []
+    started = time.perf_counter()
+    try:
+        while True:
+            wanted = target_users(stages, time.perf_counter() - started)
+            if wanted is None:
+                break
+            while len(active) < wanted:
+                number = len(active)
+                scenario = order[number]
+                user = VirtualUser(scenario, f'load{scenario}{order[:number].count(scenario)}', target, context,
+                                   recorder, args.think_scale, args.timeout, args.random_seed * 100003 + number)
+                user.start()
+                active.append(user)
+            while len(active) > wanted:
+                active.pop().stop()
+            recorder.users(len(active))
+            time.sleep(0.2)
+        duration = time.perf_counter() - started
+    finally:
+        for user in active:
+            user.stop()
+        for user in active:
+            user.join(args.timeout)
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = build_report(recorder, duration, {
+        'target': f'{target[0]}:{target[1]}',
+        'server': None if args.url else f'{args.server} x{args.workers}' if args.server == 'gunicorn' else 'uvicorn',
+        'mix': mix,
+        'stages': [{'duration_s': duration, 'users': users} for duration, users in stages],
+        'think_scale': args.think_scale,
+        'poll_interval_s': args.poll_interval,
+    })
+    print_summary(report, sys.stderr)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
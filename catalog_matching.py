@@ -0,0 +1,298 @@
+"""Match supplier catalog lines to inventory products.
+
+SupplierProduct and Product are separate tables. This module keeps
+catalog_matches, which links each catalog line to the product it
+supplies, so managers can compare supplier prices with our cost_price.
+
+A catalog line is matched in two steps:
+
+1. by exact SKU, ignoring case and punctuation
+2. by name. Names are split into normalized tokens and scored with
+   IDF-weighted Dice similarity against a token index of active
+   products (token -> product ids). Candidates come from the posting
+   lists of the line's tokens. Tokens in more than MAX_POSTINGS
+   products are skipped, since they are expensive and say little about
+   identity. The best few candidates are then rescored on all their
+   tokens, and links scoring below MATCH_NAME_THRESHOLD are dropped.
+
+`flask match-catalog` rematches everything. It builds the index once
+and commits per chunk of catalog lines, so the margin view never sees
+a half-empty table. Supplier catalog edits and price-list imports
+rematch only the lines they touch, in the caller's transaction, using
+an index that is cached until the catalog changes: a product is added,
+removed, renamed, re-SKUed or (de)activated. Those ORM changes bump the
+'product-catalog' counter in cache_generations (see fragment_cache.py);
+stock and price updates, like every checkout, leave it alone. New or
+renamed products are picked up by the next full rematch.
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from operator import itemgetter
+
+import click
+from flask import current_app
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from models import db, CacheGeneration, CatalogMatch, Product, Supplier, SupplierProduct
+import fragment_cache
+
+STOPWORDS = frozenset({'a', 'an', 'and', 'for', 'in', 'of', 'the', 'with', 'x'})
+MAX_POSTINGS = 1000
+RESCORE = 5
+MAX_PAGE_SIZE = 200
+GENERATION = 'product-catalog'
+INDEXED_FIELDS = ('name', 'sku', 'is_active')
+
+_TOKEN = re.compile(r'[0-9]+|[a-z]+')  # "500ml" and "500 ml" give the same tokens
+_cache = {'version': None, 'index': None}
+_cache_lock = threading.Lock()
+
+
+def normalize_sku(sku):
+    return ''.join(_TOKEN.findall((sku or '').lower()))
+
+
+def tokenize(name):
+    return frozenset(token for token in _TOKEN.findall((name or '').lower()) if token not in STOPWORDS)
+
+
+class TokenIndex:
+    """Inverted index of active products by normalized SKU and name token"""
+
+    def __init__(self, products):
+        self.by_sku = {}
+        self.tokens = {}
+        postings = defaultdict(list)
+        for product_id, sku, name in products:
+            key = normalize_sku(sku)
+            if key:
+                self.by_sku.setdefault(key, product_id)
+            tokens = tokenize(name)
+            self.tokens[product_id] = tokens
+            for token in tokens:
+                postings[token].append(product_id)
+
+        count = len(self.tokens)
+        self.unknown_idf = math.log(1 + count)  # a token no product has
+        self.idf = {token: math.log(1 + count / len(ids)) for token, ids in postings.items()}
+        self.postings = postings
+        self.weight = {product_id: sum(self.idf[t] for t in tokens) for product_id, tokens in self.tokens.items()}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def match(self, sku, name, threshold):
+        """(product_id, method, score) for a catalog line, or None"""
+        product_id = self.by_sku.get(normalize_sku(sku))
+        if product_id is not None:
+            return product_id, 'sku', 1.0
+
+        tokens = tokenize(name)
+        known = sorted((t for t in tokens if t in self.idf), key=lambda t: len(self.postings[t]))
+        if not known:
+            return None
+        probe = [t for t in known if len(self.postings[t]) <= MAX_POSTINGS] or known[:1]
+
+        shared = defaultdict(float)
+        for token in probe:
+            weight = self.idf[token]
+            for candidate in self.postings[token]:
+                shared[candidate] += weight
+
+        line_weight = sum(self.idf.get(t, self.unknown_idf) for t in tokens)
+        best = None
+        for candidate, _ in heapq.nlargest(RESCORE, shared.items(), key=itemgetter(1)):
+            common = sum(self.idf[t] for t in tokens & self.tokens[candidate])
+            score = 2 * common / (line_weight + self.weight[candidate])
+            if best is None or score > best[2]:
+                best = (candidate, 'name', round(score, 4))
+        return best if best and best[2] >= threshold else None
+
+
+def build_index():
+    rows = db.session.query(Product.id, Product.sku, Product.name).filter(Product.is_active == True)
+    return TokenIndex(rows.yield_per(10000))
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_catalog(session, flush_context, instances):
+    changed = any(isinstance(obj, Product) for obj in session.new | session.deleted) or any(
+        isinstance(obj, Product) and any(inspect(obj).attrs[field].history.has_changes() for field in INDEXED_FIELDS)
+        for obj in session.dirty
+    )
+    if changed:
+        fragment_cache.bump(session, {GENERATION})
+
+
+def _products_version():
+    # Count and max id also catch products bulk-loaded outside the ORM
+    generation = select(CacheGeneration.value).where(CacheGeneration.name == GENERATION).scalar_subquery()
+    return db.session.query(
+        db.func.count(Product.id), db.func.max(Product.id), generation
+    ).filter(Product.is_active == True).one()
+
+
+def current_index():
+    """The cached index, rebuilt when active products have changed"""
+    version = tuple(_products_version())
+    with _cache_lock:
+        if _cache['version'] != version:
+            _cache.update(version=version, index=build_index())
+        return _cache['index']
+
+
+def _links(index, lines, threshold, now):
+    links = []
+    for line_id, sku, name in lines:
+        found = index.match(sku, name, threshold)
+        if found:
+            product_id, method, score = found
+            links.append({'supplier_product_id': line_id, 'product_id': product_id,
+                          'method': method, 'score': score, 'matched_at': now})
+    return links
+
+
+def rematch(supplier_product_ids):
+    """Rematch the given catalog lines in the current transaction. Returns the number linked."""
+    ids = list(supplier_product_ids)
+    if not ids:
+        return 0
+    lines = db.session.query(SupplierProduct.id, SupplierProduct.sku, SupplierProduct.name).filter(
+        SupplierProduct.id.in_(ids)
+    ).all()
+    links = _links(current_index(), lines, current_app.config.get('MATCH_NAME_THRESHOLD', 0.6), datetime.utcnow())
+    db.session.execute(delete(CatalogMatch).where(CatalogMatch.supplier_product_id.in_(ids)))
+    if links:
+        db.session.execute(insert(CatalogMatch.__table__), links)
+    return len(links)
+
+
+def rematch_skus(supplier_id, skus):
+    """Rematch a supplier's catalog lines by SKU, e.g. after a price-list chunk"""
+    if not skus:
+        return 0
+    ids = [row.id for row in db.session.query(SupplierProduct.id).filter(
+        SupplierProduct.supplier_id == supplier_id, SupplierProduct.sku.in_(list(skus))
+    )]
+    return rematch(ids)
+
+
+def rematch_all(chunk_size=None, progress=None):
+    """Rebuild every link. Commits once per chunk of catalog lines."""
+    chunk_size = chunk_size or current_app.config.get('MATCH_CHUNK_SIZE', 5000)
+    threshold = current_app.config.get('MATCH_NAME_THRESHOLD', 0.6)
+    started = time.perf_counter()
+    index = build_index()
+    index_seconds = time.perf_counter() - started
+
+    total = db.session.query(db.func.count(SupplierProduct.id)).scalar()
+    done = linked = 0
+    after = 0
+    while True:
+        lines = db.session.query(SupplierProduct.id, SupplierProduct.sku, SupplierProduct.name).filter(
+            SupplierProduct.id > after
+        ).order_by(SupplierProduct.id).limit(chunk_size).all()
+        if not lines:
+            break
+        links = _links(index, lines, threshold, datetime.utcnow())
+        db.session.execute(delete(CatalogMatch).where(
+            CatalogMatch.supplier_product_id > after, CatalogMatch.supplier_product_id <= lines[-1].id
+        ))
+        if links:
+            db.session.execute(insert(CatalogMatch.__table__), links)
+        db.session.commit()
+        after = lines[-1].id
+        done += len(lines)
+        linked += len(links)
+        if progress:
+            progress(done, total, time.perf_counter() - started)
+
+    # Links for catalog lines deleted outside the ORM
+    db.session.execute(delete(CatalogMatch).where(CatalogMatch.supplier_product_id > after))
+    db.session.commit()
+    with _cache_lock:
+        _cache.update(version=tuple(_products_version()), index=index)
+
+    seconds = time.perf_counter() - started
+    return {
+        'products': len(index),
+        'lines': done,
+        'linked': linked,
+        'index_seconds': index_seconds,
+        'seconds': seconds,
+    }
+
+
+def margin_page(supplier_id=None, flagged=False, after=None, limit=50, alert_pct=None):
+    """Linked catalog lines with supplier price against our cost. Returns (rows, next_after)."""
+    try:
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = 50
+    if alert_pct is None:
+        alert_pct = current_app.config.get('MATCH_PRICE_ALERT_PCT', 5.0)
+
+    query = db.session.query(CatalogMatch, SupplierProduct, Product, Supplier.name)\
+        .join(SupplierProduct, SupplierProduct.id == CatalogMatch.supplier_product_id)\
+        .join(Product, Product.id == CatalogMatch.product_id)\
+        .join(Supplier, Supplier.id == SupplierProduct.supplier_id)
+    if supplier_id:
+        query = query.filter(SupplierProduct.supplier_id == supplier_id)
+    if flagged:
+        # |price - cost| > alert_pct% of cost, without dividing by a zero cost
+        query = query.filter(
+            db.func.abs(SupplierProduct.price - Product.cost_price) * 100 > alert_pct * db.func.abs(Product.cost_price)
+        )
+    if after:
+        query = query.filter(CatalogMatch.supplier_product_id > after)
+    rows = query.order_by(CatalogMatch.supplier_product_id).limit(limit + 1).all()
+    next_cursor = rows[limit - 1][0].supplier_product_id if len(rows) > limit else None
+    return [_margin_row(*row, alert_pct=alert_pct) for row in rows[:limit]], next_cursor
+
+
+def _margin_row(match, line, product, supplier_name, alert_pct):
+    cost = float(product.cost_price)
+    price = float(line.price)
+    change_pct = round((price - cost) / cost * 100, 1) if cost else None
+    if change_pct is None or abs(change_pct) <= alert_pct:
+        flag = None
+    else:
+        flag = 'up' if change_pct > 0 else 'down'
+    selling = float(product.selling_price)
+    return {
+        'supplier_product_id': line.id,
+        'supplier': supplier_name,
+        'supplier_sku': line.sku,
+        'supplier_name': line.name,
+        'supplier_price': price,
+        'product_id': product.id,
+        'product_sku': product.sku,
+        'product_name': product.name,
+        'cost_price': cost,
+        'selling_price': selling,
+        'change_pct': change_pct,
+        'margin_at_supplier_price': round((selling - price) / selling * 100, 1) if selling else None,
+        'flag': flag,
+        'method': match.method,
+        'score': match.score,
+    }
+
+
+def init_app(app):
+    @app.cli.command('match-catalog')
+    @click.option('--chunk-size', type=int, default=None, help='Catalog lines per transaction.')
+    def match_catalog_command(chunk_size):
+        """Rematch every supplier catalog line to inventory products."""
+        def progress(done, total, seconds):
+            click.echo(f'{done}/{total} catalog lines  {done / seconds:,.0f} lines/s')
+
+        summary = rematch_all(chunk_size, progress)
+        click.echo(f"Linked {summary['linked']} of {summary['lines']} catalog lines to "
+                   f"{summary['products']} products in {summary['seconds']:.1f}s "
+                   f"(index {summary['index_seconds']:.1f}s)")
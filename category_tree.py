@@ -0,0 +1,167 @@
+"""Category hierarchy: departments, categories and sub-categories.
+
+Category.parent_id gives the tree. category_tree is its closure table:
+one row per (ancestor, descendant) pair, with the depth between them,
+plus a depth-0 row linking each category to itself. So every question
+about a subtree is one indexed join, at any depth:
+- the categories under a node: category_tree by ancestor_id (primary key)
+- stock value under every node: category_tree to products on category_id
+- sales under every node: category_tree to products to sale_items, for
+  one store's sales of a date range (ix_sales_store_date, then
+  ix_sale_items_sale_id)
+
+The routes keep the table current as categories change:
+- attach() when a category is added
+- move() when it gets a new parent. It rewrites only the rows linking
+  the moved subtree to its old and new ancestors.
+- detach() when a leaf is deleted
+
+rebuild() recomputes the whole table from parent_id, for bulk loads that
+insert categories directly: `flask rebuild-category-tree`.
+"""
+from datetime import datetime, time, timedelta
+
+import click
+from sqlalchemy import delete, insert, literal, select, true
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import db, Category, CategoryTree, Product, Sale, SaleItem, StoreStock
+
+
+def attach(category):
+    """Add a flushed new category's rows: itself, and under its parent's ancestors"""
+    db.session.execute(insert(CategoryTree.__table__).values(
+        ancestor_id=category.id, descendant_id=category.id, depth=0))
+    if category.parent_id is not None:
+        db.session.execute(insert(CategoryTree.__table__).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(CategoryTree.ancestor_id, literal(category.id), CategoryTree.depth + 1)
+            .where(CategoryTree.descendant_id == category.parent_id)
+        ))
+
+
+def move(category, parent_id):
+    """Give a category, and so its whole subtree, a new parent (None for a department).
+
+    Raises ValueError if the parent doesn't exist or is in the subtree.
+    """
+    if parent_id == category.parent_id:
+        return
+    if parent_id is not None:
+        if db.session.get(Category, parent_id) is None:
+            raise ValueError('Parent category not found')
+        if db.session.get(CategoryTree, (category.id, parent_id)) is not None:
+            raise ValueError('A category cannot be moved under itself or its sub-categories')
+
+    subtree = select(CategoryTree.descendant_id).where(CategoryTree.ancestor_id == category.id)
+    # Unlink the subtree from its old ancestors; the links inside it stay as they are
+    db.session.execute(delete(CategoryTree).where(
+        CategoryTree.descendant_id.in_(subtree), CategoryTree.ancestor_id.notin_(subtree)
+    ).execution_options(synchronize_session=False))
+    if parent_id is not None:
+        # Link every new ancestor to every node of the subtree
+        above = select(CategoryTree.ancestor_id, CategoryTree.depth)\
+            .where(CategoryTree.descendant_id == parent_id).subquery()
+        below = select(CategoryTree.descendant_id, CategoryTree.depth)\
+            .where(CategoryTree.ancestor_id == category.id).subquery()
+        db.session.execute(insert(CategoryTree.__table__).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(above.c.ancestor_id, below.c.descendant_id, above.c.depth + below.c.depth + 1)
+            .select_from(above).join(below, true())
+        ))
+    category.parent_id = parent_id
+
+
+def detach(category):
+    """Remove a leaf category's rows before it is deleted"""
+    db.session.execute(delete(CategoryTree).where(CategoryTree.descendant_id == category.id)
+                       .execution_options(synchronize_session=False))
+
+
+def subtree(category_id):
+    """SELECT of the ids of a category and everything under it, for use in IN (...)"""
+    return select(CategoryTree.descendant_id).where(CategoryTree.ancestor_id == category_id)
+
+
+def ordered():
+    """Every category depth-first, departments and siblings by name, as (category, depth).
+
+    parent and children come loaded, so walking the tree runs no more queries.
+    """
+    categories = Category.query.order_by(Category.name).all()
+    by_id = {category.id: category for category in categories}
+    children = {}
+    for category in categories:
+        children.setdefault(category.parent_id, []).append(category)
+    for category in categories:
+        set_committed_value(category, 'parent', by_id.get(category.parent_id))
+        set_committed_value(category, 'children', children.get(category.id, []))
+    rows = []
+
+    def walk(parent_id, depth):
+        for category in children.get(parent_id, []):
+            rows.append((category, depth))
+            walk(category.id, depth + 1)
+
+    walk(None, 0)
+    return rows
+
+
+def rollup(start, end, store_id=None):
+    """Stock and sales under every category, its subtree included.
+
+    Returns {category_id: {products, stock_value, units_sold, revenue}}.
+    Stock is as of now and sales are for start..end (dates, inclusive).
+    With a store_id both are that store's, through the indexes that lead
+    with store_id; without one, stock is Product.quantity and sales are
+    the whole chain's.
+    """
+    totals = {category_id: {'products': 0, 'stock_value': 0.0, 'units_sold': 0, 'revenue': 0.0}
+              for category_id, in db.session.query(Category.id)}
+
+    quantity = StoreStock.quantity if store_id is not None else Product.quantity
+    stock = db.session.query(CategoryTree.ancestor_id, db.func.count(Product.id),
+                             db.func.sum(quantity * Product.cost_price))\
+        .join(Product, Product.category_id == CategoryTree.descendant_id)\
+        .filter(Product.is_active == True)
+    if store_id is not None:
+        stock = stock.join(StoreStock, (StoreStock.store_id == store_id) & (StoreStock.product_id == Product.id))
+    for category_id, products, value in stock.group_by(CategoryTree.ancestor_id):
+        totals[category_id].update(products=products, stock_value=round(float(value or 0), 2))
+
+    sales = db.session.query(CategoryTree.ancestor_id, db.func.sum(SaleItem.quantity), db.func.sum(SaleItem.subtotal))\
+        .join(Product, Product.category_id == CategoryTree.descendant_id)\
+        .join(SaleItem, SaleItem.product_id == Product.id)\
+        .join(Sale, Sale.id == SaleItem.sale_id)\
+        .filter(Sale.sale_date >= datetime.combine(start, time.min),
+                Sale.sale_date < datetime.combine(end + timedelta(days=1), time.min))
+    if store_id is not None:
+        sales = sales.filter(Sale.store_id == store_id)
+    for category_id, units, revenue in sales.group_by(CategoryTree.ancestor_id):
+        totals[category_id].update(units_sold=int(units or 0), revenue=round(float(revenue or 0), 2))
+
+    return totals
+
+
+def rebuild():
+    """Recompute the closure table from Category.parent_id. Returns the number of rows written."""
+    parents = dict(db.session.query(Category.id, Category.parent_id))
+    rows = []
+    for category_id in parents:
+        ancestor_id, depth = category_id, 0
+        while ancestor_id is not None and depth <= len(parents):
+            rows.append({'ancestor_id': ancestor_id, 'descendant_id': category_id, 'depth': depth})
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+    db.session.execute(delete(CategoryTree).execution_options(synchronize_session=False))
+    if rows:
+        db.session.execute(insert(CategoryTree.__table__), rows)
+    return len(rows)
+
+
+def init_app(app):
+    @app.cli.command('rebuild-category-tree')
+    def rebuild_category_tree_command():
+        """Recompute the category closure table from each category's parent."""
+        written = rebuild()
+        db.session.commit()
+        click.echo(f'Wrote {written} category tree rows')
@@ -0,0 +1,117 @@
+"""Negotiated gzip/brotli compression of responses.
+
+Responses of COMPRESS_MIN_SIZE bytes or more are compressed when the
+client's Accept-Encoding allows it. Brotli is preferred if the brotli
+package is installed, then gzip. This covers JSON, HTML, CSS,
+JavaScript, CSV and plain text. Smaller bodies go out as they are,
+since the compression headers and CPU cost more than they save.
+
+Streamed responses (json_provider.stream_array) have no known size and
+are compressed chunk by chunk whenever the client accepts it. Each chunk
+is flushed, so the client still receives rows as they are produced.
+Files sent with send_file() and responses that already carry a
+Content-Encoding are left alone.
+
+Set COMPRESS_MIN_SIZE = None to turn compression off, e.g. when a
+reverse proxy in front of gunicorn already compresses.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json',
+    'application/javascript',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+})
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a request's Accept-Encoding"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+class Compressor:
+    """One streaming gzip or brotli encoder"""
+
+    def __init__(self, encoding, gzip_level=6, brotli_quality=4):
+        if encoding == 'br':
+            self._encoder = brotli.Compressor(quality=brotli_quality)
+            self._compress = self._encoder.process
+            self._flush = self._encoder.flush
+            self._finish = self._encoder.finish
+        else:
+            # wbits=31: gzip header and trailer
+            self._encoder = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress = self._encoder.compress
+            self._flush = lambda: self._encoder.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._encoder.flush
+
+    def compress(self, data):
+        return self._compress(data) + self._finish()
+
+    def stream(self, chunks):
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                data = self._compress(chunk) + self._flush()
+                if data:
+                    yield data
+            yield self._finish()
+        finally:
+            # Ends stream_with_context's request context if the client goes away
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+
+def _compress_response(app, response):
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    if min_size is None or response.direct_passthrough:
+        return response
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return response
+    if response.mimetype not in COMPRESSIBLE_TYPES or 'Content-Encoding' in response.headers:
+        return response
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    streamed = response.is_streamed
+    if not streamed and response.content_length is not None and response.content_length < min_size:
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    compressor = Compressor(encoding, app.config.get('COMPRESS_GZIP_LEVEL', 6),
+                            app.config.get('COMPRESS_BROTLI_QUALITY', 4))
+    if streamed:
+        response.response = compressor.stream(response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(compressor.compress(response.get_data()))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    @app.after_request
+    def compress(response):
+        return _compress_response(app, response)
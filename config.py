@@ -1,11 +1,114 @@
+import os
+
 
 class Config:
     
     SECRET_KEY = 'dev-secret-key-12345'
     
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///inventory.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///inventory.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Read-only replica used by the report pages (see db_routing.py).
+    # e.g. 'sqlite:///inventory_replica.db' or a Postgres streaming replica URL.
+    # None sends all queries to the primary.
+    REPLICA_DATABASE_URI = None
+    REPLICA_MAX_LAG_SECONDS = 300
+    REPLICA_LAG_CHECK_INTERVAL = 5
+
+    # Offline POS sync: sales per transaction and per request
+    SALE_SYNC_CHUNK_SIZE = 200
+    SALE_SYNC_MAX_SALES = 5000
+
+    # Idempotency-Key support for checkout and purchase orders. A request
+    # holding a key for longer than the lease (a crashed worker) loses it
+    # to the next retry.
+    IDEMPOTENCY_TTL_HOURS = 24
+    IDEMPOTENCY_WAIT_SECONDS = 10
+    IDEMPOTENCY_LEASE_SECONDS = 30
+
+    # Request/SQL metrics at /metrics. Admins can always read them;
+    # set METRICS_TOKEN to let a scraper in with a bearer token.
+    METRICS_ENABLED = True
+    METRICS_TOKEN = None
+
+    # Statements slower than this are logged with their query plan
+    # at /admin/slow-queries. None turns the slow query log off.
+    SLOW_QUERY_THRESHOLD_MS = 100
+    SLOW_QUERY_LOG_SIZE = 200
+
+    # Audit entries are buffered and written in batches. A batch that
+    # keeps failing is written row by row after AUDIT_MAX_RETRIES flushes,
+    # and rows that still fail (or overflow AUDIT_MAX_BUFFERED) go to the
+    # dead-letter file (instance/audit_dead_letters.jsonl if None).
+    # Each process claims a worker slot for audit ids from the database
+    # unless AUDIT_WORKER_ID (0-1023) is set.
+    AUDIT_BUFFER_SIZE = 100
+    AUDIT_FLUSH_INTERVAL = 2  # seconds
+    AUDIT_MAX_RETRIES = 5
+    AUDIT_MAX_BUFFERED = 10000
+    AUDIT_DEAD_LETTER_FILE = None
+    AUDIT_WORKER_ID = None
+    AUDIT_WORKER_SLOT_STALE = 600  # seconds without a heartbeat before a slot is reused
+
+    # Replenishment engine: days of sales history, supplier lead time,
+    # days between orders and safety stock z-score (1.65 ~ 95% service)
+    REPLENISHMENT_HISTORY_DAYS = 365
+    REPLENISHMENT_LEAD_TIME_DAYS = 7
+    REPLENISHMENT_REVIEW_DAYS = 14
+    REPLENISHMENT_SERVICE_Z = 1.65
+
+    # Nightly demand forecasts (flask forecast). Forecasts older than
+    # FORECAST_MAX_AGE_DAYS are ignored by the replenishment engine.
+    FORECAST_HORIZON_DAYS = 28  # at least 28
+    FORECAST_CHUNK_SIZE = 5000
+    FORECAST_WORKERS = None  # default: one per CPU
+    FORECAST_MAX_AGE_DAYS = 2
+
+    # Supplier price-list imports: rows per transaction, upload size
+    # limit, background threads per process. Uploads are kept in
+    # instance/price_lists unless PRICE_LIST_UPLOAD_FOLDER is set.
+    # A running import with no progress for PRICE_LIST_STALE_SECONDS
+    # is marked failed when polled.
+    PRICE_LIST_CHUNK_SIZE = 500
+    PRICE_LIST_MAX_BYTES = 50 * 1024 * 1024
+    PRICE_LIST_WORKERS = 2
+    PRICE_LIST_UPLOAD_FOLDER = None
+    PRICE_LIST_STALE_SECONDS = 600
+
+    # Supplier catalog matching: minimum name similarity for a link,
+    # price gap (% of cost_price) that flags a line, lines per commit
+    # during a full rematch.
+    MATCH_NAME_THRESHOLD = 0.6
+    MATCH_PRICE_ALERT_PCT = 5.0
+    MATCH_CHUNK_SIZE = 5000
+
+    # Async POS API (pos_api.py, served by `uvicorn asgi:app`): database
+    # connections shared by all in-flight POS reads, and threads running
+    # the rest of the Flask app under it.
+    POS_API_POOL_SIZE = 20
+    POS_API_MAX_OVERFLOW = 10
+    POS_API_WSGI_THREADS = 10
+
+    # Rendered {% cache %} fragments kept per worker (0 turns them off),
+    # and compiled templates on disk (instance/jinja_cache unless
+    # TEMPLATE_CACHE_FOLDER is set; see fragment_cache.py).
+    FRAGMENT_CACHE_SIZE = 500
+    TEMPLATE_BYTECODE_CACHE = True
+    TEMPLATE_CACHE_FOLDER = None
+
+    # JSON encoding: 'orjson' (falls back to 'json' if orjson is missing).
+    # Responses from COMPRESS_MIN_SIZE bytes up are gzip/brotli compressed
+    # when the client accepts it; None turns compression off (e.g. when
+    # nginx compresses). Brotli needs the brotli package.
+    JSON_PROVIDER = 'orjson'
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+
+    # VAT included in selling prices, shown on receipts (receipts.py).
+    # Receipts already issued keep the rate they were printed with.
+    RECEIPT_VAT_RATE = 0.16
+
 
     CLOUDINARY_CLOUD_NAME = 'dh3nh9mck'  
     CLOUDINARY_API_KEY = '318269891622229'        
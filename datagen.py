@@ -0,0 +1,464 @@
+"""Synthetic datasets for scale testing.
+
+init_db() seeds three users, three categories and one supplier. At that
+size no query is slow, so performance problems only show up in
+production. `flask generate-data` fills the database with a shop's
+worth of history instead:
+- cashier and manager accounts, and a login for every supplier
+- stores, categories, suppliers and products, with a few best sellers
+  and a long tail
+- supplier catalogs: each supplier's products, under the same SKUs so
+  catalog matching links them, plus lines nobody stocks
+- --days of sales ending yesterday. The number of sales per day follows
+  the weekday, the season, paydays and slow growth. Times cluster
+  around lunch and the evening, and most baskets are small.
+- a weekly purchase order per store and supplier for what sold,
+  delivered the next morning. The last week's orders are still pending.
+- a stock movement for every sale line, delivery, opening balance and
+  closing stocktake, so StoreStock and Product.quantity add up to the
+  ledger
+- notifications for the purchase orders
+
+Rows are generated with numpy a week at a time. They are written with
+executemany on the DBAPI cursor, which skips the ORM, SQLAlchemy's
+per-row work and the metrics and slow-query hooks. Ids are assigned
+here, after each table's current maximum. Everything is drawn from
+--seed, so the same options on the same database give the same data.
+
+    flask generate-data --products 20000 --days 730 --sales-per-day 4000 --seed 1
+
+That is about 10M sale items. Afterwards, run `flask rollup-stores`
+and `flask forecast` to build the rollups and forecasts the reports
+read.
+"""
+import time
+from datetime import datetime
+from itertools import islice
+
+import click
+import numpy as np
+from sqlalchemy import func, text
+from werkzeug.security import generate_password_hash
+
+from models import (db, Category, CategoryTree, Notification, Product, PurchaseOrder, PurchaseOrderItem, Sale, SaleItem,
+                    StockMovement, Store, StoreStock, Supplier, SupplierProduct, User)
+from stock_alerts import stock_status
+import fragment_cache
+
+SKU_PREFIX = 'GEN-'
+EMAIL_DOMAIN = 'generated.test'
+BATCH_ROWS = 10000
+
+DEPARTMENTS = ['Beverages', 'Dairy', 'Bakery', 'Cereals & Grains', 'Cooking Oils', 'Snacks', 'Household Cleaning',
+               'Personal Care', 'Baby Care', 'Stationery', 'Hardware', 'Electronics', 'Cosmetics', 'Frozen Foods',
+               'Fresh Produce', 'Butchery', 'Pet Supplies', 'Toys', 'Kitchenware', 'Wines & Spirits']
+BRANDS = ['Kenblest', 'Savanna', 'Highland', 'Jamii', 'Tusker', 'Baraka', 'Pwani', 'Simba', 'Zawadi', 'Malaika',
+          'Twiga', 'Nyota', 'Safari', 'Amani', 'Tamu', 'Bahari']
+NOUNS = ['milk', 'bread', 'sugar', 'rice', 'soap', 'tea', 'salt', 'flour', 'oil', 'juice', 'maize meal', 'beans',
+         'coffee', 'butter', 'water', 'cereal', 'biscuits', 'detergent', 'toothpaste', 'lotion', 'tissue', 'candles',
+         'matches', 'yoghurt', 'margarine', 'spaghetti', 'noodles', 'jam', 'honey', 'crisps']
+SIZES = [('250g', 'pack'), ('500g', 'pack'), ('1kg', 'kg'), ('2kg', 'kg'), ('500ml', 'liter'), ('1l', 'liter'),
+         ('2l', 'liter'), ('6 pack', 'pack'), ('12 pack', 'box'), ('single', 'piece')]
+CITIES = ['Nairobi', 'Mombasa', 'Kisumu', 'Nakuru', 'Eldoret', 'Thika']
+
+OPENING_HOUR = 7
+# Relative sales in each opening hour, 07:00 to 21:59: lunch and after-work peaks
+HOURLY = np.array([2, 4, 5, 6, 7, 9, 10, 8, 6, 6, 7, 9, 10, 7, 4], dtype=float)
+WEEKDAY = np.array([0.9, 0.85, 0.9, 0.95, 1.15, 1.35, 1.0])  # Monday first
+SEASON_AMPLITUDE = 0.12  # peaks mid-December
+PAYDAY_BOOST = 1.1  # last days of the month and the first two
+YEARLY_GROWTH = 0.1
+BASKET_MEAN = 3.5
+BASKET_MAX = 40
+QUANTITIES = np.array([1, 2, 3, 4, 6, 12])
+QUANTITY_P = np.array([0.72, 0.15, 0.06, 0.04, 0.02, 0.01])
+PAYMENT_METHODS = ['cash', 'mpesa', 'card']
+PAYMENT_P = [0.5, 0.38, 0.12]
+LOW_STOCK_SHARE = 0.05  # store-products the closing stocktake leaves at or below reorder level
+READ_AFTER_DAYS = 14  # notifications older than this are read
+
+
+class _Writer:
+    """executemany of plain tuples on the session connection's DBAPI cursor"""
+
+    def __init__(self):
+        connection = db.session.connection()
+        self.cursor = connection.connection.cursor()
+        self.psycopg2 = connection.dialect.driver == 'psycopg2'
+        self.marker = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+        self.rows = 0
+
+    def insert(self, table, columns, rows):
+        sql = f'INSERT INTO {table.name} ({", ".join(columns)}) VALUES '
+        self._run(sql + ('%s' if self.psycopg2 else f'({", ".join([self.marker] * len(columns))})'), rows)
+
+    def update(self, table, columns, key, rows):
+        """UPDATE `columns` by `key`; each row is the column values followed by the key"""
+        sets = ', '.join(f'{column} = {self.marker}' for column in columns)
+        self._run(f'UPDATE {table.name} SET {sets} WHERE {key} = {self.marker}', rows, values=False)
+
+    def _run(self, sql, rows, values=True):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, BATCH_ROWS))
+            if not batch:
+                return
+            if self.psycopg2 and values:
+                # executemany is one round trip per row on psycopg2
+                from psycopg2.extras import execute_values
+                execute_values(self.cursor, sql, batch, page_size=BATCH_ROWS)
+            else:
+                self.cursor.executemany(sql, batch)
+            self.rows += len(batch)
+
+
+def _stamps(values):
+    """datetime64 values as the strings SQLAlchemy stores for DateTime columns"""
+    return [stamp.replace('T', ' ') for stamp in np.datetime_as_string(values, unit='us').tolist()]
+
+
+def _day_factors(days):
+    """Expected share of an average day's sales on each of `days` (datetime64[D])"""
+    dates = days.astype(object)
+    weekday = WEEKDAY[[day.weekday() for day in dates]]
+    day_of_year = np.array([day.timetuple().tm_yday for day in dates])
+    season = 1 + SEASON_AMPLITUDE * np.cos(2 * np.pi * (day_of_year - 350) / 365.25)
+    payday = np.where([day.day >= 25 or day.day <= 2 for day in dates], PAYDAY_BOOST, 1.0)
+    # Growth up to the last day, so --sales-per-day is roughly the recent volume
+    years_back = (days - days[-1]).astype(int) / 365.25
+    return weekday * season * payday * (1 + YEARLY_GROWTH) ** years_back
+
+
+class _Ids:
+    """Explicit primary keys for new rows, after each table's current maximum"""
+
+    def __init__(self, models):
+        self.next = {model: (db.session.query(func.max(model.id)).scalar() or 0) + 1 for model in models}
+
+    def take(self, model, count):
+        start = self.next[model]
+        self.next[model] += count
+        return np.arange(start, start + count)
+
+
+def generate(products=20000, categories=40, suppliers=50, stores=1, cashiers=20, managers=3, catalog_extra=100,
+             days=730, sales_per_day=1500, password='password123', seed=1, progress=None):
+    """Write a synthetic dataset and commit it a week at a time. Returns row counts.
+
+    Raises ValueError if the database already has generated products.
+    `progress(days_done, days, sale_items, seconds)` is called after every week.
+    """
+    if db.session.query(Product.id).filter(Product.sku.like(SKU_PREFIX + '%')).first():
+        raise ValueError('The database already has generated data; generate into an empty database')
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    ids = _Ids([Store, User, Category, Supplier, Product, Sale, PurchaseOrder])
+    first_day = np.datetime64(datetime.utcnow().date(), 'D') - days
+    opened = _stamps(np.array([first_day], dtype='datetime64[us]'))[0]
+    writer = _Writer()
+    counts = {}
+
+    # Stores: the existing ones first, then new branches
+    store_ids = [store_id for (store_id,) in db.session.query(Store.id).filter(Store.is_active == True)
+                 .order_by(Store.id).limit(stores)]
+    new_stores = ids.take(Store, stores - len(store_ids)).tolist()
+    writer.insert(Store.__table__, ['id', 'code', 'name', 'address', 'is_active', 'created_at'], [
+        (store_id, f'GEN{store_id:03d}', f'Branch {store_id}', f'{CITIES[store_id % len(CITIES)]}, Kenya', True, opened)
+        for store_id in new_stores
+    ])
+    store_ids = np.array(store_ids + new_stores)
+    store_weights = 1 / np.sqrt(np.arange(1, len(store_ids) + 1))
+    store_weights /= store_weights.sum()
+
+    # Users: cashiers and managers spread over the stores, one login per supplier
+    password_hash = generate_password_hash(password)  # slow, so every account shares it
+    cashiers = max(cashiers, len(store_ids))
+    managers = max(managers, 1)
+    cashier_ids = ids.take(User, cashiers)
+    manager_ids = ids.take(User, managers)
+    manager_list = manager_ids.tolist()
+    supplier_user_ids = ids.take(User, suppliers)
+    cashier_store = store_ids[np.arange(cashiers) % len(store_ids)]
+    manager_store = store_ids[np.arange(managers) % len(store_ids)]
+    accounts = [(user_id, f'gen-cashier-{i:03d}', 'cashier', store_id)
+                for i, (user_id, store_id) in enumerate(zip(cashier_ids.tolist(), cashier_store.tolist()))]
+    accounts += [(user_id, f'gen-manager-{i:03d}', 'manager', store_id)
+                 for i, (user_id, store_id) in enumerate(zip(manager_ids.tolist(), manager_store.tolist()))]
+    accounts += [(user_id, f'gen-supplier-{i:03d}', 'supplier', None) for i, user_id in enumerate(supplier_user_ids.tolist())]
+    writer.insert(User.__table__, ['id', 'username', 'email', 'password_hash', 'role', 'is_active', 'store_id',
+                                   'created_at'], [
+        (user_id, username, f'{username}@{EMAIL_DOMAIN}', password_hash, role, True, store_id, opened)
+        for user_id, username, role, store_id in accounts
+    ])
+    counts['users'] = len(accounts)
+
+    category_ids = ids.take(Category, categories)
+    writer.insert(Category.__table__, ['id', 'name', 'description', 'created_at'], [
+        (category_id, DEPARTMENTS[i % len(DEPARTMENTS)] + (f' {i // len(DEPARTMENTS) + 1}' if i >= len(DEPARTMENTS) else ''),
+         f'Generated {DEPARTMENTS[i % len(DEPARTMENTS)].lower()} department', opened)
+        for i, category_id in enumerate(category_ids.tolist())
+    ])
+    # Generated departments have no sub-categories: each is only its own closure row
+    writer.insert(CategoryTree.__table__, ['ancestor_id', 'descendant_id', 'depth'],
+                  [(category_id, category_id, 0) for category_id in category_ids.tolist()])
+    counts['categories'] = categories
+
+    supplier_ids = ids.take(Supplier, suppliers)
+    writer.insert(Supplier.__table__, ['id', 'name', 'contact_person', 'email', 'phone', 'address', 'user_id',
+                                       'is_active', 'created_at'], [
+        (supplier_id, f'{BRANDS[i % len(BRANDS)]} Distributors {i + 1}', f'Contact {i + 1}',
+         f'orders{i + 1}@supplier.{EMAIL_DOMAIN}', f'+2547{rng.integers(10_000_000, 99_999_999)}',
+         f'{CITIES[i % len(CITIES)]}, Kenya', user_id, True, opened)
+        for i, (supplier_id, user_id) in enumerate(zip(supplier_ids.tolist(), supplier_user_ids.tolist()))
+    ])
+    counts['suppliers'] = suppliers
+
+    # Products: a long tail of slow sellers behind a few best sellers
+    product_ids = ids.take(Product, products)
+    popularity = rng.permutation(1 / np.arange(1, products + 1) ** 0.9)
+    popularity /= popularity.sum()
+    product_category = rng.integers(0, categories, products)
+    product_supplier = rng.integers(0, suppliers, products)
+    cost = np.round(np.clip(rng.lognormal(np.log(120), 0.9, products), 5, 20000), 2)
+    price = np.round(cost * rng.uniform(1.15, 1.55, products))
+    brand, noun, size = (rng.integers(0, len(choices), products) for choices in (BRANDS, NOUNS, SIZES))
+    # Units a store sells in a busy week, which sets reorder levels and opening stock
+    peak_week = (sales_per_day * 7 * WEEKDAY.max() * (1 + SEASON_AMPLITUDE) * PAYDAY_BOOST * BASKET_MEAN
+                 * (QUANTITIES * QUANTITY_P).sum())
+    peak_units = np.outer(store_weights, popularity) * peak_week  # stores x products
+    reorder_level = np.maximum(5, np.ceil(peak_units[0] / 2)).astype(int)
+    order_up_to = (reorder_level + np.ceil(2 * peak_units) + 3 * QUANTITIES.max()).astype(int)
+    names = [f'{BRANDS[b]} {NOUNS[n]} {SIZES[s][0]}' for b, n, s in zip(brand.tolist(), noun.tolist(), size.tolist())]
+    skus = [f'{SKU_PREFIX}{j:07d}' for j in range(products)]
+    units = [SIZES[s][1] for s in size.tolist()]
+    # Python values for the row tuples; DBAPI drivers don't take numpy scalars
+    store_list, product_list, reorder_list = store_ids.tolist(), product_ids.tolist(), reorder_level.tolist()
+    category_of = category_ids[product_category].tolist()
+    supplier_of = supplier_ids[product_supplier].tolist()
+    writer.insert(Product.__table__, ['id', 'name', 'sku', 'cost_price', 'selling_price', 'quantity', 'reorder_level',
+                                      'stock_status', 'category_id', 'supplier_id', 'is_active', 'unit', 'created_at',
+                                      'updated_at'], (
+        (product_id, name, sku, cost_price, selling_price, 0, reorder, 'out', category_id, supplier_id, True, unit,
+         opened, opened)
+        for product_id, name, sku, cost_price, selling_price, reorder, category_id, supplier_id, unit in zip(
+            product_list, names, skus, cost.tolist(), price.tolist(), reorder_list, category_of, supplier_of, units)
+    ))
+    counts['products'] = products
+
+    # Catalogs: the supplier's own products near cost, then lines nobody stocks
+    catalog_price = np.round(cost * rng.uniform(0.95, 1.05, products), 2)
+    extra = suppliers * catalog_extra
+    extra_supplier = np.repeat(np.arange(suppliers), catalog_extra)
+    extra_price = np.round(np.clip(rng.lognormal(np.log(100), 0.9, extra), 5, 20000), 2)
+    extra_category = rng.integers(0, categories, extra)
+    writer.insert(SupplierProduct.__table__, ['name', 'sku', 'price', 'category_id', 'supplier_id', 'unit',
+                                              'created_at'], list(zip(
+        names, skus, catalog_price.tolist(), category_of, supplier_of, units, [opened] * products
+    )) + [
+        (f'{BRANDS[k % len(BRANDS)]} {NOUNS[k % len(NOUNS)]} special {k}', f'SUP-{k:07d}', extra_price, category_id,
+         supplier_id, 'piece', opened)
+        for k, (extra_price, category_id, supplier_id) in enumerate(zip(
+            extra_price.tolist(), category_ids[extra_category].tolist(), supplier_ids[extra_supplier].tolist()))
+    ])
+    counts['supplier_products'] = products + extra
+
+    # Opening balances at the order-up-to level
+    stock = order_up_to.copy()
+    opening = np.nonzero(stock)
+    writer.insert(StockMovement.__table__, ['store_id', 'product_id', 'movement_type', 'quantity', 'reason', 'user_id',
+                                            'reference_type', 'timestamp'], (
+        (store_list[s], product_list[j], 'in', quantity, 'initial_stock', manager_list[0], 'product_creation', opened)
+        for s, j, quantity in zip(opening[0].tolist(), opening[1].tolist(), stock[opening].tolist())
+    ))
+    counts['stock_movements'] = len(opening[0])
+    db.session.commit()
+
+    cashier_order = np.argsort(cashier_store, kind='stable')
+    cashier_start = np.searchsorted(cashier_store[cashier_order], store_ids)
+    cashier_count = np.bincount(np.searchsorted(store_ids, cashier_store), minlength=len(store_ids))
+    hourly = HOURLY / HOURLY.sum()
+    factors = _day_factors(first_day + np.arange(days))
+    counts.update(sales=0, sale_items=0, purchase_orders=0, purchase_order_items=0, notifications=0)
+    on_order = None  # last week's orders, delivered this morning
+
+    for week_start in range(0, days, 7):
+        writer = _Writer()
+        week_days = min(7, days - week_start)
+        start = (first_day + week_start).astype('datetime64[s]')
+
+        if on_order is not None:
+            stock += on_order['sold']
+            delivered_at = _stamps(np.array([start + np.timedelta64(6 * 3600 + 1800, 's')]))[0]
+            writer.insert(StockMovement.__table__, ['store_id', 'product_id', 'movement_type', 'quantity', 'reason',
+                                                    'user_id', 'reference_id', 'reference_type', 'timestamp'], (
+                (store_list[s], product_list[j], 'in', quantity, f'Received on {on_order["numbers"][order]}',
+                 on_order['created_by'][order], on_order['ids'][order], 'purchase_order', delivered_at)
+                for s, j, quantity, order in zip(*on_order['lines'])
+            ))
+            counts['stock_movements'] += len(on_order['lines'][0])
+
+        # Sales: how many each day, when, where and by whom
+        per_day = rng.poisson(sales_per_day * factors[week_start:week_start + week_days])
+        count = int(per_day.sum())
+        seconds = (np.repeat(np.arange(week_days), per_day) * 86400
+                   + (OPENING_HOUR + rng.choice(len(hourly), count, p=hourly)) * 3600
+                   + rng.integers(0, 3600, count))
+        seconds.sort()
+        sale_dates = _stamps(start + seconds.astype('timedelta64[s]'))
+        sale_store = rng.choice(len(store_ids), count, p=store_weights)
+        sale_cashier = cashier_ids[cashier_order[cashier_start[sale_store]
+                                                 + (rng.random(count) * cashier_count[sale_store]).astype(int)]].tolist()
+        payment = rng.choice(len(PAYMENT_METHODS), count, p=PAYMENT_P)
+        sale_ids = ids.take(Sale, count)
+
+        # Baskets: products by popularity, a product's repeats in one basket merged into one line
+        basket = np.minimum(1 + rng.negative_binomial(1.5, 1.5 / (BASKET_MEAN + 0.5), count), BASKET_MAX)
+        line_sale = np.repeat(np.arange(count), basket)
+        line_product = rng.choice(products, len(line_sale), p=popularity)
+        line_quantity = rng.choice(QUANTITIES, len(line_sale), p=QUANTITY_P)
+        keys, inverse = np.unique(line_sale * products + line_product, return_inverse=True)
+        line_quantity = np.bincount(inverse, weights=line_quantity).astype(int)
+        line_sale, line_product = keys // products, keys % products
+        subtotal = np.round(line_quantity * price[line_product], 2)
+        totals = np.round(np.bincount(line_sale, weights=subtotal, minlength=count), 2).tolist()
+        sale_store_ids = store_ids[sale_store].tolist()
+
+        writer.insert(Sale.__table__, ['id', 'store_id', 'sale_number', 'total_amount', 'payment_method', 'cashier_id',
+                                       'sale_date'], (
+            (sale_id, sale_store_ids[i],
+             f'SALE-{sale_dates[i][:10].replace("-", "")}-{sale_dates[i][11:19].replace(":", "")}-G{sale_id}',
+             totals[i], PAYMENT_METHODS[payment[i]], sale_cashier[i], sale_dates[i])
+            for i, sale_id in enumerate(sale_ids.tolist())
+        ))
+        line_columns = (sale_ids[line_sale].tolist(), product_ids[line_product].tolist(), line_quantity.tolist(),
+                        price[line_product].tolist(), subtotal.tolist())
+        writer.insert(SaleItem.__table__, ['sale_id', 'product_id', 'quantity', 'unit_price', 'subtotal'],
+                      zip(*line_columns))
+        writer.insert(StockMovement.__table__, ['store_id', 'product_id', 'movement_type', 'quantity', 'reason',
+                                                'user_id', 'reference_id', 'reference_type', 'timestamp'], (
+            (sale_store_ids[i], product_id, 'out', quantity, 'sale', sale_cashier[i], sale_id, 'sale',
+             sale_dates[i])
+            for i, sale_id, product_id, quantity in zip(line_sale.tolist(), *line_columns[:3])
+        ))
+        counts['sales'] += count
+        counts['sale_items'] += len(line_sale)
+        counts['stock_movements'] += len(line_sale)
+
+        # Restock: one order per store and supplier for the week's sales
+        sold = np.zeros_like(stock)
+        np.add.at(sold, (sale_store[line_sale], line_product), line_quantity)
+        stock -= sold
+        last_week = week_start + 7 >= days
+        store_index, product_index = np.nonzero(sold)
+        order_keys, line_order = np.unique(store_index * suppliers + product_supplier[product_index],
+                                           return_inverse=True)
+        order_ids = ids.take(PurchaseOrder, len(order_keys))
+        order_store, order_supplier = order_keys // suppliers, order_keys % suppliers
+        order_manager = manager_ids[order_store % managers].tolist()
+        quantity = sold[store_index, product_index]
+        line_total = np.round(quantity * cost[product_index], 2)
+        order_total = np.round(np.bincount(line_order, weights=line_total, minlength=len(order_keys)), 2).tolist()
+        order_list = order_ids.tolist()
+        order_supplier_ids = supplier_ids[order_supplier].tolist()
+        order_store_ids = store_ids[order_store].tolist()
+        order_user_ids = supplier_user_ids[order_supplier].tolist()
+        ordered = start + np.timedelta64(week_days * 86400 - 4 * 3600, 's')  # 20:00 on the last day
+        ordered_at, delivered_at = _stamps(np.array([ordered, ordered + np.timedelta64(10 * 3600 + 1800, 's')]))
+        numbers = [f'PO-{ordered_at[:10].replace("-", "")}-G{order_id}' for order_id in order_ids.tolist()]
+        writer.insert(PurchaseOrder.__table__, ['id', 'order_number', 'supplier_id', 'store_id', 'status',
+                                                'total_amount', 'order_date', 'expected_delivery', 'delivery_date',
+                                                'created_by', 'notes'], (
+            (order_id, numbers[o], order_supplier_ids[o], order_store_ids[o],
+             'pending' if last_week else 'delivered', order_total[o], ordered_at, delivered_at,
+             None if last_week else delivered_at, order_manager[o], 'Weekly restock')
+            for o, order_id in enumerate(order_list)
+        ))
+        writer.insert(PurchaseOrderItem.__table__, ['purchase_order_id', 'product_id', 'quantity_ordered',
+                                                    'quantity_received', 'unit_price', 'subtotal'], (
+            (order_list[o], product_list[j], q, 0 if last_week else q, unit_cost, subtotal)
+            for o, j, q, unit_cost, subtotal in zip(line_order.tolist(), product_index.tolist(), quantity.tolist(),
+                                                   cost[product_index].tolist(), line_total.tolist())
+        ))
+        read = days - week_start - week_days > READ_AFTER_DAYS
+        notifications = [(order_user_ids[o], 'New Purchase Order',
+                          f'New purchase order #{numbers[o]} has been created for you. Total: KES {order_total[o]:,.2f}',
+                          'info', read, 'purchase_order', order_id, ordered_at)
+                         for o, order_id in enumerate(order_list)]
+        if not last_week:
+            notifications += [(order_manager[o], 'Order Accepted by Supplier',
+                               f'Supplier {BRANDS[order_supplier[o] % len(BRANDS)]} Distributors '
+                               f'{order_supplier[o] + 1} has accepted purchase order #{numbers[o]}',
+                               'success', read, 'purchase_order', order_id, ordered_at)
+                              for o, order_id in enumerate(order_list)]
+        writer.insert(Notification.__table__, ['user_id', 'title', 'message', 'type', 'is_read', 'related_type',
+                                               'related_id', 'created_at'], notifications)
+        counts['purchase_orders'] += len(order_ids)
+        counts['purchase_order_items'] += len(quantity)
+        counts['notifications'] += len(notifications)
+        on_order = {'sold': sold, 'ids': order_list, 'numbers': numbers, 'created_by': order_manager,
+                    'lines': (store_index.tolist(), product_index.tolist(), quantity.tolist(), line_order.tolist())}
+        db.session.commit()
+        if progress:
+            progress(week_start + week_days, days, counts['sale_items'], time.perf_counter() - started)
+
+    # Closing stocktake: some shelves end up low or empty
+    writer = _Writer()
+    short = np.nonzero(rng.random(stock.shape) < LOW_STOCK_SHARE)
+    counted = np.minimum(stock[short], (rng.random(len(short[0])) * (reorder_level[short[1]] + 1)).astype(int))
+    shrinkage = stock[short] - counted
+    stock[short] = counted
+    counted_at = _stamps(np.array([np.datetime64(datetime.utcnow().date(), 's') - np.timedelta64(3600, 's')]))[0]
+    writer.insert(StockMovement.__table__, ['store_id', 'product_id', 'movement_type', 'quantity', 'reason', 'user_id',
+                                            'reference_type', 'timestamp'], (
+        (store_list[s], product_list[j], 'out', quantity, 'stocktake', manager_list[0], 'manual_adjustment', counted_at)
+        for s, j, quantity in zip(short[0].tolist(), short[1].tolist(), shrinkage.tolist()) if quantity
+    ))
+    counts['stock_movements'] += int(np.count_nonzero(shrinkage))
+
+    writer.insert(StoreStock.__table__, ['store_id', 'product_id', 'quantity', 'stock_status', 'updated_at'], (
+        (store_list[s], product_list[j], quantity, stock_status(quantity, reorder_list[j]), counted_at)
+        for s, row in enumerate(stock.tolist()) for j, quantity in enumerate(row)
+    ))
+    writer.update(Product.__table__, ['quantity', 'stock_status'], 'id', (
+        (total, stock_status(total, reorder), product_id)
+        for product_id, total, reorder in zip(product_list, stock.sum(axis=0).tolist(), reorder_list)
+    ))
+    # The raw inserts went around fragment_cache's change tracking
+    fragment_cache.bump(db.session, {'categories', 'suppliers'})
+    if db.session.get_bind().dialect.name == 'postgresql':
+        for model in ids.next:
+            table = model.__tablename__
+            db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                    f"(SELECT MAX(id) FROM {table}))"))
+    db.session.commit()
+
+    counts['seconds'] = time.perf_counter() - started
+    return counts
+
+
+def init_app(app):
+    @app.cli.command('generate-data')
+    @click.option('--products', type=int, default=20000, show_default=True)
+    @click.option('--categories', type=int, default=40, show_default=True)
+    @click.option('--suppliers', type=int, default=50, show_default=True)
+    @click.option('--stores', type=int, default=1, show_default=True, help='Stores selling, existing ones first.')
+    @click.option('--cashiers', type=int, default=20, show_default=True)
+    @click.option('--managers', type=int, default=3, show_default=True)
+    @click.option('--catalog-extra', type=int, default=100, show_default=True,
+                  help='Catalog lines per supplier that match no product.')
+    @click.option('--days', type=int, default=730, show_default=True, help='Days of sales history, up to yesterday.')
+    @click.option('--sales-per-day', type=int, default=1500, show_default=True,
+                  help='Average sales a day across all stores, in the last year.')
+    @click.option('--password', default='password123', show_default=True, help='Password of every generated account.')
+    @click.option('--seed', type=int, default=1, show_default=True, help='Random seed.')
+    def generate_data_command(**options):
+        """Fill the database with a synthetic shop for scale testing."""
+        def progress(done, total, items, seconds):
+            click.echo(f'{done}/{total} days  {items:,} sale items  {items / seconds:,.0f} items/s')
+
+        try:
+            counts = generate(progress=progress, **options)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        seconds = counts.pop('seconds')
+        click.echo(', '.join(f'{count:,} {name}' for name, count in counts.items()) + f' in {seconds:.1f}s')
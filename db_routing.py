@@ -0,0 +1,170 @@
+"""Read/write session routing.
+
+Heavy report queries can be sent to a read-only replica so they do not
+compete with the POS write path. Routing is opt-in per view:
+
+    @app.route('/manager/reports')
+    @login_required
+    @read_replica()
+    def manage_reports():
+        ...
+
+or per block:
+
+    with read_replica():
+        rows = Sale.query.filter(...).all()
+
+Writes (flushes, INSERT/UPDATE/DELETE) always go to the primary. Once a
+session has written, its reads stay on the primary until it commits or
+rolls back, so it sees its own uncommitted changes. If no replica is
+configured, or the replica is further behind than
+REPLICA_MAX_LAG_SECONDS, reads quietly fall back to the primary.
+
+In development the replica can be a second SQLite file that is refreshed
+from the primary with `flask refresh-replica`. In production point
+REPLICA_DATABASE_URI at a Postgres streaming replica.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import click
+from flask import g, has_app_context, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_BIND = 'replica'
+
+# Cached lag per engine url so we don't ask the replica on every query
+_lag_cache = {}
+_lag_lock = threading.Lock()
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica inside read_replica()"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not isinstance(clause, UpdateBase):
+            if _replica_requested() and not (self.info.get('wrote') or self.new or self.dirty or self.deleted):
+                engine = self._db.engines.get(REPLICA_BIND)
+                if engine is not None and replica_is_fresh(engine):
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _transaction_ended(session):
+    session.info.pop('wrote', None)
+
+
+def _replica_requested():
+    return has_app_context() and g.get('_replica_depth', 0) > 0
+
+
+@contextmanager
+def read_replica():
+    """Route reads to the replica. Works as a decorator or a `with` block."""
+    g._replica_depth = g.get('_replica_depth', 0) + 1
+    try:
+        yield
+    finally:
+        g._replica_depth -= 1
+
+
+def replica_lag(engine):
+    """Return how many seconds the replica is behind the primary."""
+    if engine.dialect.name == 'sqlite':
+        path = engine.url.database
+        if not path or not os.path.exists(path):
+            return float('inf')
+        # refresh-replica rewrites the file, so its mtime is the last sync
+        return max(0.0, time.time() - os.path.getmtime(path))
+
+    if engine.dialect.name == 'postgresql':
+        with engine.connect() as conn:
+            lag = conn.execute(text(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )).scalar()
+        return float(lag or 0)
+
+    return 0.0
+
+
+def replica_is_fresh(engine):
+    """True if the replica is within REPLICA_MAX_LAG_SECONDS of the primary."""
+    config = current_app.config
+    max_lag = config.get('REPLICA_MAX_LAG_SECONDS', 300)
+    interval = config.get('REPLICA_LAG_CHECK_INTERVAL', 5)
+    key = str(engine.url)
+    now = time.monotonic()
+
+    with _lag_lock:
+        cached = _lag_cache.get(key)
+    if cached is None or now - cached[0] > interval:
+        try:
+            lag = replica_lag(engine)
+        except Exception:
+            current_app.logger.warning('Replica lag check failed, using primary', exc_info=True)
+            lag = float('inf')
+        cached = (now, lag)
+        with _lag_lock:
+            _lag_cache[key] = cached
+
+    return cached[1] <= max_lag
+
+
+def refresh_sqlite_replica(primary_engine, replica_engine):
+    """Copy the primary SQLite database into the replica file in place."""
+    if primary_engine.dialect.name != 'sqlite' or replica_engine.dialect.name != 'sqlite':
+        raise ValueError('refresh_sqlite_replica only works with SQLite databases')
+
+    source = sqlite3.connect(primary_engine.url.database)
+    target = sqlite3.connect(replica_engine.url.database)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+    with _lag_lock:
+        _lag_cache.pop(str(replica_engine.url), None)
+
+
+def init_app(app, db):
+    """Register the replica bind. Call before db.init_app(app)."""
+    replica_uri = app.config.get('REPLICA_DATABASE_URI')
+    if replica_uri:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = replica_uri
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+    @app.cli.command('refresh-replica')
+    @click.option('--every', type=int, default=0, help='Keep refreshing every N seconds.')
+    def refresh_replica_command(every):
+        """Refresh the SQLite report replica from the primary database."""
+        replica = db.engines.get(REPLICA_BIND)
+        if replica is None:
+            raise click.ClickException('REPLICA_DATABASE_URI is not configured')
+        while True:
+            refresh_sqlite_replica(db.engine, replica)
+            click.echo(f'Replica refreshed at {time.strftime("%Y-%m-%d %H:%M:%S")}')
+            if not every:
+                break
+            time.sleep(every)
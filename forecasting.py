@@ -0,0 +1,205 @@
+"""Nightly demand forecasts.
+
+Each product's daily unit sales are fitted with additive exponential
+smoothing with weekly seasonality (Holt-Winters without a trend):
+
+    level_t   = alpha * (y_t - season_{t-7}) + (1 - alpha) * level_{t-1}
+    season_t  = gamma * (y_t - level_t) + (1 - gamma) * season_{t-7}
+    forecast  = level_T + season of the forecast day's weekday
+
+Products are fitted in chunks, all at once: every (alpha, gamma) pair
+in the grid runs side by side as an extra array axis and each product
+keeps the pair with the lowest one-step squared error. Chunks are
+spread over a process pool. The next FORECAST_HORIZON_DAYS days are
+stored per product in the forecasts table, which the reports page and
+the replenishment engine read instead of forecasting live.
+
+Run it nightly, e.g. from cron:
+
+    flask forecast --workers 4
+
+Each chunk is committed as soon as it is fitted and the table doubles
+as the checkpoint: rerunning for the same day only fits products that
+don't have a forecast as of that day yet (--restart redoes them all).
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from multiprocessing import get_context
+
+import click
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, insert, select
+
+from models import db, Forecast, Product
+import replenishment
+
+ALPHAS = (0.05, 0.1, 0.2, 0.4)
+GAMMAS = (0.05, 0.15, 0.3)
+SEASON = 7
+
+
+def fit_forecasts(daily, horizon=28):
+    """Fit every row of a (products x days) sales matrix and forecast `horizon` days.
+
+    Returns a dict of arrays: alpha, gamma, mae and forecast
+    (products x horizon float32, units per day, never negative).
+    """
+    daily = np.asarray(daily, dtype=np.float64)
+    n, days = daily.shape
+    # Initialise level and weekday offsets from the first (up to) four full weeks
+    warmup = min(4 * SEASON, days // SEASON * SEASON)
+    if n == 0 or warmup == 0:
+        return {
+            'alpha': np.full(n, ALPHAS[0]), 'gamma': np.full(n, GAMMAS[0]),
+            'mae': np.full(n, np.nan), 'forecast': np.zeros((n, horizon), dtype=np.float32),
+        }
+
+    grid_alpha, grid_gamma = np.meshgrid(ALPHAS, GAMMAS, indexing='ij')
+    alphas = grid_alpha.reshape(-1, 1)
+    gammas = grid_gamma.reshape(-1, 1)
+    k = len(alphas)
+
+    first_weeks = daily[:, :warmup].reshape(n, -1, SEASON)
+    level0 = first_weeks.mean(axis=(1, 2))
+    level = np.repeat(level0[None, :], k, axis=0)
+    seasonal = np.repeat((first_weeks.mean(axis=1) - level0[:, None])[None], k, axis=0)
+
+    squared_error = np.zeros((k, n))
+    absolute_error = np.zeros((k, n))
+    for t in range(days):
+        y = daily[:, t]
+        s = seasonal[:, :, t % SEASON]
+        error = y - level - s
+        if t >= warmup:
+            squared_error += error * error
+            absolute_error += np.abs(error)
+        level = level + alphas * error
+        seasonal[:, :, t % SEASON] = s + gammas * (y - level - s)
+
+    best = squared_error.argmin(axis=0)
+    rows = np.arange(n)
+    weekday = np.arange(days, days + horizon) % SEASON
+    forecast = level[best, rows][:, None] + seasonal[best, rows][:, weekday]
+    return {
+        'alpha': grid_alpha.ravel()[best],
+        'gamma': grid_gamma.ravel()[best],
+        'mae': absolute_error[best, rows] / max(days - warmup, 1),
+        'forecast': np.maximum(forecast, 0).astype(np.float32),
+    }
+
+
+def _fit_chunk(index, daily, horizon):
+    # Runs in a worker process: plain arrays in, plain arrays out
+    return index, fit_forecasts(daily, horizon)
+
+
+def _save_chunk(product_ids, as_of, result):
+    forecast = result['forecast']
+    week = forecast[:, :7].sum(axis=1)
+    month = forecast[:, :28].sum(axis=1)
+    rows = [{
+        'product_id': int(product_id),
+        'as_of': as_of,
+        'alpha': float(result['alpha'][i]),
+        'gamma': float(result['gamma'][i]),
+        'mae': None if np.isnan(result['mae'][i]) else float(result['mae'][i]),
+        'next_7_days': float(week[i]),
+        'next_28_days': float(month[i]),
+        'daily': forecast[i].tobytes(),
+    } for i, product_id in enumerate(product_ids)]
+
+    ids = [row['product_id'] for row in rows]
+    db.session.execute(delete(Forecast).where(Forecast.product_id.in_(ids)))
+    db.session.execute(insert(Forecast.__table__), rows)
+    db.session.commit()
+
+
+def run_forecasts(as_of=None, workers=None, chunk_size=None, restart=False, progress=None):
+    """Fit and store forecasts for every active product.
+
+    `as_of` is the last day of history to use (default: yesterday).
+    `progress(done, total, seconds)` is called after each chunk is saved.
+    Returns {'products', 'seconds', 'products_per_sec'}.
+    """
+    config = current_app.config
+    as_of = as_of or date.today() - timedelta(days=1)
+    workers = workers or config.get('FORECAST_WORKERS') or os.cpu_count() or 1
+    chunk_size = chunk_size or config.get('FORECAST_CHUNK_SIZE', 5000)
+    horizon = config.get('FORECAST_HORIZON_DAYS', 28)
+
+    query = db.session.query(Product.id).filter(Product.is_active == True)
+    if not restart:
+        done = select(Forecast.product_id).where(Forecast.as_of == as_of)
+        query = query.filter(~Product.id.in_(done))
+    product_ids = np.array([row.id for row in query.order_by(Product.id)], dtype=np.int64)
+
+    start = time.perf_counter()
+    total = len(product_ids)
+    if not total:
+        return {'products': 0, 'seconds': 0.0, 'products_per_sec': 0.0}
+
+    daily = replenishment.load_daily_sales(product_ids, config.get('REPLENISHMENT_HISTORY_DAYS', 365),
+                                           datetime.combine(as_of, datetime.min.time()))
+    chunks = range(0, total, chunk_size)
+    finished = 0
+
+    def saved(index, result):
+        nonlocal finished
+        _save_chunk(product_ids[index:index + chunk_size], as_of, result)
+        finished += len(result['forecast'])
+        if progress:
+            progress(finished, total, time.perf_counter() - start)
+
+    if workers == 1 or len(chunks) == 1:
+        for index in chunks:
+            saved(*_fit_chunk(index, daily[index:index + chunk_size], horizon))
+    else:
+        # spawn, not fork: the parent holds DB connections and background threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+            futures = [pool.submit(_fit_chunk, index, daily[index:index + chunk_size], horizon)
+                       for index in chunks]
+            for future in as_completed(futures):
+                saved(*future.result())
+
+    seconds = time.perf_counter() - start
+    return {'products': total, 'seconds': seconds, 'products_per_sec': total / seconds if seconds else 0.0}
+
+
+def forecast_velocity(product_ids, days):
+    """Forecast mean daily demand over the next `days` days, aligned with `product_ids`.
+
+    NaN where a product has no forecast newer than FORECAST_MAX_AGE_DAYS.
+    """
+    oldest = date.today() - timedelta(days=current_app.config.get('FORECAST_MAX_AGE_DAYS', 2))
+    velocity = np.full(len(product_ids), np.nan)
+    rows = db.session.query(Forecast.product_id, Forecast.daily).filter(Forecast.as_of >= oldest).all()
+    if not rows or not len(product_ids):
+        return velocity
+
+    ids = np.fromiter((row.product_id for row in rows), dtype=np.int64, count=len(rows))
+    means = np.fromiter((np.frombuffer(row.daily, dtype=np.float32)[:days].mean() for row in rows),
+                        dtype=np.float64, count=len(rows))
+    positions = np.searchsorted(product_ids, ids)
+    known = (positions < len(product_ids)) & (product_ids[np.minimum(positions, len(product_ids) - 1)] == ids)
+    velocity[positions[known]] = means[known]
+    return velocity
+
+
+def init_app(app):
+    @app.cli.command('forecast')
+    @click.option('--workers', type=int, default=None, help='Worker processes (default: one per CPU).')
+    @click.option('--chunk-size', type=int, default=None, help='Products per chunk.')
+    @click.option('--as-of', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Last day of sales history to use (default: yesterday).')
+    @click.option('--restart', is_flag=True, help='Refit products already forecast for this day.')
+    def forecast_command(workers, chunk_size, as_of, restart):
+        """Fit demand forecasts for every active product."""
+        def progress(done, total, seconds):
+            click.echo(f'{done}/{total} products  {done / seconds:,.0f} products/s')
+
+        summary = run_forecasts(as_of.date() if as_of else None, workers, chunk_size, restart, progress)
+        click.echo(f"Forecast {summary['products']} products in {summary['seconds']:.1f}s "
+                   f"({summary['products_per_sec']:,.0f} products/s)")
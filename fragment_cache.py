@@ -0,0 +1,178 @@
+"""Template fragment caching and a persistent compiled-template cache.
+
+Big pages render the same category and supplier lists on every request.
+A `{% cache %}` block renders its body once and then serves the stored
+HTML until the tables it names change:
+
+    {% cache 'category-options', 'categories' %}
+        {% for category in categories %}...{% endfor %}
+    {% endcache %}
+
+The first argument names the fragment within its template. The rest
+are the tables the fragment depends on, each one a generation counter
+in cache_generations. Any ORM insert, update or delete of a row in a
+watched table bumps its counter in the same transaction. Statements
+run through db.session.execute() also bump it. Every worker then misses
+on the new key and renders the fragment again. Changes made outside
+db.session, e.g. in raw SQL, are not seen until the next change that is.
+
+Rendered fragments are kept in memory per worker, up to
+FRAGMENT_CACHE_SIZE entries (least recently used go first; 0 turns
+caching off). Views pass the data behind a fragment through lazy(), so
+a cache hit skips the query as well as the rendering.
+
+Compiled templates are also written to TEMPLATE_CACHE_FOLDER
+(instance/jinja_cache by default). A new worker then loads bytecode
+instead of parsing and compiling every template again.
+`flask compile-templates` fills it at deploy time.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import click
+from flask import current_app, g, has_app_context
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import db, CacheGeneration
+
+WATCHED_TABLES = frozenset({'categories', 'suppliers'})
+
+_fragments = OrderedDict()
+_lock = threading.Lock()
+
+
+class LazyRows:
+    """A query result that runs on first iteration"""
+
+    def __init__(self, load):
+        self.load = load
+        self.rows = None
+
+    def __iter__(self):
+        if self.rows is None:
+            self.rows = self.load()
+        return iter(self.rows)
+
+
+def lazy(load):
+    """Template data from `load()`, fetched only if a fragment is actually rendered"""
+    return LazyRows(load)
+
+
+def generations():
+    """{table: counter} as of this request's first fragment"""
+    if '_cache_generations' not in g:
+        g._cache_generations = dict(db.session.execute(select(CacheGeneration.name, CacheGeneration.value)).all())
+    return g._cache_generations
+
+
+def bump(session, tables):
+    """Advance the counters for `tables` in the session's transaction"""
+    tables = sorted(tables)
+    with session.no_autoflush:
+        result = session.execute(update(CacheGeneration).where(CacheGeneration.name.in_(tables))
+                                 .values(value=CacheGeneration.value + 1))
+        if result.rowcount != len(tables):
+            existing = set(session.scalars(select(CacheGeneration.name).where(CacheGeneration.name.in_(tables))))
+            session.execute(insert(CacheGeneration), [
+                {'name': name, 'value': 1} for name in tables if name not in existing
+            ])
+    if has_app_context():
+        # Later fragments in this request see the new counters, and aren't stored:
+        # the change may still roll back
+        g.pop('_cache_generations', None)
+        g._cache_writes = True
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_changes(session, flush_context, instances):
+    changed = {obj.__tablename__ for obj in session.new | session.deleted}
+    changed.update(obj.__tablename__ for obj in session.dirty
+                   if session.is_modified(obj, include_collections=False))
+    changed &= WATCHED_TABLES
+    if changed:
+        bump(session, changed)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_statements(state):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, 'table', None)
+    if table is not None and table.name in WATCHED_TABLES:
+        bump(state.session, {table.name})
+
+
+def render_fragment(key, tables, caller):
+    size = current_app.config.get('FRAGMENT_CACHE_SIZE', 500)
+    if not size:
+        return caller()
+    counters = generations()
+    key = key + tuple(counters.get(table, 0) for table in tables)
+    with _lock:
+        html = _fragments.get(key)
+        if html is not None:
+            _fragments.move_to_end(key)
+            return html
+    html = Markup(caller())
+    if not g.get('_cache_writes'):
+        with _lock:
+            _fragments[key] = html
+            while len(_fragments) > size:
+                _fragments.popitem(last=False)
+    return html
+
+
+def clear():
+    with _lock:
+        _fragments.clear()
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache 'fragment-name', 'table', ... %}...{% endcache %}"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        # Fragments are keyed by template, so names only need to be unique within one
+        key = nodes.Tuple([nodes.Const(parser.name), args[0]], 'load')
+        call = self.call_method('_render', [key, nodes.List(args[1:])])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, key, tables, caller):
+        return render_fragment(key, tables, caller)
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode files in one folder, created on the first write"""
+
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+def init_app(app):
+    options = dict(app.jinja_options)
+    options['extensions'] = [*options.get('extensions', ()), FragmentCacheExtension]
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        folder = app.config.get('TEMPLATE_CACHE_FOLDER') or os.path.join(app.instance_path, 'jinja_cache')
+        options['bytecode_cache'] = TemplateBytecodeCache(folder)
+    app.jinja_options = options
+
+    @app.cli.command('compile-templates')
+    def compile_templates_command():
+        """Compile every template into the bytecode cache."""
+        names = app.jinja_env.list_templates(extensions=['html'])
+        for name in names:
+            app.jinja_env.get_template(name)
+        click.echo(f'Compiled {len(names)} templates')
@@ -0,0 +1,11 @@
+# gunicorn -c gunicorn.conf.py
+# The app is imported once in the master and workers are forked from it,
+# so they share its code pages. app.create_app() opens no connections or
+# threads, which makes that safe.
+import multiprocessing
+import os
+
+wsgi_app = 'app:app'
+preload_app = True
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
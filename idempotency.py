@@ -0,0 +1,283 @@
+"""Idempotency keys for endpoints that must not run twice.
+
+A client that may retry (a POS terminal after a timeout, a double-clicked
+form) sends an `Idempotency-Key` header. The first request with a key
+claims it and runs the view; the response is stored until the key
+expires. Repeats get the stored response back without running the view
+again, and repeats that arrive while the first request is still running
+wait for it instead of running in parallel.
+
+A claim is a lease: it holds the key for IDEMPOTENCY_LEASE_SECONDS,
+and a background thread renews it every third of that while the view
+runs, so a slow request keeps its key. If the worker holding it dies
+mid-request, the row is never completed or released; once the lease
+runs out the next request with the key takes the claim over and runs
+the view. Every write is fenced on the lease, so a worker whose lease
+was taken over (one stalled past it) leaves the row to the new holder.
+
+    @app.route('/cashier/process-sale', methods=['POST'])
+    @login_required
+    @idempotent
+    def process_sale():
+        ...
+
+Keys are scoped to the logged in user. Only successful responses are
+stored, so a failed request can be retried with the same key.
+Run `flask purge-idempotency-keys` periodically to delete expired keys.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+import click
+from flask import current_app, jsonify, make_response, request
+from flask_login import current_user
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+
+_TIMED_OUT = object()
+
+_table = IdempotencyKey.__table__
+
+
+def _fingerprint():
+    if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+        # Multipart boundaries change between retries, so hash the fields instead
+        body = repr(sorted(request.form.items(multi=True))).encode()
+    else:
+        body = request.get_data()
+    return hashlib.sha256(request.method.encode() + request.path.encode() + body).hexdigest()
+
+
+def _claim(user_id, key, fingerprint):
+    """Claim the key with an in-progress row, or take over one whose lease ran out.
+
+    Returns the lease's locked_until, which identifies this claim, or
+    None if someone else holds the key.
+    """
+    now = datetime.utcnow()
+    ttl = timedelta(hours=current_app.config.get('IDEMPOTENCY_TTL_HOURS', 24))
+    locked_until = now + timedelta(seconds=_lease_seconds())
+    # Separate connection so the claim is visible to other workers straight away
+    with db.engine.begin() as conn:
+        conn.execute(delete(_table).where(
+            _table.c.user_id == user_id,
+            _table.c.key == key,
+            _table.c.expires_at < now
+        ))
+        try:
+            conn.execute(insert(_table).values(
+                user_id=user_id,
+                key=key,
+                endpoint=request.endpoint,
+                request_hash=fingerprint,
+                created_at=now,
+                expires_at=now + ttl,
+                locked_until=locked_until
+            ))
+            return locked_until
+        except IntegrityError:
+            pass
+    # Held: take it over if it's still in progress and its lease has run out
+    with db.engine.begin() as conn:
+        taken = conn.execute(update(_table).where(
+            _table.c.user_id == user_id,
+            _table.c.key == key,
+            _table.c.response_status.is_(None),
+            or_(_table.c.locked_until.is_(None), _table.c.locked_until < now)
+        ).values(
+            endpoint=request.endpoint,
+            request_hash=fingerprint,
+            created_at=now,
+            expires_at=now + ttl,
+            locked_until=locked_until
+        )).rowcount
+    return locked_until if taken else None
+
+
+def _lease_seconds():
+    return current_app.config.get('IDEMPOTENCY_LEASE_SECONDS', 30)
+
+
+def _renew(user_id, key, lease, locked_until):
+    """Move an unfinished claim's lease on to `locked_until`. False if it was taken over."""
+    with db.engine.begin() as conn:
+        return conn.execute(update(_table).where(
+            _table.c.user_id == user_id,
+            _table.c.key == key,
+            _table.c.response_status.is_(None),
+            _table.c.locked_until == lease
+        ).values(locked_until=locked_until)).rowcount == 1
+
+
+class _Renewal:
+    """Renews a claim from a background thread while the view runs.
+
+    `lease` is the claim's current locked_until. Read it after the with
+    block, once the thread has stopped; `lost` is set if the claim was
+    taken over in the meantime.
+    """
+
+    def __init__(self, user_id, key, lease):
+        self.app = current_app._get_current_object()
+        self.user_id = user_id
+        self.key = key
+        self.lease = lease
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='idempotency-lease', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        with self.app.app_context():
+            seconds = _lease_seconds()
+            while not self._stop.wait(seconds / 3):
+                locked_until = datetime.utcnow() + timedelta(seconds=seconds)
+                try:
+                    renewed = _renew(self.user_id, self.key, self.lease, locked_until)
+                except Exception:
+                    self.app.logger.exception('Could not renew the lease on Idempotency-Key %r', self.key)
+                    continue
+                if not renewed:
+                    self.lost = True
+                    return
+                self.lease = locked_until
+
+
+def _complete(user_id, key, lease, response):
+    with db.engine.begin() as conn:
+        conn.execute(update(_table).where(
+            _table.c.user_id == user_id,
+            _table.c.key == key,
+            _table.c.locked_until == lease
+        ).values(
+            response_status=response.status_code,
+            response_body=response.get_data(as_text=True)
+        ))
+
+
+def _release(user_id, key, lease):
+    with db.engine.begin() as conn:
+        conn.execute(delete(_table).where(
+            _table.c.user_id == user_id,
+            _table.c.key == key,
+            _table.c.locked_until == lease
+        ))
+
+
+def _wait_for_response(user_id, key):
+    """Poll until the request holding the key finishes.
+
+    Returns the stored row, None if the key was released or its lease
+    ran out, or _TIMED_OUT.
+    """
+    deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10)
+    query = select(_table.c.request_hash, _table.c.response_status, _table.c.response_body,
+                   _table.c.locked_until).where(
+        _table.c.user_id == user_id,
+        _table.c.key == key
+    )
+    while True:
+        with db.engine.connect() as conn:
+            row = conn.execute(query).first()
+        if row is None or row.response_status is not None:
+            return row
+        if row.locked_until is None or row.locked_until < datetime.utcnow():
+            return None
+        if time.monotonic() > deadline:
+            return _TIMED_OUT
+        time.sleep(0.05)
+
+
+def _is_success(response):
+    if response.status_code >= 400:
+        return False
+    if response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict) and body.get('success') is False:
+            return False
+    return True
+
+
+def idempotent(view):
+    """Replay the stored response for a repeated Idempotency-Key"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'success': False, 'message': f'{HEADER} is too long'}), 400
+
+        user_id = current_user.id
+        fingerprint = _fingerprint()
+
+        lease = _claim(user_id, key, fingerprint)
+        while lease is None:
+            row = _wait_for_response(user_id, key)
+            if row is None:
+                # The first request failed and gave the key back, or died holding it
+                lease = _claim(user_id, key, fingerprint)
+                continue
+            if row is _TIMED_OUT:
+                return jsonify({
+                    'success': False,
+                    'message': 'A request with this Idempotency-Key is still being processed'
+                }), 409
+            if row.request_hash != fingerprint:
+                return jsonify({
+                    'success': False,
+                    'message': f'{HEADER} was already used for a different request'
+                }), 422
+            response = current_app.response_class(
+                row.response_body, status=row.response_status, mimetype='application/json'
+            )
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        renewal = _Renewal(user_id, key, lease)
+        try:
+            with renewal:
+                response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(user_id, key, renewal.lease)
+            raise
+
+        if renewal.lost:
+            # Stalled past the lease and taken over: the row is the new holder's
+            current_app.logger.warning('Idempotency-Key %r was taken over while its request ran', key)
+        elif _is_success(response):
+            _complete(user_id, key, renewal.lease, response)
+        else:
+            _release(user_id, key, renewal.lease)
+        return response
+    return decorated_function
+
+
+def purge_expired_keys(now=None):
+    """Delete expired keys. Returns how many were removed."""
+    with db.engine.begin() as conn:
+        result = conn.execute(delete(_table).where(_table.c.expires_at < (now or datetime.utcnow())))
+    return result.rowcount
+
+
+def init_app(app):
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys_command():
+        """Delete expired idempotency keys."""
+        click.echo(f'Deleted {purge_expired_keys()} expired idempotency keys')
@@ -0,0 +1,102 @@
+"""Fast JSON encoding for jsonify() and streamed JSON arrays.
+
+OrjsonProvider replaces Flask's json-module provider (app.json) with
+orjson. orjson encodes several times faster and writes UTF-8 instead of
+\\u escapes. Output is otherwise the same as before:
+- keys are sorted
+- dates are RFC 822 strings
+- Decimal, Markup and dataclasses go through Flask's default handler
+
+Anything orjson refuses falls back to the json module: integers wider
+than 64 bits, non-string keys mixed with sort_keys, or unknown keyword
+arguments. JSON_PROVIDER = 'json' keeps the stdlib provider, as does a
+missing orjson.
+
+stream_array() sends `{"key": [row, row, ...]}` in chunks from any
+iterable, so endpoints returning tens of thousands of rows never hold
+the whole list, or its encoding, in memory.
+"""
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # the stdlib provider is used instead
+    orjson = None
+
+STREAM_CHUNK_ROWS = 500
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the encoding and decoding"""
+
+    def _options(self, indent=None):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=None):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except TypeError:
+            kwargs = {'indent': indent} if indent else {'separators': (',', ':')}
+            return super().dumps(obj, **kwargs).encode()
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.get('indent')
+        if set(kwargs) - {'indent', 'separators'} or indent not in (None, 2):
+            return super().dumps(obj, **kwargs)
+        # orjson output is always compact, or indented by 2
+        return self.dumps_bytes(obj, indent).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def dumps_bytes(obj):
+    """Compact UTF-8 JSON with the app's provider"""
+    provider = current_app.json
+    if isinstance(provider, OrjsonProvider):
+        return provider.dumps_bytes(obj)
+    return provider.dumps(obj, separators=(',', ':')).encode()
+
+
+def stream_array(key, rows, extra=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """A response with `{**extra, key: [rows...]}`, encoded and sent a chunk of rows at a time.
+
+    `rows` is consumed while the response is sent, inside the request
+    context (a query with yield_per() keeps memory flat). Headers are
+    already out by then, so an error part-way leaves truncated JSON.
+    """
+    def generate():
+        head = b''.join(dumps_bytes(name) + b':' + dumps_bytes(value) + b','
+                        for name, value in sorted((extra or {}).items()))
+        yield b'{' + head + dumps_bytes(key) + b':['
+        chunk = []
+        first = True
+        for row in rows:
+            chunk.append(dumps_bytes(row))
+            if len(chunk) >= chunk_rows:
+                yield (b'' if first else b',') + b','.join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b'' if first else b',') + b','.join(chunk)
+        yield b']}\n'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
+def init_app(app):
+    if app.config.get('JSON_PROVIDER', 'orjson') == 'orjson' and orjson is not None:
+        app.json = OrjsonProvider(app)
@@ -0,0 +1,32 @@
+"""Cloudinary, configured on first use.
+
+Product images are uploaded straight from the browser with the
+Cloudinary upload widget, so most processes never call the API. The
+SDK and its HTTP stack are imported and configured the first time
+client() is called, not when the app starts.
+"""
+import threading
+
+from flask import current_app
+
+_state = {'client': None}
+_lock = threading.Lock()
+
+
+def client():
+    """The configured cloudinary module (cloudinary.uploader / .api are loaded too)"""
+    if _state['client'] is None:
+        with _lock:
+            if _state['client'] is None:
+                import cloudinary
+                import cloudinary.api
+                import cloudinary.uploader
+
+                config = current_app.config
+                cloudinary.config(
+                    cloud_name=config['CLOUDINARY_CLOUD_NAME'],
+                    api_key=config['CLOUDINARY_API_KEY'],
+                    api_secret=config['CLOUDINARY_API_SECRET']
+                )
+                _state['client'] = cloudinary
+    return _state['client']
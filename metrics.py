@@ -0,0 +1,184 @@
+"""Request and SQL instrumentation exposed in Prometheus text format.
+
+Every request records its latency, response size and status, plus how
+many SQL statements it ran and how long they took (through the
+before/after_cursor_execute engine events). The numbers live in memory
+in each worker process and are rendered by render_prometheus() for the
+/metrics endpoint. Set METRICS_ENABLED = False to switch it off.
+
+Each gunicorn worker keeps its own counters; scrape every worker (or
+sum them) if you run more than one.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket, made cumulative on render"""
+
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """All metrics for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = {}        # (endpoint, method, status) -> count
+        self.latency = {}         # endpoint -> Histogram
+        self.response_size = {}   # endpoint -> Histogram
+        self.query_count = {}     # endpoint -> Histogram
+        self.sql_queries = {}     # endpoint -> total statements
+        self.sql_seconds = {}     # endpoint -> total seconds
+
+    def record(self, endpoint, method, status, duration, size, queries, sql_time):
+        with self.lock:
+            self.in_flight -= 1
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            _histogram(self.latency, endpoint, LATENCY_BUCKETS).observe(duration)
+            if size is not None:
+                _histogram(self.response_size, endpoint, SIZE_BUCKETS).observe(size)
+            _histogram(self.query_count, endpoint, QUERY_COUNT_BUCKETS).observe(queries)
+            self.sql_queries[endpoint] = self.sql_queries.get(endpoint, 0) + queries
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + sql_time
+
+
+def _histogram(family, endpoint, buckets):
+    histogram = family.get(endpoint)
+    if histogram is None:
+        histogram = family[endpoint] = Histogram(buckets)
+    return histogram
+
+
+registry = Registry()
+
+
+class RequestStats:
+    __slots__ = ('start', 'queries', 'sql_time', 'status', 'size')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.status = 500
+        self.size = None
+
+
+def _before_request():
+    if not current_app.config.get('METRICS_ENABLED', True):
+        return
+    g._metrics = RequestStats()
+    with registry.lock:
+        registry.in_flight += 1
+
+
+def _after_request(response):
+    stats = g.get('_metrics')
+    if stats is not None:
+        stats.status = response.status_code
+        stats.size = response.calculate_content_length()
+    return response
+
+
+def _teardown_request(exc):
+    stats = g.pop('_metrics', None)
+    if stats is None:
+        return
+    duration = time.perf_counter() - stats.start
+    registry.record(request.endpoint or 'unmatched', request.method, stats.status,
+                    duration, stats.size, stats.queries, stats.sql_time)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        stats = getattr(g, '_metrics', None)
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_time += time.perf_counter() - conn.info['query_start']
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _render_histogram(lines, name, help_text, family):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for endpoint, histogram in sorted(family.items()):
+        label = f'endpoint="{_escape(endpoint)}"'
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{label}}} {histogram.total}')
+        lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+
+def render_prometheus():
+    """Current metrics in the Prometheus text exposition format"""
+    lines = []
+    with registry.lock:
+        lines.append('# HELP inventra_http_requests_in_flight Requests currently being served.')
+        lines.append('# TYPE inventra_http_requests_in_flight gauge')
+        lines.append(f'inventra_http_requests_in_flight {registry.in_flight}')
+
+        lines.append('# HELP inventra_http_requests_total Requests served.')
+        lines.append('# TYPE inventra_http_requests_total counter')
+        for (endpoint, method, status), count in sorted(registry.requests.items()):
+            lines.append(f'inventra_http_requests_total{{endpoint="{_escape(endpoint)}",'
+                         f'method="{method}",status="{status}"}} {count}')
+
+        _render_histogram(lines, 'inventra_http_request_duration_seconds',
+                          'Request latency.', registry.latency)
+        _render_histogram(lines, 'inventra_http_response_size_bytes',
+                          'Response body size.', registry.response_size)
+        _render_histogram(lines, 'inventra_sql_queries_per_request',
+                          'SQL statements run per request.', registry.query_count)
+
+        lines.append('# HELP inventra_sql_queries_total SQL statements run.')
+        lines.append('# TYPE inventra_sql_queries_total counter')
+        for endpoint, count in sorted(registry.sql_queries.items()):
+            lines.append(f'inventra_sql_queries_total{{endpoint="{_escape(endpoint)}"}} {count}')
+
+        lines.append('# HELP inventra_sql_seconds_total Time spent in SQL statements.')
+        lines.append('# TYPE inventra_sql_seconds_total counter')
+        for endpoint, seconds in sorted(registry.sql_seconds.items()):
+            lines.append(f'inventra_sql_seconds_total{{endpoint="{_escape(endpoint)}"}} {seconds}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
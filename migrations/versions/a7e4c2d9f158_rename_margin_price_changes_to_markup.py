@@ -0,0 +1,26 @@
+"""Rename the 'margin' price change mode to 'markup'
+
+It has always priced at cost plus a percentage of cost, which is a
+markup. Stored changes keep their meaning under the new name.
+
+Revision ID: a7e4c2d9f158
+Revises: f2a8d5c3e917
+Create Date: 2026-10-22 09:41:17.208334
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e4c2d9f158'
+down_revision = 'f2a8d5c3e917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE price_changes SET mode = 'markup' WHERE mode = 'margin'")
+
+
+def downgrade():
+    op.execute("UPDATE price_changes SET mode = 'margin' WHERE mode = 'markup'")
@@ -2,8 +2,31 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import DDL, event
+from db_routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Created by init_db and the stores migration; rows written before branches existed belong to it
+MAIN_STORE_ID = 1
+
+#STORES
+class Store(db.Model):
+    """A branch. Stock, sales and movements are kept per store (see stores.py)"""
+
+    __tablename__ = 'stores'
+
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    address = db.Column(db.Text)
+    is_active = db.Column(db.Boolean, default=True)
+    rolled_up_through = db.Column(db.Date)  # last day in store_daily_sales
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<Store {self.code} {self.name}>"
 
-db = SQLAlchemy()
 
 #USERS
 class User(UserMixin, db.Model):
@@ -17,8 +40,11 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), nullable=False)  
     is_active = db.Column(db.Boolean, default=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))  # home branch; None for the main store
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    store = db.relationship('Store', backref='users')
+
     #password
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -39,8 +65,11 @@ class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text)
+    parent_id = db.Column(db.Integer, db.ForeignKey('categories.id'), index=True)  # None for a department
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    parent = db.relationship('Category', remote_side=[id], backref='children')
+
     def __repr__(self):
         return f"<Category {self.name}>"
     
@@ -79,8 +108,9 @@ class Product(db.Model):
     selling_price = db.Column(db.Float, nullable=False)
     quantity = db.Column(db.Integer, default=0)
     reorder_level = db.Column(db.Integer, default=10)
-    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
-    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=False)
+    stock_status = db.Column(db.String(10), default='ok', index=True)  # ok/low/out, kept by stock_alerts.py
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False, index=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
@@ -107,6 +137,11 @@ class Product(db.Model):
 class SupplierProduct(db.Model):
     """Supplier's product catalog - separate from main inventory"""
     __tablename__ = 'supplier_products'
+    __table_args__ = (
+        db.Index('ix_supplier_products_supplier', 'supplier_id', 'id'),
+        # Price-list imports upsert on (supplier_id, sku)
+        db.Index('ux_supplier_products_supplier_sku', 'supplier_id', 'sku', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -132,9 +167,14 @@ class Sale(db.Model):
     """Record of a sale transaction"""
 
     __tablename__ = 'sales'
+    __table_args__ = (
+        db.Index('ix_sales_store_date', 'store_id', 'sale_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False, default=MAIN_STORE_ID)
     sale_number = db.Column(db.String(50), unique=True, nullable=False)
+    client_id = db.Column(db.String(64), unique=True, index=True)  # generated by the POS terminal
     total_amount = db.Column(db.Float, nullable=False)
     payment_method = db.Column(db.String(20), default='cash')
     cashier_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -144,6 +184,7 @@ class Sale(db.Model):
 
     # Links to
     cashier = db.relationship('User', backref='sales')
+    store = db.relationship('Store', backref='sales')
 
     def __repr__(self):
         return f"<Sale {self.sale_number} - KES {self.total_amount}>"
@@ -156,7 +197,7 @@ class SaleItem(db.Model):
     __tablename__ = 'sale_items'
 
     id = db.Column(db.Integer, primary_key=True)
-    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False)
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
@@ -175,10 +216,16 @@ class PurchaseOrder(db.Model):
     """Track orders made to suppliers"""
 
     __tablename__ = 'purchase_orders'
+    __table_args__ = (
+        # Supplier portal: status counts and keyset pages of a supplier's orders
+        db.Index('ix_purchase_orders_supplier', 'supplier_id', 'id'),
+        db.Index('ix_purchase_orders_supplier_status', 'supplier_id', 'status', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False)
     supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=False)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False, default=MAIN_STORE_ID)  # delivered to
     status = db.Column(db.String(20), default='pending')
     total_amount = db.Column(db.Float, nullable=False)
     order_date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -191,19 +238,84 @@ class PurchaseOrder(db.Model):
     #links to
     supplier = db.relationship('Supplier', backref='purchase_orders')
     creator = db.relationship('User', backref='purchase_orders')
+    store = db.relationship('Store', backref='purchase_orders')
+    items = db.relationship('PurchaseOrderItem', backref='purchase_order', lazy=True, cascade='all, delete-orphan')
 
     def __repr__(self):
         return f"<PurchaseOrder {self.order_number} - {self.status}>" 
     
 
+#PURCHASE ORDER ITEMS
+class PurchaseOrderItem(db.Model):
+    """Individual products in a purchase order"""
+
+    __tablename__ = 'purchase_order_items'
+    __table_args__ = (
+        db.UniqueConstraint('purchase_order_id', 'product_id', name='uq_purchase_order_items_product'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    purchase_order_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    quantity_ordered = db.Column(db.Integer, nullable=False)
+    quantity_received = db.Column(db.Integer, nullable=False, default=0)
+    unit_price = db.Column(db.Float, nullable=False)
+    subtotal = db.Column(db.Float, nullable=False)
+
+    #links to
+    product = db.relationship('Product')
+
+    @property
+    def quantity_outstanding(self):
+        return max(self.quantity_ordered - (self.quantity_received or 0), 0)
+
+    def __repr__(self):
+        return f"<PurchaseOrderItem {self.product_id} x{self.quantity_received}/{self.quantity_ordered}>"
+
+
+
+#PRICE LIST IMPORTS
+class PriceListImport(db.Model):
+    """A supplier price-list upload and its progress (processed by price_lists.py)"""
+
+    __tablename__ = 'price_list_imports'
+
+    id = db.Column(db.Integer, primary_key=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=False, index=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(500), nullable=False)  # uploaded file, removed when done
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    size_bytes = db.Column(db.BigInteger, nullable=False)
+    processed_bytes = db.Column(db.BigInteger, default=0)
+    processed_rows = db.Column(db.Integer, default=0)
+    added = db.Column(db.Integer, default=0)
+    changed = db.Column(db.Integer, default=0)
+    unchanged = db.Column(db.Integer, default=0)
+    duplicates = db.Column(db.Integer, default=0)  # rows repeating an earlier SKU in the file
+    failed = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text)  # JSON list, first few failed lines
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # last progress
+    finished_at = db.Column(db.DateTime)
+
+    supplier = db.relationship('Supplier', backref='price_list_imports')
+
+    def __repr__(self):
+        return f"<PriceListImport {self.filename} - {self.status}>"
+
 
 #STOCK MOVEMENTS 
 class StockMovement(db.Model):
     """Tracks all inventory changes (sales, purchases, manual adjustments)"""
 
     __tablename__ = 'stock_movements'
+    __table_args__ = (
+        db.Index('ix_stock_movements_store_time', 'store_id', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False, default=MAIN_STORE_ID)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     movement_type = db.Column(db.String(20), nullable=False)  # 'in', 'out', 'adjustment'
     quantity = db.Column(db.Integer, nullable=False)
@@ -238,4 +350,345 @@ class Notification(db.Model):
     user = db.relationship('User', backref='notifications')
 
     def __repr__(self):
-        return f"<Notification {self.title} for {self.user.username}>"
\ No newline at end of file
+        return f"<Notification {self.title} for {self.user.username}>"
+
+#IDEMPOTENCY KEYS
+class IdempotencyKey(db.Model):
+    """Stored response for a request sent with an Idempotency-Key header"""
+
+    __tablename__ = 'idempotency_keys'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    key = db.Column(db.String(64), primary_key=True)
+    endpoint = db.Column(db.String(50), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    response_status = db.Column(db.Integer)  # NULL while the first request is running
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    locked_until = db.Column(db.DateTime)  # lease on an in-progress claim
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.key} ({self.endpoint})>"
+
+
+
+#AUDIT LOG
+class AuditLog(db.Model):
+    """Append-only record of who changed what (written by audit.py)"""
+
+    __tablename__ = 'audit_logs'
+    __table_args__ = (
+        db.Index('ix_audit_logs_actor', 'actor_id', 'id'),
+        db.Index('ix_audit_logs_entity', 'entity_type', 'entity_id', 'id'),
+        {'postgresql_partition_by': 'RANGE (id)'},
+    )
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)  # time ordered, see audit.make_id
+    created_at = db.Column(db.DateTime, nullable=False)
+    actor_id = db.Column(db.Integer)  # no FK: entries outlive deleted users
+    actor_name = db.Column(db.String(80))
+    action = db.Column(db.String(30), nullable=False)  # create, update, delete, ...
+    entity_type = db.Column(db.String(30), nullable=False)  # user, product, stock, ...
+    entity_id = db.Column(db.Integer)
+    summary = db.Column(db.String(255), nullable=False)
+    changes = db.Column(db.Text)  # JSON {field: [old, new]}
+
+    def __repr__(self):
+        return f"<AuditLog {self.action} {self.entity_type}:{self.entity_id}>"
+
+
+class AuditWorkerSlot(db.Model):
+    """Worker bits of audit ids claimed by a running process (see audit.py)"""
+
+    __tablename__ = 'audit_worker_slots'
+
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0-1023
+    owner = db.Column(db.String(80), nullable=False)  # host:pid
+    heartbeat_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<AuditWorkerSlot {self.slot} ({self.owner})>"
+
+
+for _statement in (
+    "CREATE TRIGGER audit_logs_no_update BEFORE UPDATE ON audit_logs "
+    "BEGIN SELECT RAISE(ABORT, 'audit_logs is append-only'); END",
+    "CREATE TRIGGER audit_logs_no_delete BEFORE DELETE ON audit_logs "
+    "BEGIN SELECT RAISE(ABORT, 'audit_logs is append-only'); END",
+):
+    event.listen(AuditLog.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+for _statement in (
+    "CREATE OR REPLACE FUNCTION audit_logs_append_only() RETURNS trigger AS $$ "
+    "BEGIN RAISE EXCEPTION 'audit_logs is append-only'; END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER audit_logs_no_change BEFORE UPDATE OR DELETE ON audit_logs "
+    "FOR EACH ROW EXECUTE FUNCTION audit_logs_append_only()",
+):
+    event.listen(AuditLog.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+
+#DEMAND FORECASTS
+class Forecast(db.Model):
+    """Latest demand forecast per product (written nightly by forecasting.py)"""
+
+    __tablename__ = 'forecasts'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    as_of = db.Column(db.Date, nullable=False, index=True)  # last day of history used
+    alpha = db.Column(db.Float, nullable=False)  # level smoothing
+    gamma = db.Column(db.Float, nullable=False)  # weekly seasonal smoothing
+    mae = db.Column(db.Float)  # in-sample one-step error, units/day
+    next_7_days = db.Column(db.Float, nullable=False)
+    next_28_days = db.Column(db.Float, nullable=False)
+    daily = db.Column(db.LargeBinary, nullable=False)  # float32 units/day from as_of + 1
+
+    product = db.relationship('Product', backref=db.backref('forecast', uselist=False, cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f"<Forecast product:{self.product_id} as of {self.as_of}>"
+
+
+#SUPPLIER CATALOG MATCHES
+class CatalogMatch(db.Model):
+    """Link from a supplier catalog line to the inventory product it supplies (kept by catalog_matching.py)"""
+
+    __tablename__ = 'catalog_matches'
+
+    supplier_product_id = db.Column(db.Integer, db.ForeignKey('supplier_products.id', ondelete='CASCADE'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False, index=True)
+    method = db.Column(db.String(10), nullable=False)  # sku, name
+    score = db.Column(db.Float, nullable=False)  # 1.0 for SKU matches, name similarity otherwise
+    matched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    supplier_product = db.relationship('SupplierProduct', backref=db.backref('match', uselist=False, cascade='all, delete-orphan'))
+    product = db.relationship('Product', backref=db.backref('catalog_matches', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f"<CatalogMatch {self.supplier_product_id} -> {self.product_id} ({self.method})>"
+
+
+#BULK PRICE CHANGES
+class PriceChange(db.Model):
+    """A bulk repricing, applied now or scheduled (applied by pricing.py)"""
+
+    __tablename__ = 'price_changes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    mode = db.Column(db.String(10), nullable=False)  # percent, amount, markup
+    value = db.Column(db.Float, nullable=False)
+    filters = db.Column(db.Text, nullable=False)  # JSON: category_id, supplier_id, skus
+    status = db.Column(db.String(20), default='scheduled', index=True)  # scheduled, applied, cancelled
+    scheduled_for = db.Column(db.DateTime, index=True)
+    applied_at = db.Column(db.DateTime)
+    products_changed = db.Column(db.Integer, default=0)
+    products_skipped = db.Column(db.Integer, default=0)  # would have gone below cost
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    creator = db.relationship('User', backref='price_changes')
+
+    def __repr__(self):
+        return f"<PriceChange {self.id} {self.mode} {self.value} ({self.status})>"
+
+
+#PRICE HISTORY
+class PriceHistory(db.Model):
+    """One row per selling price change"""
+
+    __tablename__ = 'price_history'
+    __table_args__ = (
+        db.Index('ix_price_history_product', 'product_id', 'changed_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    price_change_id = db.Column(db.Integer, db.ForeignKey('price_changes.id'), index=True)  # None for single edits
+    old_price = db.Column(db.Float, nullable=False)
+    new_price = db.Column(db.Float, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    product = db.relationship('Product', backref=db.backref('price_history', cascade='all, delete-orphan',
+                                                            order_by='PriceHistory.changed_at.desc()'))
+
+    def __repr__(self):
+        return f"<PriceHistory product:{self.product_id} {self.old_price} -> {self.new_price}>"
+
+
+#PER-STORE STOCK
+class StoreStock(db.Model):
+    """Stock of a product at one store. Product.quantity is the total across stores."""
+
+    __tablename__ = 'store_stock'
+    __table_args__ = (
+        db.Index('ix_store_stock_status', 'store_id', 'stock_status'),
+    )
+
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    stock_status = db.Column(db.String(10), nullable=False, default='out')  # ok/low/out at this store
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    store = db.relationship('Store')
+    product = db.relationship('Product', backref=db.backref('store_stock', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f"<StoreStock store:{self.store_id} product:{self.product_id} ({self.quantity})>"
+
+
+#PER-STORE DAILY SALES ROLLUP
+class StoreDailySales(db.Model):
+    """One store's sales for one day, for cross-store reporting (built by stores.py)"""
+
+    __tablename__ = 'store_daily_sales'
+
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    items_sold = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    store = db.relationship('Store')
+
+    def __repr__(self):
+        return f"<StoreDailySales store:{self.store_id} {self.day} KES {self.revenue}>"
+
+
+#TEMPLATE FRAGMENT CACHE GENERATIONS
+class CacheGeneration(db.Model):
+    """Change counter for one table; cached template fragments are keyed on it (see fragment_cache.py)"""
+
+    __tablename__ = 'cache_generations'
+
+    name = db.Column(db.String(50), primary_key=True)  # table name, e.g. 'categories'
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheGeneration {self.name}={self.value}>"
+
+
+#RECEIPT SNAPSHOTS
+class SaleReceipt(db.Model):
+    """A sale's receipt as it was printed, serialized once at checkout (see receipts.py)"""
+
+    __tablename__ = 'sale_receipts'
+
+    sale_id = db.Column(db.Integer, db.ForeignKey('sales.id', ondelete='CASCADE'), primary_key=True)
+    cashier_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # reprint check without the sale
+    body = db.Column(db.Text, nullable=False)  # compact JSON, sent to the POS as it is
+
+    sale = db.relationship('Sale', backref=db.backref('receipt', uselist=False, cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f"<SaleReceipt sale:{self.sale_id}>"
+
+
+#CASHIER SHIFTS
+class Shift(db.Model):
+    """A cashier's shift, with running totals added to as sales post (see shifts.py)"""
+
+    __tablename__ = 'shifts'
+    __table_args__ = (
+        # At most one open shift per cashier
+        db.Index('ix_shifts_open_cashier', 'cashier_id', unique=True,
+                 sqlite_where=db.text('closed_at IS NULL'), postgresql_where=db.text('closed_at IS NULL')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False, default=MAIN_STORE_ID)
+    cashier_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    opened_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_at = db.Column(db.DateTime)
+    opening_float = db.Column(db.Float, nullable=False, default=0)  # cash in the drawer at open
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    items_sold = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Float, nullable=False, default=0)
+    void_count = db.Column(db.Integer, nullable=False, default=0)  # carts cleared after items were rung up
+    void_amount = db.Column(db.Float, nullable=False, default=0)
+
+    cashier = db.relationship('User')
+    store = db.relationship('Store')
+    payments = db.relationship('ShiftPayment', backref='shift', cascade='all, delete-orphan',
+                               order_by='ShiftPayment.payment_method')
+
+    def __repr__(self):
+        return f"<Shift {self.id} cashier:{self.cashier_id} ({'closed' if self.closed_at else 'open'})>"
+
+
+class ShiftPayment(db.Model):
+    """A shift's takings by one payment method"""
+
+    __tablename__ = 'shift_payments'
+
+    shift_id = db.Column(db.Integer, db.ForeignKey('shifts.id', ondelete='CASCADE'), primary_key=True)
+    payment_method = db.Column(db.String(20), primary_key=True)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ShiftPayment shift:{self.shift_id} {self.payment_method} KES {self.amount}>"
+
+
+#Z-REPORTS
+class ZReport(db.Model):
+    """A closed shift's final totals, written once at close (append-only)"""
+
+    __tablename__ = 'z_reports'
+    __table_args__ = (
+        db.Index('ix_z_reports_cashier', 'cashier_id', 'id'),
+        db.Index('ix_z_reports_store', 'store_id', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)  # the Z number
+    shift_id = db.Column(db.Integer, db.ForeignKey('shifts.id'), unique=True, nullable=False)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False)
+    cashier_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    cashier_name = db.Column(db.String(80), nullable=False)
+    opened_at = db.Column(db.DateTime, nullable=False)
+    closed_at = db.Column(db.DateTime, nullable=False)
+    opening_float = db.Column(db.Float, nullable=False)
+    sales_count = db.Column(db.Integer, nullable=False)
+    items_sold = db.Column(db.Integer, nullable=False)
+    total_amount = db.Column(db.Float, nullable=False)
+    void_count = db.Column(db.Integer, nullable=False)
+    void_amount = db.Column(db.Float, nullable=False)
+    payments = db.Column(db.Text, nullable=False)  # JSON [{payment_method, sales_count, amount}]
+
+    def __repr__(self):
+        return f"<ZReport {self.id} shift:{self.shift_id} KES {self.total_amount}>"
+
+
+for _statement in (
+    "CREATE TRIGGER z_reports_no_update BEFORE UPDATE ON z_reports "
+    "BEGIN SELECT RAISE(ABORT, 'z_reports is append-only'); END",
+    "CREATE TRIGGER z_reports_no_delete BEFORE DELETE ON z_reports "
+    "BEGIN SELECT RAISE(ABORT, 'z_reports is append-only'); END",
+):
+    event.listen(ZReport.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+for _statement in (
+    "CREATE OR REPLACE FUNCTION z_reports_append_only() RETURNS trigger AS $$ "
+    "BEGIN RAISE EXCEPTION 'z_reports is append-only'; END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER z_reports_no_change BEFORE UPDATE OR DELETE ON z_reports "
+    "FOR EACH ROW EXECUTE FUNCTION z_reports_append_only()",
+):
+    event.listen(ZReport.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+
+#CATEGORY HIERARCHY
+class CategoryTree(db.Model):
+    """Closure table of the category hierarchy (kept by category_tree.py)"""
+
+    __tablename__ = 'category_tree'
+    __table_args__ = (
+        db.Index('ix_category_tree_descendant', 'descendant_id', 'depth'),
+    )
+
+    # One row per category and each of its ancestors, and one linking it to itself
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)  # 0 for the self row, 1 for the parent, ...
+
+    def __repr__(self):
+        return f"<CategoryTree {self.ancestor_id} -> {self.descendant_id} ({self.depth})>"
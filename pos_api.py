@@ -0,0 +1,252 @@
+"""Async read-only POS API served on an ASGI event loop.
+
+The POS hot reads are short, I/O-bound queries:
+- product search
+- the product catalog
+- sales history
+- receipts
+
+Under gunicorn's sync workers, each one holds a whole worker while it
+waits on the database. create_asgi_app() serves the same four URLs,
+with the same JSON, from async views. They run on an async SQLAlchemy
+engine using the models in models.py: aiosqlite for SQLite, asyncpg for
+Postgres. Every other path falls through to the Flask app, which is
+mounted under it. Terminals and templates need no changes:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+A waiting request costs a coroutine, not a worker. One process can
+therefore hold thousands of open terminal connections, with at most
+POS_API_POOL_SIZE (+ POS_API_MAX_OVERFLOW) of them in the database at
+once.
+
+Responses are gzip-compressed as the Flask app's are (compression.py):
+from COMPRESS_MIN_SIZE bytes, when the client accepts gzip. The full
+catalog is the big one. Brotli is left to the Flask path.
+
+Authentication reads the same Flask session cookie through the Flask
+app's session interface. As with login_required, a signed-out request
+is redirected to the login page, and a non-cashier gets 403. These
+views bypass the Flask request hooks, so they don't appear in /metrics.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import func, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, RedirectResponse, Response
+from starlette.routing import Mount, Route, request_response
+
+import receipts
+from models import db, MAIN_STORE_ID, Product, Sale, SaleItem, SaleReceipt, Store, StoreStock, User
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+
+def async_url(url):
+    """The async-driver equivalent of a sync database URL"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend} databases')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def access_denied():
+    return JSONResponse({'success': False, 'message': 'Access denied'}, status_code=403)
+
+
+class PosApi:
+    """The async views, bound to one Flask app's config, sessions and database"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.engine = None
+        self.sessions = None
+
+    def session(self):
+        # The engine is created on first use, in the serving process (after any fork)
+        if self.sessions is None:
+            self.start()
+        return self.sessions()
+
+    def start(self):
+        config = self.flask_app.config
+        with self.flask_app.app_context():
+            # db.engine.url has Flask-SQLAlchemy's instance-folder path for relative SQLite URLs
+            url = async_url(db.engine.url)
+        options = {'pool_pre_ping': True}
+        if url.get_backend_name() != 'sqlite':
+            options.update(pool_size=config.get('POS_API_POOL_SIZE', 20),
+                           max_overflow=config.get('POS_API_MAX_OVERFLOW', 10))
+        self.engine = create_async_engine(url, **options)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def stop(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+    async def cashier(self, request, session):
+        """The signed-in cashier, or the response to send instead"""
+        flask_session = self.flask_app.session_interface.open_session(self.flask_app, request) or {}
+        user_id = flask_session.get('_user_id')
+        user = await session.get(User, int(user_id)) if user_id else None
+        if user is None or not user.is_active:
+            return None, RedirectResponse(f"/login?next={quote(request.url.path, safe='')}", status_code=302)
+        if user.role != 'cashier':
+            return None, access_denied()
+        return user, None
+
+    async def on_hand(self, session, store_id, product_ids=None):
+        query = select(StoreStock.product_id, StoreStock.quantity).where(StoreStock.store_id == store_id)
+        if product_ids is not None:
+            if not product_ids:
+                return {}
+            query = query.where(StoreStock.product_id.in_(product_ids))
+        return dict((await session.execute(query)).all())
+
+    async def search_products(self, request):
+        async with self.session() as session:
+            user, denied = await self.cashier(request, session)
+            if denied:
+                return denied
+
+            query = request.query_params.get('q', '').strip()
+            if len(query) < 2:
+                return JSONResponse({'products': []})
+
+            rows = (await session.execute(
+                select(Product.id, Product.name, Product.sku, Product.selling_price).where(
+                    or_(
+                        Product.name.ilike(f'%{query}%'),
+                        Product.sku.ilike(f'%{query}%'),
+                        Product.description.ilike(f'%{query}%')
+                    ),
+                    Product.is_active == True
+                ).limit(10)
+            )).all()
+            on_hand = await self.on_hand(session, user.store_id or MAIN_STORE_ID, [row.id for row in rows])
+
+        return JSONResponse({'products': [{
+            'id': row.id,
+            'name': row.name,
+            'sku': row.sku,
+            'selling_price': float(row.selling_price),
+            'quantity': on_hand.get(row.id, 0)
+        } for row in rows]})
+
+    async def products(self, request):
+        async with self.session() as session:
+            user, denied = await self.cashier(request, session)
+            if denied:
+                return denied
+
+            rows = (await session.execute(
+                select(Product.id, Product.name, Product.sku, Product.selling_price, Product.description)
+                .where(Product.is_active == True)
+            )).all()
+            on_hand = await self.on_hand(session, user.store_id or MAIN_STORE_ID)
+
+        return JSONResponse({'products': [{
+            'id': row.id,
+            'name': row.name,
+            'sku': row.sku,
+            'selling_price': float(row.selling_price),
+            'quantity': on_hand.get(row.id, 0),
+            'description': row.description
+        } for row in rows]})
+
+    async def sales_history(self, request):
+        async with self.session() as session:
+            user, denied = await self.cashier(request, session)
+            if denied:
+                return denied
+
+            items_count = select(func.count(SaleItem.id)).where(SaleItem.sale_id == Sale.id).scalar_subquery()
+            query = select(Sale, items_count).where(Sale.cashier_id == user.id)
+            filter_date = request.query_params.get('date')
+            if filter_date:
+                try:
+                    day = datetime.strptime(filter_date, '%Y-%m-%d').date()
+                    query = query.where(func.date(Sale.sale_date) == day)
+                except ValueError:
+                    pass
+            rows = (await session.execute(query.order_by(Sale.sale_date.desc()).limit(50))).all()
+
+        return JSONResponse({'sales': [{
+            'id': sale.id,
+            'sale_number': sale.sale_number,
+            'sale_date': sale.sale_date.isoformat(),
+            'customer_name': sale.customer_name,
+            'items_count': count,
+            'payment_method': sale.payment_method,
+            'total_amount': float(sale.total_amount)
+        } for sale, count in rows]})
+
+    async def sale_receipt(self, request):
+        async with self.session() as session:
+            user, denied = await self.cashier(request, session)
+            if denied:
+                return denied
+
+            # The snapshot written at checkout (receipts.py): one primary-key read
+            receipt = await session.get(SaleReceipt, request.path_params['sale_id'])
+            if receipt is not None:
+                if receipt.cashier_id != user.id:
+                    return JSONResponse({'success': False, 'message': 'Sale not found'})
+                return Response(b'{"sale":' + receipt.body.encode() + b',"success":true}\n',
+                                media_type='application/json')
+
+            sale = (await session.execute(select(Sale).where(
+                Sale.id == request.path_params['sale_id'], Sale.cashier_id == user.id
+            ))).scalar_one_or_none()
+            if not sale:
+                return JSONResponse({'success': False, 'message': 'Sale not found'})
+            # Sales from before snapshots: the same receipt receipts.rebuild() gives the Flask view
+            lines = (await session.execute(
+                select(Product.name, Product.sku, SaleItem.quantity, SaleItem.unit_price, SaleItem.subtotal)
+                .join(Product, Product.id == SaleItem.product_id)
+                .where(SaleItem.sale_id == sale.id).order_by(SaleItem.id)
+            )).all()
+            store = await session.get(Store, sale.store_id)
+
+        vat_rate = self.flask_app.config.get('RECEIPT_VAT_RATE', 0.16)
+        return JSONResponse({'success': True, 'sale': receipts.snapshot(
+            sale, [tuple(line) for line in lines], user.username, store.name if store else None, vat_rate
+        )})
+
+
+def compressed(flask_app, endpoint):
+    """An async view as an ASGI app, gzipped with the Flask app's COMPRESS_* settings"""
+    app = request_response(endpoint)
+    min_size = flask_app.config.get('COMPRESS_MIN_SIZE', 1024)
+    if min_size is None:
+        return app
+    return GZipMiddleware(app, minimum_size=min_size, compresslevel=flask_app.config.get('COMPRESS_GZIP_LEVEL', 6))
+
+
+def create_asgi_app(flask_app):
+    """Async POS reads in front of the whole Flask app"""
+    api = PosApi(flask_app)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await api.stop()
+
+    # Only the async views: the Flask app compresses its own responses
+    return Starlette(routes=[
+        Route('/cashier/search-products', compressed(flask_app, api.search_products), methods=['GET']),
+        Route('/cashier/products', compressed(flask_app, api.products), methods=['GET']),
+        Route('/cashier/sales-history', compressed(flask_app, api.sales_history), methods=['GET']),
+        Route('/cashier/sale-receipt/{sale_id:int}', compressed(flask_app, api.sale_receipt), methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config.get('POS_API_WSGI_THREADS', 10))),
+    ], lifespan=lifespan)
@@ -0,0 +1,344 @@
+"""Bulk supplier price-list import.
+
+Suppliers upload a CSV or JSON price list (a JSON array of objects, or
+one object per line). The upload is streamed to disk, a
+PriceListImport row is created and the file is processed by a
+background thread:
+
+- rows are read one at a time, never the whole file
+- every PRICE_LIST_CHUNK_SIZE rows are upserted into supplier_products
+  keyed by (supplier_id, sku): one SELECT for the chunk's existing
+  lines, one multi-row INSERT for new ones, one bulk UPDATE for changed
+  ones, and the import's counters, all committed together
+- new lines and renamed ones are rematched to inventory products
+  (catalog_matching.py) in the same transaction
+- the import row records added / changed / unchanged / failed counts
+  and how far through the file it is, so clients can poll for progress.
+  Rows repeating an SKU from earlier in the file are counted as
+  duplicates; the last one wins.
+- an import still 'running' with no progress for PRICE_LIST_STALE_SECONDS
+  lost its worker (a restart or crash). Polling it marks it failed.
+  Chunks already committed stay; uploading the file again finishes the
+  job, since rows are upserted.
+
+Columns: sku and price are required; name, description, unit and
+category (a name or id) are optional for existing lines and name and
+category are required for new ones. Blank optional cells keep the
+current value.
+"""
+import csv
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Category, PriceListImport, SupplierProduct
+import catalog_matching
+
+FIELDS = ('name', 'description', 'price', 'unit', 'category_id')
+MAX_ERRORS = 50
+
+_executor = {'pid': None, 'pool': None}
+_executor_lock = threading.Lock()
+
+
+class PriceListError(ValueError):
+    """A row that can't be imported"""
+
+
+def upload_folder(app):
+    folder = app.config.get('PRICE_LIST_UPLOAD_FOLDER') or os.path.join(app.instance_path, 'price_lists')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def save_upload(stream, path, max_bytes):
+    """Copy an upload stream to `path` in chunks. Returns the size in bytes."""
+    size = 0
+    with open(path, 'wb') as out:
+        while True:
+            chunk = stream.read(64 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                out.close()
+                os.remove(path)
+                raise PriceListError(f'Price list is larger than {max_bytes // (1024 * 1024)} MB')
+            out.write(chunk)
+    return size
+
+
+def _iter_json(text):
+    """Objects from a JSON array or JSON lines, decoded incrementally"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    in_array = None
+    while True:
+        chunk = text.read(64 * 1024)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            # Skip whitespace and the array's punctuation between objects
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) and in_array is None:
+                in_array = buffer[position] == '['
+                if in_array:
+                    position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']' and in_array:
+                return
+            if position >= len(buffer):
+                break
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise PriceListError(f'Invalid JSON near: {buffer[position:position + 40]!r}')
+                break  # need more input
+            position = end
+            yield obj
+        if not chunk:
+            return
+
+
+def iter_rows(binary, filename):
+    """Dicts with lower-cased keys from a CSV or JSON price list"""
+    text = io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+    if filename.lower().endswith('.json') or filename.lower().endswith('.jsonl'):
+        rows = _iter_json(text)
+    else:
+        rows = csv.DictReader(text)
+    for row in rows:
+        if not isinstance(row, dict):
+            raise PriceListError('Each JSON entry must be an object')
+        yield {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+
+
+def _clean(row, categories):
+    """Validated field values for a row; only the fields it actually sets"""
+    sku = str(row.get('sku') or '').strip()
+    if not sku:
+        raise PriceListError('Missing sku')
+    if len(sku) > 50:
+        raise PriceListError(f'SKU {sku[:50]}... is longer than 50 characters')
+
+    values = {}
+    try:
+        values['price'] = round(float(str(row.get('price', '')).replace(',', '')), 2)
+    except ValueError:
+        raise PriceListError(f'{sku}: invalid price {row.get("price")!r}')
+    if values['price'] < 0:
+        raise PriceListError(f'{sku}: price cannot be negative')
+
+    for field in ('name', 'description', 'unit'):
+        value = row.get(field)
+        if value not in (None, ''):
+            values[field] = str(value).strip()
+
+    category = row.get('category', row.get('category_id'))
+    if category not in (None, ''):
+        key = str(category).strip().lower()
+        if key not in categories:
+            raise PriceListError(f'{sku}: unknown category {category!r}')
+        values['category_id'] = categories[key]
+    return sku, values
+
+
+def _apply_chunk(job, supplier_id, chunk, categories, seen):
+    """Upsert one chunk and update the job's counters in the same transaction.
+
+    `seen` is the set of SKUs from earlier chunks of the file. Every row
+    is counted once: as failed, as a duplicate of an earlier row with its
+    SKU, or as added, changed or unchanged. Returns (the SKUs whose
+    inventory match may have changed, every SKU in the chunk).
+    """
+    cleaned = {}
+    duplicates = 0
+    for line_no, row in chunk:
+        try:
+            sku, values = _clean(row, categories)
+        except PriceListError as e:
+            _fail(job, line_no, str(e))
+            continue
+        if sku in seen or sku in cleaned:
+            duplicates += 1
+        cleaned[sku] = (line_no, values)  # a later line for the same SKU wins
+
+    existing = {
+        product.sku: product for product in SupplierProduct.query.filter(
+            SupplierProduct.supplier_id == supplier_id,
+            SupplierProduct.sku.in_(list(cleaned))
+        )
+    } if cleaned else {}
+
+    new_rows, changed_rows, renamed = [], [], []
+    added = changed = 0
+    now = datetime.utcnow()
+    for sku, (line_no, values) in cleaned.items():
+        # A SKU from an earlier chunk was counted there; this line is only a duplicate
+        counted = sku not in seen
+        product = existing.get(sku)
+        if product is None:
+            if 'name' not in values or 'category_id' not in values:
+                if counted:
+                    _fail(job, line_no, f'{sku}: name and category are required for new products')
+                continue
+            new_rows.append(dict(values, sku=sku, supplier_id=supplier_id,
+                                 unit=values.get('unit', 'piece'), created_at=now))
+            if counted:
+                added += 1
+            continue
+        changes = {field: value for field, value in values.items() if getattr(product, field) != value}
+        if changes:
+            changed_rows.append(dict(changes, id=product.id))
+            if counted:
+                changed += 1
+            if 'name' in changes:
+                renamed.append(sku)
+        elif counted:
+            job.unchanged += 1
+
+    if new_rows:
+        db.session.execute(insert(SupplierProduct.__table__), new_rows)
+    if changed_rows:
+        # Bulk UPDATE by primary key; rows with the same changed columns share a statement
+        db.session.execute(update(SupplierProduct), changed_rows)
+    job.added += added
+    job.changed += changed
+    job.duplicates += duplicates
+    job.processed_rows += len(chunk)
+    return [row['sku'] for row in new_rows] + renamed, list(cleaned)
+
+
+def _fail(job, line_no, message):
+    job.failed += 1
+    errors = json.loads(job.errors or '[]')
+    if len(errors) < MAX_ERRORS:
+        errors.append(f'Line {line_no}: {message}')
+        job.errors = json.dumps(errors)
+
+
+def _categories():
+    lookup = {}
+    for category in Category.query.all():
+        lookup[str(category.id)] = category.id
+        lookup[category.name.strip().lower()] = category.id
+    return lookup
+
+
+def run_import(import_id):
+    """Process a queued import. Runs inside an app context."""
+    job = db.session.get(PriceListImport, import_id)
+    job.status = 'running'
+    db.session.commit()
+
+    chunk_size = current_app.config.get('PRICE_LIST_CHUNK_SIZE', 500)
+    categories = _categories()
+    seen = set()
+    try:
+        with open(job.path, 'rb') as binary:
+            chunk = []
+            # Header is line 1 for CSV; good enough as a row reference for JSON too
+            for line_no, row in enumerate(iter_rows(binary, job.filename), start=2):
+                chunk.append((line_no, row))
+                if len(chunk) >= chunk_size:
+                    _commit_chunk(job, chunk, categories, binary.tell(), seen)
+                    chunk = []
+            if chunk:
+                _commit_chunk(job, chunk, categories, job.size_bytes, seen)
+        job.status = 'done'
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(PriceListImport, import_id)
+        job.status = 'failed'
+        _fail(job, job.processed_rows + 1, str(e))
+    job.processed_bytes = job.size_bytes if job.status == 'done' else job.processed_bytes
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    try:
+        os.remove(job.path)
+    except OSError:
+        pass
+    return job
+
+
+def _commit_chunk(job, chunk, categories, position, seen):
+    try:
+        rematch, skus = _apply_chunk(job, job.supplier_id, chunk, categories, seen)
+        catalog_matching.rematch_skus(job.supplier_id, rematch)
+        job.processed_bytes = position
+        db.session.commit()
+    except IntegrityError:
+        # Another upload inserted one of these SKUs first; redo the chunk against the new rows
+        db.session.rollback()
+        rematch, skus = _apply_chunk(job, job.supplier_id, chunk, categories, seen)
+        catalog_matching.rematch_skus(job.supplier_id, rematch)
+        job.processed_bytes = position
+        db.session.commit()
+    seen.update(skus)
+
+
+def expire_stale(job):
+    """Fail a 'running' import whose worker stopped committing chunks. Returns True if it did."""
+    stale = timedelta(seconds=current_app.config.get('PRICE_LIST_STALE_SECONDS', 600))
+    if job.status != 'running' or (job.updated_at or job.created_at) > datetime.utcnow() - stale:
+        return False
+    job.status = 'failed'
+    _fail(job, job.processed_rows + 1, 'Import stopped without finishing; upload the price list again to complete it')
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    try:
+        os.remove(job.path)
+    except OSError:
+        pass
+    return True
+
+
+def _run_in_background(app, import_id):
+    with app.app_context():
+        try:
+            run_import(import_id)
+        except Exception:
+            app.logger.exception('Price list import %s failed', import_id)
+        finally:
+            db.session.remove()
+
+
+def start_import(import_id):
+    """Queue an import on this process's background worker"""
+    app = current_app._get_current_object()
+    with _executor_lock:
+        # One pool per process so forked workers don't share a dead pool
+        if _executor['pid'] != os.getpid():
+            _executor.update(pid=os.getpid(), pool=ThreadPoolExecutor(
+                max_workers=app.config.get('PRICE_LIST_WORKERS', 2), thread_name_prefix='price-list'))
+        pool = _executor['pool']
+    return pool.submit(_run_in_background, app, import_id)
+
+
+def import_to_dict(job):
+    percent = round(100 * job.processed_bytes / job.size_bytes, 1) if job.size_bytes else 100.0
+    return {
+        'id': job.id,
+        'filename': job.filename,
+        'status': job.status,
+        'progress': percent if job.status != 'done' else 100.0,
+        'processed_rows': job.processed_rows,
+        'added': job.added,
+        'changed': job.changed,
+        'unchanged': job.unchanged,
+        'duplicates': job.duplicates,
+        'failed': job.failed,
+        'errors': json.loads(job.errors or '[]'),
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
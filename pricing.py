@@ -0,0 +1,261 @@
+"""Set-based bulk repricing with price history.
+
+A price change selects products by category (sub-categories included),
+supplier and/or SKU list, then moves their selling price in one of
+three ways:
+
+- percent: by a percentage of the current selling price
+- amount: by a fixed amount
+- markup: to cost_price plus a percentage of it
+
+However many products match, it runs as two statements in one
+transaction, so the history always agrees with the prices:
+
+    INSERT INTO price_history ... SELECT id, selling_price, <new price> FROM products WHERE ...
+    UPDATE products SET selling_price = <new price> WHERE ...
+
+A product is skipped if the new price would fall below cost_price (the
+rule edit_product enforces) or would not change. preview() evaluates
+the same expression in one aggregate query plus a small sample.
+
+A change with a future scheduled_for is stored as 'scheduled' and
+applied by `flask apply-price-changes`, which should run from cron
+every few minutes. Its filters are resolved when it is applied.
+"""
+import json
+from datetime import datetime, timezone
+
+import click
+from sqlalchemy import and_, case, insert, literal, select, update
+
+from models import db, PriceChange, PriceHistory, Product
+import category_tree
+
+MODES = ('percent', 'amount', 'markup')
+MAX_SKUS = 10000
+
+
+def parse_filters(data):
+    """{category_id, supplier_id, skus} from a request body. At least one is required."""
+    filters = {}
+    if data.get('category_id'):
+        filters['category_id'] = int(data['category_id'])
+    if data.get('supplier_id'):
+        filters['supplier_id'] = int(data['supplier_id'])
+    skus = data.get('skus') or []
+    if isinstance(skus, str):
+        skus = skus.replace(',', '\n').splitlines()
+    skus = sorted({str(sku).strip() for sku in skus if str(sku).strip()})
+    if len(skus) > MAX_SKUS:
+        raise ValueError(f'At most {MAX_SKUS} SKUs per price change')
+    if skus:
+        filters['skus'] = skus
+    if not filters:
+        raise ValueError('Choose a category, supplier or list of SKUs')
+    return filters
+
+
+def parse_when(value):
+    """Naive UTC datetime from an ISO string, or None for 'now'"""
+    if not value:
+        return None
+    when = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return when
+
+
+def validate(mode, value):
+    if mode not in MODES:
+        raise ValueError(f"Mode must be one of {', '.join(MODES)}")
+    value = float(value)
+    if mode in ('percent', 'markup') and value <= -100:
+        raise ValueError('Percentage must be greater than -100')
+    return value
+
+
+def new_price_expr(mode, value):
+    if mode == 'percent':
+        price = Product.selling_price * (1 + value / 100.0)
+    elif mode == 'amount':
+        price = Product.selling_price + value
+    else:
+        price = Product.cost_price * (1 + value / 100.0)
+    # Numeric so round() works on Postgres too
+    return db.func.round(db.cast(price, db.Numeric(14, 4)), 2)
+
+
+def _criteria(filters):
+    criteria = []
+    if filters.get('category_id'):
+        # A department or category takes in its sub-categories
+        criteria.append(Product.category_id.in_(category_tree.subtree(filters['category_id'])))
+    if filters.get('supplier_id'):
+        criteria.append(Product.supplier_id == filters['supplier_id'])
+    if filters.get('skus'):
+        criteria.append(Product.sku.in_(filters['skus']))
+    return criteria
+
+
+def preview(mode, value, filters, sample=20):
+    """What a change would do, without doing it"""
+    value = validate(mode, value)
+    new_price = new_price_expr(mode, value)
+    criteria = _criteria(filters)
+    below_cost = new_price < Product.cost_price
+    changes = and_(new_price >= Product.cost_price, new_price != Product.selling_price)
+
+    matched, skipped, changing, old_total, new_total = db.session.query(
+        db.func.count(Product.id),
+        db.func.coalesce(db.func.sum(case((below_cost, 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(case((changes, 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(case((changes, Product.selling_price), else_=0)), 0),
+        db.func.coalesce(db.func.sum(case((changes, new_price), else_=0)), 0),
+    ).filter(*criteria).one()
+
+    rows = db.session.query(
+        Product.id, Product.sku, Product.name, Product.cost_price, Product.selling_price, new_price
+    ).filter(*criteria).order_by(Product.id).limit(sample).all()
+
+    return {
+        'matched': matched,
+        'will_change': int(changing),
+        'below_cost': int(skipped),
+        'average_old_price': round(float(old_total) / changing, 2) if changing else None,
+        'average_new_price': round(float(new_total) / changing, 2) if changing else None,
+        'sample': [{
+            'id': product_id,
+            'sku': sku,
+            'name': name,
+            'cost_price': float(cost),
+            'selling_price': float(old),
+            'new_price': float(new),
+            'below_cost': float(new) < float(cost),
+        } for product_id, sku, name, cost, old, new in rows],
+    }
+
+
+def apply_change(change, now=None):
+    """Apply a change in the current transaction. Returns False if it was no longer scheduled."""
+    now = now or datetime.utcnow()
+    # Claim it so two cron runs can't both apply it
+    claimed = db.session.execute(
+        update(PriceChange).where(PriceChange.id == change.id, PriceChange.status == 'scheduled')
+        .values(status='applied', applied_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        return False
+
+    new_price = new_price_expr(change.mode, change.value)
+    criteria = _criteria(json.loads(change.filters))
+    eligible = criteria + [new_price >= Product.cost_price, new_price != Product.selling_price]
+
+    skipped = db.session.query(db.func.count(Product.id)).filter(*criteria, new_price < Product.cost_price).scalar()
+    changed = db.session.execute(insert(PriceHistory).from_select(
+        ['product_id', 'price_change_id', 'old_price', 'new_price', 'changed_at'],
+        select(Product.id, literal(change.id, db.Integer), Product.selling_price, new_price,
+               literal(now, db.DateTime)).where(*eligible)
+    )).rowcount
+    db.session.execute(
+        update(Product).where(*eligible).values(selling_price=new_price)
+        .execution_options(synchronize_session=False)
+    )
+
+    change.status = 'applied'
+    change.applied_at = now
+    change.products_changed = changed
+    change.products_skipped = skipped
+    return True
+
+
+def create_change(mode, value, filters, user_id, scheduled_for=None):
+    """Record a change and apply it now unless it's scheduled for later. The caller commits."""
+    value = validate(mode, value)
+    now = datetime.utcnow()
+    if scheduled_for is not None and scheduled_for <= now:
+        scheduled_for = None
+    change = PriceChange(mode=mode, value=value, filters=json.dumps(filters), status='scheduled',
+                         scheduled_for=scheduled_for or now, created_by=user_id)
+    db.session.add(change)
+    db.session.flush()
+    if scheduled_for is None:
+        apply_change(change, now)
+        # Products already in the session still hold their old price
+        db.session.flush()
+        db.session.expire_all()
+    return change
+
+
+def apply_due(now=None):
+    """Apply scheduled changes that are due, oldest first. Commits each. Returns those applied."""
+    now = now or datetime.utcnow()
+    due = PriceChange.query.filter(
+        PriceChange.status == 'scheduled', PriceChange.scheduled_for <= now
+    ).order_by(PriceChange.scheduled_for, PriceChange.id).all()
+    applied = []
+    for change in due:
+        if apply_change(change):
+            applied.append(change)
+        db.session.commit()
+    return applied
+
+
+def cancel(change):
+    """Cancel a scheduled change. Raises ValueError if it was applied or cancelled first."""
+    # Conditional, like apply_change's claim, so cancelling can't race the cron run
+    cancelled = db.session.execute(
+        update(PriceChange).where(PriceChange.id == change.id, PriceChange.status == 'scheduled')
+        .values(status='cancelled')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not cancelled:
+        db.session.refresh(change)
+        raise ValueError(f'Only scheduled price changes can be cancelled (this one is {change.status})')
+    change.status = 'cancelled'
+
+
+def record_edit(product, old_price):
+    """History row for a single edit_product price change"""
+    if old_price != product.selling_price:
+        db.session.add(PriceHistory(product_id=product.id, old_price=old_price, new_price=product.selling_price))
+
+
+def describe(change):
+    value = f'{change.value:+g}%' if change.mode == 'percent' else \
+        f'{change.value:+g}' if change.mode == 'amount' else f'cost +{change.value:g}%'
+    filters = json.loads(change.filters)
+    scope = []
+    if filters.get('category_id'):
+        scope.append(f"category {filters['category_id']}")
+    if filters.get('supplier_id'):
+        scope.append(f"supplier {filters['supplier_id']}")
+    if filters.get('skus'):
+        scope.append(f"{len(filters['skus'])} SKUs")
+    return f"Price change {value} on {', '.join(scope)}"
+
+
+def change_to_dict(change):
+    return {
+        'id': change.id,
+        'mode': change.mode,
+        'value': change.value,
+        'filters': json.loads(change.filters),
+        'description': describe(change),
+        'status': change.status,
+        'scheduled_for': change.scheduled_for.isoformat() if change.scheduled_for else None,
+        'applied_at': change.applied_at.isoformat() if change.applied_at else None,
+        'products_changed': change.products_changed,
+        'products_skipped': change.products_skipped,
+        'created_by': change.creator.username if change.creator else None,
+        'created_at': change.created_at.isoformat() if change.created_at else None,
+    }
+
+
+def init_app(app):
+    @app.cli.command('apply-price-changes')
+    def apply_price_changes_command():
+        """Apply scheduled price changes that are due."""
+        for change in apply_due():
+            click.echo(f'{describe(change)}: {change.products_changed} changed, '
+                       f'{change.products_skipped} skipped (below cost)')
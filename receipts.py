@@ -0,0 +1,159 @@
+"""Receipt snapshots, serialized once at checkout.
+
+process_sale and the offline sale sync write each sale's receipt in the
+same transaction as the sale itself, as a row in sale_receipts. It
+holds:
+- the lines as sold: name, SKU, quantity, unit price and subtotal
+- the total, and the VAT included in it at RECEIPT_VAT_RATE
+- the sale number, date, payment method and customer
+- the cashier and the store
+
+Fetching or reprinting a receipt is then one primary-key read, and the
+stored JSON goes to the POS without being decoded. Renaming or
+repricing a product later doesn't change receipts already issued.
+
+Sales recorded before snapshots existed have no row. Their receipts are
+rebuilt from sale_items with today's product names. `flask
+backfill-receipts` stores those too.
+"""
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import click
+from flask import current_app
+from sqlalchemy import insert
+
+from json_provider import dumps_bytes
+from models import db, Product, Sale, SaleItem, SaleReceipt, Store, User
+
+BACKFILL_CHUNK_SIZE = 1000
+PRINT_CHUNK_SIZE = 500
+
+
+def snapshot(sale, lines, cashier_name, store_name, vat_rate):
+    """The receipt of a flushed sale. `lines` are (name, sku, quantity, unit_price, subtotal)."""
+    total = round(float(sale.total_amount), 2)
+    vat = round(total * vat_rate / (1 + vat_rate), 2)
+    return {
+        'id': sale.id,
+        'sale_number': sale.sale_number,
+        'sale_date': sale.sale_date.isoformat(),
+        'payment_method': sale.payment_method,
+        'customer_name': sale.customer_name,
+        'cashier': cashier_name,
+        'store': store_name,
+        'items': [{
+            'product_name': name,
+            'sku': sku,
+            'quantity': quantity,
+            'unit_price': float(unit_price),
+            'subtotal': round(float(subtotal), 2)
+        } for name, sku, quantity, unit_price, subtotal in lines],
+        'subtotal': round(total - vat, 2),
+        'vat_rate': vat_rate,
+        'vat': vat,
+        'total_amount': total,
+    }
+
+
+def record(sales, products, store_id):
+    """Add receipts for flushed `sales` rung up at one store. `products` maps product_id -> Product."""
+    store = db.session.get(Store, store_id)
+    vat_rate = current_app.config.get('RECEIPT_VAT_RATE', 0.16)
+    receipts = []
+    for sale in sales:
+        # The signed-in cashier, already in the identity map
+        cashier = db.session.get(User, sale.cashier_id)
+        lines = [(products[item.product_id].name, products[item.product_id].sku, item.quantity, item.unit_price,
+                  item.subtotal) for item in sale.items]
+        receipts.append(SaleReceipt(
+            sale_id=sale.id,
+            cashier_id=sale.cashier_id,
+            body=dumps_bytes(snapshot(sale, lines, cashier.username, store.name if store else None, vat_rate)).decode()
+        ))
+    db.session.add_all(receipts)
+    return receipts
+
+
+def rebuild(sales):
+    """{sale_id: receipt} for sales without a snapshot, from sale_items and today's product names"""
+    if not sales:
+        return {}
+    lines = {sale.id: [] for sale in sales}
+    for row in db.session.query(SaleItem.sale_id, Product.name, Product.sku, SaleItem.quantity, SaleItem.unit_price,
+                                SaleItem.subtotal).join(Product, Product.id == SaleItem.product_id)\
+            .filter(SaleItem.sale_id.in_(list(lines))).order_by(SaleItem.id):
+        lines[row.sale_id].append(tuple(row)[1:])
+    cashiers = dict(db.session.query(User.id, User.username).filter(User.id.in_({s.cashier_id for s in sales})))
+    store_names = dict(db.session.query(Store.id, Store.name).filter(Store.id.in_({s.store_id for s in sales})))
+    vat_rate = current_app.config.get('RECEIPT_VAT_RATE', 0.16)
+    return {sale.id: snapshot(sale, lines[sale.id], cashiers.get(sale.cashier_id), store_names.get(sale.store_id),
+                              vat_rate) for sale in sales}
+
+
+def body(sale_id, cashier_id=None):
+    """A receipt's JSON as bytes, or None if there is no such sale (of `cashier_id`'s, if given)"""
+    receipt = db.session.get(SaleReceipt, sale_id)
+    if receipt is not None:
+        if cashier_id is not None and receipt.cashier_id != cashier_id:
+            return None
+        return receipt.body.encode()
+    sale = db.session.get(Sale, sale_id)
+    if sale is None or (cashier_id is not None and sale.cashier_id != cashier_id):
+        return None
+    return dumps_bytes(rebuild([sale])[sale.id])
+
+
+def response(receipt_body):
+    """`{"sale": receipt, "success": true}` around stored receipt JSON"""
+    return current_app.response_class(b'{"sale":' + receipt_body + b',"success":true}\n',
+                                      mimetype='application/json')
+
+
+def for_day(day, store_id, cashier_id=None, chunk_size=PRINT_CHUNK_SIZE):
+    """Every receipt of one store's day (or of one cashier's), oldest first, read a chunk at a time"""
+    start = datetime.combine(day, time.min)
+    query = db.session.query(Sale.id, SaleReceipt.body)\
+        .outerjoin(SaleReceipt, SaleReceipt.sale_id == Sale.id)\
+        .filter(Sale.store_id == store_id, Sale.sale_date >= start, Sale.sale_date < start + timedelta(days=1))
+    if cashier_id is not None:
+        query = query.filter(Sale.cashier_id == cashier_id)
+    rows = iter(query.order_by(Sale.sale_date, Sale.id).yield_per(chunk_size))
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        missing = [sale_id for sale_id, receipt_body in chunk if receipt_body is None]
+        rebuilt = rebuild(Sale.query.filter(Sale.id.in_(missing)).all()) if missing else {}
+        for sale_id, receipt_body in chunk:
+            yield current_app.json.loads(receipt_body) if receipt_body is not None else rebuilt[sale_id]
+
+
+def backfill(chunk_size=BACKFILL_CHUNK_SIZE, progress=None):
+    """Store receipts for sales that have none, one chunk per transaction. Returns the number written."""
+    written = 0
+    last_id = 0
+    while True:
+        sales = Sale.query.outerjoin(SaleReceipt, SaleReceipt.sale_id == Sale.id)\
+            .filter(SaleReceipt.sale_id.is_(None), Sale.id > last_id)\
+            .order_by(Sale.id).limit(chunk_size).all()
+        if not sales:
+            return written
+        rebuilt = rebuild(sales)
+        db.session.execute(insert(SaleReceipt.__table__), [{
+            'sale_id': sale.id, 'cashier_id': sale.cashier_id, 'body': dumps_bytes(rebuilt[sale.id]).decode()
+        } for sale in sales])
+        db.session.commit()
+        written += len(sales)
+        last_id = sales[-1].id
+        if progress:
+            progress(written)
+
+
+def init_app(app):
+    @app.cli.command('backfill-receipts')
+    @click.option('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE, help='Sales per transaction.')
+    def backfill_receipts_command(chunk_size):
+        """Store receipt snapshots for sales recorded before they existed."""
+        written = backfill(chunk_size, lambda done: click.echo(f'{done} receipts'))
+        click.echo(f'Stored {written} receipts')
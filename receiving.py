@@ -0,0 +1,95 @@
+"""Goods receipt: post a supplier delivery into stock.
+
+receive_goods() applies a whole delivery with a fixed number of
+statements however many lines it has: one UPDATE for product
+quantities, one for the order lines' received quantities, one
+multi-row INSERT of StockMovements (reference_type='purchase_order'),
+the receiving store's StoreStock rows and the stock status refresh. It runs in the current db.session
+transaction; the caller commits, so a delivery is posted completely or
+not at all.
+
+Partial deliveries are supported: receive some quantity of some lines
+and the order becomes 'partial' until every line is fully received,
+when it becomes 'delivered'.
+
+Only approved, ordered and partial orders can be received. The order
+row is locked first, so two receipts of the same order (a manager and
+the supplier, or a double submit) run one after the other and the
+second sees what the first received.
+"""
+from datetime import datetime
+
+from sqlalchemy import case, insert
+
+from models import db, Product, PurchaseOrder, PurchaseOrderItem, StockMovement
+import stock_alerts
+import stores
+
+RECEIVABLE_STATUSES = ('approved', 'ordered', 'partial')
+
+
+def receive_goods(order, user_id, quantities=None):
+    """Receive a delivery against `order`.
+
+    `quantities` maps product_id -> units received; None receives
+    everything still outstanding. Raises ValueError for an order that
+    isn't approved, ordered or partial, products not on the order or
+    more units than are outstanding.
+
+    Returns {product_id: units received}.
+    """
+    # Lock the order, then read its status and lines as committed by any receipt we waited on
+    PurchaseOrder.query.filter_by(id=order.id).with_for_update().populate_existing().one()
+    if order.status not in RECEIVABLE_STATUSES:
+        raise ValueError(f'Cannot receive a {order.status} order')
+    lines = {item.product_id: item for item in PurchaseOrderItem.query.filter_by(purchase_order_id=order.id)
+             .populate_existing()}
+
+    if quantities is None:
+        received = {product_id: item.quantity_outstanding for product_id, item in lines.items()}
+    else:
+        received = {}
+        for product_id, quantity in quantities.items():
+            item = lines.get(product_id)
+            if item is None:
+                raise ValueError(f'Product {product_id} is not on order {order.order_number}')
+            if quantity < 0 or quantity > item.quantity_outstanding:
+                raise ValueError(f'Cannot receive {quantity} of {item.product.name}; '
+                                 f'{item.quantity_outstanding} outstanding')
+            received[product_id] = quantity
+    received = {product_id: quantity for product_id, quantity in received.items() if quantity > 0}
+
+    complete = all(item.quantity_received + received.get(product_id, 0) >= item.quantity_ordered
+                   for product_id, item in lines.items())
+    now = datetime.utcnow()
+
+    if received:
+        Product.query.filter(Product.id.in_(received)).update(
+            {'quantity': Product.quantity + case(received, value=Product.id, else_=0)},
+            synchronize_session='fetch'
+        )
+        by_item = {lines[product_id].id: quantity for product_id, quantity in received.items()}
+        PurchaseOrderItem.query.filter(PurchaseOrderItem.id.in_(by_item)).update(
+            {'quantity_received': PurchaseOrderItem.quantity_received + case(by_item, value=PurchaseOrderItem.id, else_=0)},
+            synchronize_session='fetch'
+        )
+
+        db.session.execute(insert(StockMovement.__table__), [{
+            'product_id': product_id,
+            'store_id': order.store_id,
+            'movement_type': 'in',
+            'quantity': quantity,
+            'reason': f'Received on {order.order_number}',
+            'user_id': user_id,
+            'reference_id': order.id,
+            'reference_type': 'purchase_order',
+            'timestamp': now,
+        } for product_id, quantity in received.items()])
+
+        stock_alerts.refresh_statuses(received.keys())
+        stores.receive(order.store_id, received)
+
+    order.status = 'delivered' if complete else 'partial'
+    if complete:
+        order.delivery_date = now
+    return received
@@ -0,0 +1,235 @@
+"""Replenishment engine: suggested reorder quantities for the whole catalog.
+
+Daily unit sales for every product are pulled in one grouped query and
+laid out as a (products x days) NumPy matrix. Velocity, safety stock,
+days of cover and order quantities are then computed for all products
+at once:
+
+    velocity       exponentially weighted daily sales (recent days count more)
+    reorder point  max(reorder_level, velocity * lead time + safety stock)
+    order up to    max(reorder point + velocity * review period, 2 * reorder_level)
+    order qty      order up to - stock position, for products at/below the reorder point
+
+Stock position is quantity on hand plus units still outstanding on open
+purchase orders, so drafting again doesn't reorder the same shortfall.
+
+Where the nightly forecast job (forecasting.py) has a fresh forecast for
+a product, its expected demand over lead time + review period is used as
+the velocity instead.
+
+Suggestions are grouped by Product.supplier_id into draft purchase
+orders that a manager reviews before they go to the supplier.
+"""
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from models import db, Product, Sale, SaleItem, PurchaseOrder, PurchaseOrderItem
+import forecasting
+
+OPEN_ORDER_STATUSES = ('draft', 'pending', 'approved', 'ordered', 'partial')
+# Grouped sales rows fetched (and scattered into the matrix) per round trip
+SALES_FETCH_ROWS = 100000
+# Days from the window's first day to a sale's day, as an integer, per dialect
+DAY_OFFSET_SQL = {
+    'sqlite': 'CAST(julianday(date(s.sale_date)) - julianday({marker}) AS INTEGER)',
+    'postgresql': 'CAST(s.sale_date AS DATE) - {marker}',
+}
+
+
+def _config(name, default):
+    return current_app.config.get(name, default)
+
+
+def load_daily_sales(product_ids, days, as_of=None):
+    """(len(product_ids) x days) float32 matrix of units sold per day, oldest day first.
+
+    `product_ids` must be a sorted int64 array.
+
+    The grouped rows (up to products x days of them) are read as plain
+    tuples off the DBAPI cursor, a chunk at a time, with the day already
+    turned into an offset by the database. Each chunk goes into the
+    matrix as one NumPy array, without a Row object per row.
+    """
+    as_of = as_of or datetime.utcnow()
+    end = datetime(as_of.year, as_of.month, as_of.day) + timedelta(days=1)
+    start = end - timedelta(days=days)
+    daily = np.zeros((len(product_ids), days), dtype=np.float32)
+
+    connection = db.session.connection()
+    dialect = connection.dialect.name
+    if dialect not in DAY_OFFSET_SQL:
+        raise ValueError(f'No daily sales query for {dialect} databases')
+    marker = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+    if dialect == 'sqlite':
+        # DateTime columns are stored as text; compare them as SQLAlchemy writes them
+        params = (start.date().isoformat(), start.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                  end.strftime('%Y-%m-%d %H:%M:%S.%f'))
+    else:
+        params = (start.date(), start, end)
+    sql = (f'SELECT i.product_id, {DAY_OFFSET_SQL[dialect].format(marker=marker)}, SUM(i.quantity) '
+           f'FROM {SaleItem.__tablename__} i JOIN {Sale.__tablename__} s ON i.sale_id = s.id '
+           f'WHERE s.sale_date >= {marker} AND s.sale_date < {marker} GROUP BY 1, 2')
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(SALES_FETCH_ROWS)
+            if not rows:
+                break
+            rows = np.array(rows, dtype=np.int64)
+            scatter_daily(daily, product_ids, rows[:, 0], rows[:, 1], rows[:, 2].astype(np.float32))
+    finally:
+        cursor.close()
+    return daily
+
+
+def daily_matrix(product_ids, sale_product_ids, day_offsets, units, days):
+    """Scatter (product_id, day offset, units) rows into a dense products x days matrix.
+
+    Expects one row per (product, day), as the grouped query returns.
+    Rows for products not in `product_ids` (e.g. inactive ones) or outside
+    the window are dropped.
+    """
+    daily = np.zeros((len(product_ids), days), dtype=np.float32)
+    scatter_daily(daily, product_ids, sale_product_ids, day_offsets, units)
+    return daily
+
+
+def scatter_daily(daily, product_ids, sale_product_ids, day_offsets, units):
+    """daily_matrix() into an existing matrix, so rows can be added a chunk at a time"""
+    if not len(product_ids):
+        return
+    rows = np.searchsorted(product_ids, sale_product_ids)
+    known = (rows < len(product_ids)) & (product_ids[np.minimum(rows, len(product_ids) - 1)] == sale_product_ids)
+    known &= (day_offsets >= 0) & (day_offsets < daily.shape[1])
+    daily[rows[known], day_offsets[known]] = units[known]
+
+
+def compute_replenishment(daily, quantity, reorder_level, lead_time_days=7, review_days=14,
+                          service_z=1.65, half_life_days=14, forecast_velocity=None):
+    """Vectorized reorder maths for every product (row of `daily`) at once.
+
+    `forecast_velocity`, if given, replaces the historical velocity
+    wherever it isn't NaN (see forecasting.forecast_velocity).
+
+    Returns a dict of arrays: velocity, days_of_cover, reorder_point,
+    order_up_to, order_qty (0 where nothing should be ordered).
+    """
+    days = daily.shape[1]
+    # Weight 1 for the most recent day, halving every half_life_days going back
+    weights = 0.5 ** (np.arange(days - 1, -1, -1, dtype=np.float64) / half_life_days)
+    weights /= weights.sum()
+
+    velocity = daily @ weights
+    variance = (daily * daily) @ weights - velocity ** 2
+    std = np.sqrt(np.maximum(variance, 0))
+    if forecast_velocity is not None:
+        velocity = np.where(np.isnan(forecast_velocity), velocity, forecast_velocity)
+
+    quantity = np.asarray(quantity, dtype=np.float64)
+    reorder_level = np.asarray(reorder_level, dtype=np.float64)
+
+    safety_stock = service_z * std * np.sqrt(lead_time_days)
+    reorder_point = np.maximum(reorder_level, np.ceil(velocity * lead_time_days + safety_stock))
+    order_up_to = np.maximum(reorder_point + np.ceil(velocity * review_days), 2 * reorder_level)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(velocity > 0, quantity / velocity, np.inf)
+
+    order_qty = np.where(quantity <= reorder_point, np.maximum(order_up_to - quantity, 0), 0)
+    return {
+        'velocity': velocity,
+        'days_of_cover': days_of_cover,
+        'reorder_point': reorder_point,
+        'order_up_to': order_up_to,
+        'order_qty': order_qty.astype(np.int64),
+    }
+
+
+def suggest_orders(as_of=None):
+    """Reorder suggestions for every active product that needs one"""
+    products = db.session.query(
+        Product.id, Product.sku, Product.name, Product.supplier_id,
+        Product.quantity, Product.reorder_level, Product.cost_price
+    ).filter(Product.is_active == True).order_by(Product.id).all()
+    if not products:
+        return []
+
+    product_ids = np.fromiter((p.id for p in products), dtype=np.int64, count=len(products))
+    quantity = np.fromiter((p.quantity or 0 for p in products), dtype=np.float64, count=len(products))
+    reorder_level = np.fromiter((p.reorder_level if p.reorder_level is not None else 10 for p in products),
+                                dtype=np.float64, count=len(products))
+
+    # Units already on open orders (drafts included) count towards stock
+    on_order = dict(db.session.query(
+        PurchaseOrderItem.product_id,
+        db.func.sum(PurchaseOrderItem.quantity_ordered - PurchaseOrderItem.quantity_received)
+    ).join(PurchaseOrder, PurchaseOrderItem.purchase_order_id == PurchaseOrder.id).filter(
+        PurchaseOrder.status.in_(OPEN_ORDER_STATUSES)
+    ).group_by(PurchaseOrderItem.product_id).all())
+    position = quantity + np.fromiter((on_order.get(p.id) or 0 for p in products),
+                                      dtype=np.float64, count=len(products))
+
+    lead_time_days = _config('REPLENISHMENT_LEAD_TIME_DAYS', 7)
+    review_days = _config('REPLENISHMENT_REVIEW_DAYS', 14)
+    daily = load_daily_sales(product_ids, _config('REPLENISHMENT_HISTORY_DAYS', 365), as_of)
+    result = compute_replenishment(
+        daily, position, reorder_level,
+        lead_time_days=lead_time_days,
+        review_days=review_days,
+        service_z=_config('REPLENISHMENT_SERVICE_Z', 1.65),
+        forecast_velocity=forecasting.forecast_velocity(product_ids, lead_time_days + review_days),
+    )
+
+    suggestions = []
+    for i in np.flatnonzero(result['order_qty'] > 0):
+        product = products[i]
+        cover = result['days_of_cover'][i]
+        suggestions.append({
+            'product_id': product.id,
+            'sku': product.sku,
+            'name': product.name,
+            'supplier_id': product.supplier_id,
+            'quantity': int(quantity[i]),
+            'on_order': int(position[i] - quantity[i]),
+            'reorder_level': int(reorder_level[i]),
+            'velocity': round(float(result['velocity'][i]), 2),
+            'days_of_cover': None if np.isinf(cover) else round(float(cover), 1),
+            'order_qty': int(result['order_qty'][i]),
+            'unit_cost': float(product.cost_price),
+        })
+    return suggestions
+
+
+def draft_purchase_orders(suggestions, created_by):
+    """One draft PurchaseOrder per supplier. Adds to the session; caller commits."""
+    by_supplier = {}
+    for suggestion in suggestions:
+        by_supplier.setdefault(suggestion['supplier_id'], []).append(suggestion)
+
+    stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+    orders = []
+    for supplier_id, lines in sorted(by_supplier.items()):
+        order = PurchaseOrder(
+            order_number=f'PO-{stamp}-S{supplier_id}-{uuid.uuid4().hex[:4].upper()}',
+            supplier_id=supplier_id,
+            status='draft',
+            total_amount=sum(line['order_qty'] * line['unit_cost'] for line in lines),
+            notes='Drafted by replenishment engine',
+            created_by=created_by
+        )
+        for line in lines:
+            order.items.append(PurchaseOrderItem(
+                product_id=line['product_id'],
+                quantity_ordered=line['order_qty'],
+                quantity_received=0,
+                unit_price=line['unit_cost'],
+                subtotal=line['order_qty'] * line['unit_cost']
+            ))
+        db.session.add(order)
+        orders.append(order)
+    return orders
@@ -0,0 +1,43 @@
+"""Route blueprints, one per role.
+
+- auth: landing page, sign-in/registration and notifications
+- admin: users, suppliers, stores, reports and system tools
+- cashier: the POS and sales history
+- manager: products, pricing, inventory, purchase orders and reports
+- supplier: the supplier portal
+
+Blueprints keep the existing URLs (no url_prefix). Endpoints are named
+'<blueprint>.<view>', e.g. url_for('manager.manage_products').
+"""
+
+
+def register_blueprints(app):
+    from routes import admin, auth, cashier, manager, supplier
+
+    for module in (auth, admin, cashier, manager, supplier):
+        app.register_blueprint(module.bp)
+
+
+def order_items_html(order):
+    """Order lines table for the purchase order detail modals"""
+    if not order.items:
+        return ''
+    rows = ''.join(
+        f"""<tr class="border-t">
+                <td class="py-1">{item.product.name}</td>
+                <td class="py-1 text-right">{item.quantity_ordered}</td>
+                <td class="py-1 text-right">{item.quantity_received}</td>
+                <td class="py-1 text-right">KES {item.unit_price:,.2f}</td>
+                <td class="py-1 text-right">KES {item.subtotal:,.2f}</td>
+            </tr>"""
+        for item in order.items
+    )
+    return f"""
+            <table class="w-full text-sm">
+                <thead><tr class="text-left text-gray-500">
+                    <th>Product</th><th class="text-right">Ordered</th><th class="text-right">Received</th>
+                    <th class="text-right">Unit Price</th><th class="text-right">Subtotal</th>
+                </tr></thead>
+                <tbody>{rows}</tbody>
+            </table>
+    """
@@ -0,0 +1,721 @@
+"""Admin routes: users, suppliers, stores, reports, settings and system tools."""
+from flask import Blueprint, Response, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from models import db, User, Product, Supplier, Sale, SaleItem, StockMovement, Store
+from datetime import datetime, date, timedelta
+from functools import wraps
+import hmac
+from db_routing import read_replica
+import audit
+import fragment_cache
+import metrics
+import slow_queries
+import stores
+from stock_alerts import LOW_STOCK_STATUSES
+
+bp = Blueprint('admin', __name__)
+
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or current_user.role != 'admin':
+            flash('Access denied. Admin only.', 'danger')
+            return redirect(url_for('auth.index'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+@bp.route('/admin/dashboard')
+@login_required
+@admin_required
+def admin_dashboard():
+    """Admin dashboard - user and system management"""
+    
+    total_users = User.query.count()
+    admin_users_count = User.query.filter_by(role='admin').count()
+    active_suppliers_count = Supplier.query.filter_by(is_active=True).count()
+    inactive_users_count = User.query.filter_by(is_active=False).count()
+    
+    
+    user_roles = {
+        'admins': User.query.filter_by(role='admin').count(),
+        'managers': User.query.filter_by(role='manager').count(),
+        'cashiers': User.query.filter_by(role='cashier').count(),
+        'suppliers': User.query.filter_by(role='supplier').count()
+    }
+    
+    
+    users = User.query.all()
+    suppliers = fragment_cache.lazy(Supplier.query.all)
+    
+    return render_template('admin/admin.html',
+                         total_users=total_users,
+                         admin_users_count=admin_users_count,
+                         active_suppliers_count=active_suppliers_count,
+                         inactive_users_count=inactive_users_count,
+                         user_roles=user_roles,
+                         users=users,
+                         suppliers=suppliers,
+                         store_list=stores.active_stores())
+
+# USER MANAGEMENT ROUTES
+@bp.route('/admin/users')
+@login_required
+@admin_required
+def manage_users():
+    """Manage users - admin only"""
+    users = User.query.all()
+    return render_template('admin/users.html', users=users)
+
+@bp.route('/admin/users/add', methods=['POST'])
+@login_required
+@admin_required
+def add_user():
+    """Add new user - admin only"""
+    try:
+        username = request.form.get('username')
+        email = request.form.get('email')
+        role = request.form.get('role')
+        password = request.form.get('password')
+        store_id = request.form.get('store_id', type=int)
+        
+        
+        if not all([username, email, role, password]):
+            return jsonify({'success': False, 'message': 'All fields are required'})
+        
+        if User.query.filter_by(username=username).first():
+            return jsonify({'success': False, 'message': 'Username already exists'})
+        
+        if User.query.filter_by(email=email).first():
+            return jsonify({'success': False, 'message': 'Email already registered'})
+        
+        
+        new_user = User(
+            username=username,
+            email=email,
+            role=role,
+            store_id=store_id,
+            is_active=True
+        )
+        new_user.set_password(password)
+        
+        db.session.add(new_user)
+        db.session.commit()
+        audit.record('create', 'user', new_user.id, f'Created {role} user {username}')
+        
+        return jsonify({'success': True, 'message': 'User created successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/users/delete/<int:user_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_user(user_id):
+    """Delete user - admin only"""
+    try:
+        user = User.query.get_or_404(user_id)
+        
+        
+        if user.id == current_user.id:
+            return jsonify({'success': False, 'message': 'Cannot delete your own account'})
+        
+        username = user.username
+        db.session.delete(user)
+        db.session.commit()
+        audit.record('delete', 'user', user_id, f'Deleted user {username}')
+        
+        return jsonify({'success': True, 'message': 'User deleted successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/users/toggle/<int:user_id>', methods=['POST'])
+@login_required
+@admin_required
+def toggle_user(user_id):
+    """Toggle user active status - admin only"""
+    try:
+        user = User.query.get_or_404(user_id)
+        
+        
+        if user.id == current_user.id:
+            return jsonify({'success': False, 'message': 'Cannot deactivate your own account'})
+        
+        user.is_active = not user.is_active
+        db.session.commit()
+        
+        status = "activated" if user.is_active else "deactivated"
+        audit.record('update', 'user', user.id, f'User {user.username} {status}',
+                     changes={'is_active': [not user.is_active, user.is_active]})
+        return jsonify({'success': True, 'message': f'User {status} successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/users/edit/<int:user_id>', methods=['POST'])
+@login_required
+@admin_required
+def edit_user(user_id):
+    """Edit user - admin only"""
+    try:
+        user = User.query.get_or_404(user_id)
+        username = request.form.get('username')
+        email = request.form.get('email')
+        role = request.form.get('role')
+        
+        
+        existing_user = User.query.filter_by(username=username).first()
+        if existing_user and existing_user.id != user_id:
+            return jsonify({'success': False, 'message': 'Username already taken'})
+        
+       
+        existing_email = User.query.filter_by(email=email).first()
+        if existing_email and existing_email.id != user_id:
+            return jsonify({'success': False, 'message': 'Email already registered'})
+        
+        before = audit.snapshot(user, ['username', 'email', 'role', 'store_id'])
+        user.username = username
+        user.email = email
+        user.role = role
+        if 'store_id' in request.form:
+            user.store_id = request.form.get('store_id', type=int)
+        
+        db.session.commit()
+        audit.record('update', 'user', user.id, f'Edited user {user.username}',
+                     changes=audit.diff(before, user))
+        return jsonify({'success': True, 'message': 'User updated successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/admin/stores/add', methods=['POST'])
+@login_required
+@admin_required
+def add_store():
+    """Add a branch - admin only"""
+    try:
+        code = (request.form.get('code') or '').strip().upper()
+        name = (request.form.get('name') or '').strip()
+        address = request.form.get('address')
+        
+        if not all([code, name]):
+            return jsonify({'success': False, 'message': 'Code and name are required'})
+        
+        if Store.query.filter_by(code=code).first():
+            return jsonify({'success': False, 'message': 'Store code already exists'})
+        
+        store = Store(code=code, name=name, address=address)
+        db.session.add(store)
+        db.session.commit()
+        audit.record('create', 'store', store.id, f'Added store {name} ({code})')
+        
+        return jsonify({'success': True, 'message': 'Store added successfully', 'store_id': store.id})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+# SUPPLIER MANAGEMENT ROUTES
+@bp.route('/admin/suppliers')
+@login_required
+@admin_required
+def manage_suppliers():
+    """Manage suppliers - admin only"""
+    suppliers = Supplier.query.all()
+    return render_template('admin/sup.html', suppliers=suppliers)
+
+@bp.route('/admin/suppliers/add', methods=['POST'])
+@login_required
+@admin_required
+def add_supplier():
+    """Add new supplier - admin only"""
+    try:
+        name = request.form.get('name')
+        contact_person = request.form.get('contact_person')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        address = request.form.get('address')
+        
+       
+        if not all([name, email]):
+            return jsonify({'success': False, 'message': 'Name and email are required'})
+        
+        if Supplier.query.filter_by(email=email).first():
+            return jsonify({'success': False, 'message': 'Supplier with this email already exists'})
+        
+        
+        supplier = Supplier(
+            name=name,
+            contact_person=contact_person,
+            email=email,
+            phone=phone,
+            address=address,
+            is_active=True
+        )
+        
+        db.session.add(supplier)
+        db.session.commit()
+        audit.record('create', 'supplier', supplier.id, f'Added supplier {name}')
+        
+        return jsonify({'success': True, 'message': 'Supplier added successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/suppliers/delete/<int:supplier_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_supplier(supplier_id):
+    """Delete supplier and all associated products - admin only"""
+    try:
+        supplier = Supplier.query.get_or_404(supplier_id)
+        
+        
+        product_count = len(supplier.products)
+        
+        
+        for product in supplier.products:
+            
+            sale_items = SaleItem.query.filter_by(product_id=product.id).all()
+            for sale_item in sale_items:
+                db.session.delete(sale_item)
+            
+           
+            stock_movements = StockMovement.query.filter_by(product_id=product.id).all()
+            for movement in stock_movements:
+                db.session.delete(movement)
+            
+           
+            db.session.delete(product)
+        
+        
+        supplier_name = supplier.name
+        db.session.delete(supplier)
+        db.session.commit()
+        audit.record('delete', 'supplier', supplier_id,
+                     f'Deleted supplier {supplier_name} and {product_count} products')
+        
+        return jsonify({
+            'success': True, 
+            'message': f'Supplier and {product_count} associated products deleted successfully'
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/suppliers/toggle/<int:supplier_id>', methods=['POST'])
+@login_required
+@admin_required
+def toggle_supplier(supplier_id):
+    """Toggle supplier active status - admin only"""
+    try:
+        supplier = Supplier.query.get_or_404(supplier_id)
+        supplier.is_active = not supplier.is_active
+        
+        db.session.commit()
+        
+        status = "activated" if supplier.is_active else "deactivated"
+        audit.record('update', 'supplier', supplier.id, f'Supplier {supplier.name} {status}',
+                     changes={'is_active': [not supplier.is_active, supplier.is_active]})
+        return jsonify({'success': True, 'message': f'Supplier {status} successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/suppliers/edit/<int:supplier_id>', methods=['POST'])
+@login_required
+@admin_required
+def edit_supplier(supplier_id):
+    """Edit supplier - admin only"""
+    try:
+        supplier = Supplier.query.get_or_404(supplier_id)
+        name = request.form.get('name')
+        contact_person = request.form.get('contact_person')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        address = request.form.get('address')
+        
+        
+        existing_supplier = Supplier.query.filter_by(email=email).first()
+        if existing_supplier and existing_supplier.id != supplier_id:
+            return jsonify({'success': False, 'message': 'Email already registered to another supplier'})
+        
+        before = audit.snapshot(supplier, ['name', 'contact_person', 'email', 'phone', 'address'])
+        supplier.name = name
+        supplier.contact_person = contact_person
+        supplier.email = email
+        supplier.phone = phone
+        supplier.address = address
+        
+        db.session.commit()
+        audit.record('update', 'supplier', supplier.id, f'Edited supplier {supplier.name}',
+                     changes=audit.diff(before, supplier))
+        return jsonify({'success': True, 'message': 'Supplier updated successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/admin/suppliers/get/<int:supplier_id>')
+@login_required
+@admin_required
+def get_supplier(supplier_id):
+    """Get supplier data for editing - admin only"""
+    try:
+        supplier = Supplier.query.get_or_404(supplier_id)
+        
+        supplier_data = {
+            'id': supplier.id,
+            'name': supplier.name,
+            'contact_person': supplier.contact_person,
+            'email': supplier.email,
+            'phone': supplier.phone,
+            'address': supplier.address,
+            'is_active': supplier.is_active,
+            'products_count': len(supplier.products)  # Add this line
+        }
+        
+        return jsonify({'success': True, 'supplier': supplier_data})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/suppliers/update', methods=['POST'])
+@login_required
+@admin_required
+def update_supplier_route():
+    """Update supplier - admin only"""
+    try:
+        supplier_id = request.form.get('supplier_id')
+        name = request.form.get('name')
+        contact_person = request.form.get('contact_person')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        address = request.form.get('address')
+        is_active = request.form.get('is_active') == 'on'
+        
+        supplier = Supplier.query.get_or_404(supplier_id)
+        
+        
+        existing_supplier = Supplier.query.filter_by(email=email).first()
+        if existing_supplier and existing_supplier.id != supplier.id:
+            return jsonify({'success': False, 'message': 'Email already registered to another supplier'})
+        
+        # Update supplier
+        before = audit.snapshot(supplier, ['name', 'contact_person', 'email', 'phone', 'address', 'is_active'])
+        supplier.name = name
+        supplier.contact_person = contact_person
+        supplier.email = email
+        supplier.phone = phone
+        supplier.address = address
+        supplier.is_active = is_active
+        
+        db.session.commit()
+        audit.record('update', 'supplier', supplier.id, f'Edited supplier {supplier.name}',
+                     changes=audit.diff(before, supplier))
+        return jsonify({'success': True, 'message': 'Supplier updated successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+    
+# Admin reports routes
+@bp.route('/admin/reports')
+@login_required
+@admin_required
+@read_replica()
+def admin_reports():
+    """Dedicated reports page"""
+    
+    today_sales = Sale.query.filter(db.func.date(Sale.sale_date) == date.today()).all()
+    total_revenue = sum(sale.total_amount for sale in today_sales)
+    
+   
+    low_stock_count = Product.query.filter(Product.stock_status.in_(LOW_STOCK_STATUSES)).count()
+    
+    
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    top_products = db.session.query(
+        Product.name,
+        db.func.sum(SaleItem.quantity).label('total_sold')
+    ).join(SaleItem).join(Sale).filter(
+        Sale.sale_date >= thirty_days_ago
+    ).group_by(Product.id).order_by(db.desc('total_sold')).limit(10).all()
+    
+    return render_template('admin/reports.html',
+                         total_revenue=total_revenue,
+                         low_stock_count=low_stock_count,
+                         top_products=top_products,
+                         sales_count=len(today_sales))
+
+
+@bp.route('/admin/reports/data')
+@login_required
+@admin_required
+@read_replica()
+def get_reports_data():
+    """Get reports data for the modal"""
+    try:
+        from datetime import datetime, timedelta, date
+        
+        # Today's sales
+        today_sales = Sale.query.filter(db.func.date(Sale.sale_date) == date.today()).all()
+        today_revenue = sum(sale.total_amount for sale in today_sales)
+        
+        
+        sales_trend = []
+        labels = []
+        for i in range(6, -1, -1):
+            day = date.today() - timedelta(days=i)
+            day_sales = Sale.query.filter(db.func.date(Sale.sale_date) == day).all()
+            day_revenue = sum(sale.total_amount for sale in day_sales)
+            sales_trend.append(float(day_revenue))
+            labels.append(day.strftime('%a'))
+        
+        
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        top_products = db.session.query(
+            Product.name,
+            db.func.sum(SaleItem.quantity).label('quantity_sold')
+        ).join(SaleItem).join(Sale).filter(
+            Sale.sale_date >= thirty_days_ago
+        ).group_by(Product.id).order_by(db.desc('quantity_sold')).limit(5).all()
+        
+       
+        low_stock_items = Product.query.filter(Product.stock_status.in_(LOW_STOCK_STATUSES)).all()
+        
+        
+        products = Product.query.all()
+        total_inventory_value = sum(product.cost_price * product.quantity for product in products)
+        
+        
+        active_users = User.query.filter_by(is_active=True).count()
+        
+        
+        gross_revenue = Sale.query.with_entities(db.func.sum(Sale.total_amount)).scalar() or 0
+        net_profit = gross_revenue * 0.7  
+        profit_margin = 70  
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'today_revenue': today_revenue,
+                'today_sales': len(today_sales),
+                'low_stock_count': len(low_stock_items),
+                'active_users': active_users,
+                'sales_trend': {
+                    'labels': labels,
+                    'data': sales_trend
+                },
+                'top_products': [{
+                    'name': product.name,
+                    'quantity_sold': product.quantity_sold or 0
+                } for product in top_products],
+                'low_stock_items': [{
+                    'name': product.name,
+                    'quantity': product.quantity,
+                    'reorder_level': product.reorder_level
+                } for product in low_stock_items],
+                'total_inventory_value': total_inventory_value,
+                'gross_revenue': gross_revenue,
+                'net_profit': net_profit,
+                'profit_margin': profit_margin
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/admin/settings')
+@login_required
+@admin_required
+def admin_settings():
+    """Admin settings - admin only"""
+    return render_template('admin/settings.html')
+
+@bp.route('/admin/settings/update', methods=['POST'])
+@login_required
+@admin_required
+def update_settings():
+    """Update system settings - admin only"""
+    try:
+       
+        allow_registration = request.form.get('allow_registration') == 'true'
+        allow_admin_creation = request.form.get('allow_admin_creation') == 'true'
+        
+        
+        return jsonify({'success': True, 'message': 'Settings updated successfully'})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/admin/audit-logs')
+@login_required
+@admin_required
+def audit_logs():
+    """Audit logs - admin only"""
+    # Entries from this worker show up straight away
+    audit.flush()
+    
+    filters = {
+        'actor': request.args.get('actor', '').strip(),
+        'entity_type': request.args.get('entity_type', '').strip(),
+        'entity_id': request.args.get('entity_id', type=int),
+        'start': request.args.get('start', ''),
+        'end': request.args.get('end', '')
+    }
+    
+    actor_id = None
+    if filters['actor']:
+        actor = User.query.filter_by(username=filters['actor']).first()
+        # Unknown user: match nothing rather than everything
+        actor_id = actor.id if actor else -1
+    
+    def parse_date(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        except ValueError:
+            return None
+    
+    entries, next_cursor = audit.query_entries(
+        actor_id=actor_id,
+        entity_type=filters['entity_type'] or None,
+        entity_id=filters['entity_id'],
+        start=parse_date(filters['start']),
+        end=parse_date(filters['end']),
+        before_id=request.args.get('before', type=int),
+        limit=50
+    )
+    
+    return render_template('admin/audit.html',
+                         entries=entries,
+                         next_cursor=next_cursor,
+                         filters=filters,
+                         entity_types=['user', 'supplier', 'product', 'stock', 'category', 'purchase_order'])
+
+@bp.route('/admin/slow-queries')
+@login_required
+@admin_required
+def slow_query_log():
+    """Recent slow queries with their plans - admin only"""
+    return render_template('admin/slow_queries.html',
+                         entries=slow_queries.recent_slow_queries(),
+                         threshold_ms=current_app.config.get('SLOW_QUERY_THRESHOLD_MS'))
+
+@bp.route('/admin/slow-queries/clear', methods=['POST'])
+@login_required
+@admin_required
+def clear_slow_queries():
+    """Clear the slow query log - admin only"""
+    slow_queries.clear()
+    return redirect(url_for('admin.slow_query_log'))
+
+@bp.route('/admin/backup')
+@login_required
+@admin_required
+def backup_system():
+    """Backup system - admin only"""
+    return render_template('admin/backup.html')
+
+@bp.route('/admin/backup/create', methods=['POST'])
+@login_required
+@admin_required
+def create_backup():
+    """Create system backup - admin only"""
+    try:
+        
+        backup_time = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        return jsonify({
+            'success': True, 
+            'message': f'Backup created successfully at {backup_time}'
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics - admin session or METRICS_TOKEN bearer token"""
+    token = current_app.config.get('METRICS_TOKEN')
+    # Bytes: compare_digest rejects non-ASCII str, and the header comes from the client
+    has_token = token and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                              f'Bearer {token}'.encode())
+    is_admin = current_user.is_authenticated and current_user.role == 'admin'
+    if not (has_token or is_admin):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@bp.route('/fix-supplier-profiles')
+@login_required
+def fix_supplier_profiles():
+    """Fix supplier profiles for existing users"""
+    if current_user.role != 'admin':
+        flash('Access denied. Admin only.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    # Get all supplier users
+    supplier_users = User.query.filter_by(role='supplier').all()
+    fixed_count = 0
+    
+    for user in supplier_users:
+        
+        supplier = Supplier.query.filter_by(user_id=user.id).first()
+        if not supplier:
+            
+            supplier = Supplier(
+                name=f"{user.username}'s Company",
+                contact_person=user.username,
+                email=user.email,
+                phone=None,
+                address=None,
+                user_id=user.id,
+                is_active=True
+            )
+            db.session.add(supplier)
+            fixed_count += 1
+            print(f"Created supplier profile for: {user.username}")
+    
+    db.session.commit()
+    flash(f'Fixed {fixed_count} supplier profiles.', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+@bp.route('/fix-suppliers')
+def fix_suppliers():
+    """Fix existing supplier users who don't have profiles"""
+    supplier_users = User.query.filter_by(role='supplier').all()
+    
+    for user in supplier_users:
+        # Check if supplier profile exists
+        existing_supplier = Supplier.query.filter_by(user_id=user.id).first()
+        if not existing_supplier:
+            # Create missing supplier profile
+            supplier = Supplier(
+                name=f"{user.username}'s Company",
+                contact_person=user.username,
+                email=user.email,
+                phone=None,
+                address=None,
+                user_id=user.id,
+                is_active=True
+            )
+            db.session.add(supplier)
+            print(f"Created supplier profile for: {user.username}")
+    
+    db.session.commit()
+    return "Supplier profiles fixed!"
@@ -0,0 +1,178 @@
+"""Sign-in, registration and the landing page, plus notifications for every role."""
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from models import db, User, Supplier, Notification
+
+bp = Blueprint('auth', __name__)
+
+
+@bp.route('/home')
+def home():
+    """Landing page - shows the marketing website"""
+    return render_template('index.html')
+
+@bp.route('/')
+def index():
+    """Main entry point - redirect based on user role"""
+    if current_user.is_authenticated:
+        if current_user.role == 'admin':
+            return redirect(url_for('admin.admin_dashboard'))
+        elif current_user.role == 'cashier':
+            return redirect(url_for('cashier.cashier_dashboard'))
+        elif current_user.role == 'manager':
+            return redirect(url_for('manager.manager_dashboard'))
+        elif current_user.role == 'supplier':
+            return redirect(url_for('supplier.supplier_dashboard'))
+    
+   
+    return redirect(url_for('auth.home'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    """Login page"""
+    if current_user.is_authenticated:
+        return redirect(url_for('auth.index'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+      
+        user = User.query.filter_by(username=username).first()
+        
+        
+        if user and user.check_password(password):
+            if user.is_active:
+                login_user(user)
+                # flash(f'Welcome back, {user.username}!', 'success')
+                
+                
+                return redirect(url_for('auth.index'))
+            else:
+                flash('Your account has been deactivated. Contact admin.', 'danger')
+        else:
+            flash('Invalid username or password', 'danger')
+    
+    return render_template('reglog.html')
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    """User Registration Page"""
+    if current_user.is_authenticated:
+        return redirect(url_for('auth.index'))
+    
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        role = request.form.get('role')  
+        
+        
+        if password != confirm_password:
+            flash('Passwords do not match.', 'warning')
+            return redirect(url_for('auth.register'))
+        
+        if User.query.filter_by(username=username).first():
+            flash('Username already exists.', 'danger')
+            return redirect(url_for('auth.register'))
+        
+        if User.query.filter_by(email=email).first():
+            flash('Email already registered.', 'danger')
+            return redirect(url_for('auth.register'))
+        
+        # Create new user
+        new_user = User(username=username, email=email, role=role, is_active=True)
+        new_user.set_password(password)
+        
+        db.session.add(new_user)
+        db.session.flush()  
+        
+       
+        if role == 'supplier':
+            supplier = Supplier(
+                name=f"{username}'s Company",
+                contact_person=username,
+                email=email,
+                phone=None,
+                address=None,
+                user_id=new_user.id,  
+                is_active=True
+            )
+            db.session.add(supplier)
+            flash('Supplier account created successfully! You can now log in.', 'success')
+        else:
+            flash('Account created successfully! You can now log in.', 'success')
+        
+        db.session.commit()  
+        
+        return redirect(url_for('auth.login'))
+    
+    return render_template('reglog.html')
+
+
+@bp.route('/logout')
+@login_required
+def logout():
+    """Logout current user"""
+    logout_user()
+    # flash('You have been logged out successfully.', 'info')
+    return redirect(url_for('auth.login'))
+
+
+@bp.route('/notifications')
+@login_required
+def get_notifications():
+    """Get notifications for current user"""
+    notifications = Notification.query.filter_by(user_id=current_user.id)\
+        .order_by(Notification.created_at.desc())\
+        .limit(50).all()
+    
+    notifications_data = []
+    for notification in notifications:
+        notifications_data.append({
+            'id': notification.id,
+            'title': notification.title,
+            'message': notification.message,
+            'type': notification.type,
+            'is_read': notification.is_read,
+            'created_at': notification.created_at.isoformat(),
+            'related_type': notification.related_type,
+            'related_id': notification.related_id
+        })
+    
+    return jsonify({'success': True, 'notifications': notifications_data})
+
+@bp.route('/notifications/<int:notification_id>/read', methods=['POST'])
+@login_required
+def mark_notification_read(notification_id):
+    """Mark notification as read"""
+    try:
+        notification = Notification.query.filter_by(
+            id=notification_id, 
+            user_id=current_user.id
+        ).first()
+        
+        if notification:
+            notification.is_read = True
+            db.session.commit()
+            return jsonify({'success': True, 'message': 'Notification marked as read'})
+        else:
+            return jsonify({'success': False, 'message': 'Notification not found'})
+            
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/notifications/read-all', methods=['POST'])
+@login_required
+def mark_all_notifications_read():
+    """Mark all notifications as read"""
+    try:
+        Notification.query.filter_by(user_id=current_user.id, is_read=False)\
+            .update({'is_read': True})
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'All notifications marked as read'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
@@ -0,0 +1,455 @@
+"""Cashier routes: the POS, offline sale sync, shifts, sales history and receipts."""
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, stream_template, url_for
+from flask_login import current_user, login_required
+from models import db, Product, Sale, SaleItem, StockMovement, ZReport
+from datetime import datetime, date, timezone
+from idempotency import idempotent
+from json_provider import stream_array
+import receipts
+import shifts
+import stores
+import uuid
+
+bp = Blueprint('cashier', __name__)
+
+
+@bp.route('/cashier/dashboard')
+@login_required
+def cashier_dashboard():
+    """Cashier dashboard with POS"""
+    if current_user.role != 'cashier':
+        flash('Access denied. Cashier only.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    # The open shift's running totals: one indexed row, however much it has sold
+    shift = shifts.current(current_user.id)
+    
+    return render_template('cashier/cashier.html',
+                         shift=shifts.summary(shift) if shift else None,
+                         current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+@bp.route('/cashier/search-products')
+@login_required
+def search_products():
+    """Search products for POS"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    query = request.args.get('q', '').strip()
+    if len(query) < 2:
+        return jsonify({'products': []})
+    
+    
+    products = Product.query.filter(
+        db.or_(
+            Product.name.ilike(f'%{query}%'),
+            Product.sku.ilike(f'%{query}%'),
+            Product.description.ilike(f'%{query}%')
+        ),
+        Product.is_active == True
+    ).limit(10).all()
+    on_hand = stores.on_hand(stores.current_store_id(), [p.id for p in products])
+    
+    products_data = []
+    for product in products:
+        products_data.append({
+            'id': product.id,
+            'name': product.name,
+            'sku': product.sku,
+            'selling_price': float(product.selling_price),
+            'quantity': on_hand.get(product.id, 0)
+        })
+    
+    return jsonify({'products': products_data})
+
+def _build_sale(data, cashier_id, products, store_id, stock):
+    """Validate a cart and build its Sale, SaleItems and stock changes.
+
+    `products` maps product id -> Product and `stock` product id -> the
+    store's StoreStock (stores.stock_rows). A sync batch shares both dicts
+    so stock checks see the sales earlier in the same batch. Raises
+    ValueError when the cart is empty or the store doesn't have enough stock.
+    """
+    items = data.get('items') or []
+    if not items:
+        raise ValueError('No items in cart')
+
+    # Check the whole cart before touching stock
+    needed = {}
+    for item_data in items:
+        product = products.get(int(item_data['id']))
+        if product:
+            needed[product.id] = needed.get(product.id, 0) + item_data['quantity']
+    for product_id, quantity in needed.items():
+        row = stock.get(product_id)
+        if row is None or row.quantity < quantity:
+            raise ValueError(f'Insufficient stock for {products[product_id].name}')
+
+    sale_date = datetime.utcnow()
+    if data.get('sale_date'):
+        sale_date = datetime.fromisoformat(data['sale_date'])
+        if sale_date.tzinfo:
+            sale_date = sale_date.astimezone(timezone.utc).replace(tzinfo=None)
+
+    sale = Sale(
+        store_id=store_id,
+        sale_number=f"SALE-{sale_date.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6].upper()}",
+        client_id=data.get('client_id'),
+        total_amount=sum(item['price'] * item['quantity'] for item in items),
+        payment_method=data.get('payment_method', 'cash'),
+        cashier_id=cashier_id,
+        sale_date=sale_date,
+        customer_name=data.get('customer_name'),
+        customer_phone=data.get('customer_phone')
+    )
+
+    for item_data in items:
+        product = products.get(int(item_data['id']))
+        if not product:
+            continue
+        sale.items.append(SaleItem(
+            product_id=product.id,
+            quantity=item_data['quantity'],
+            unit_price=item_data['price'],
+            subtotal=item_data['price'] * item_data['quantity']
+        ))
+        stores.adjust(store_id, product, -item_data['quantity'], stock)
+
+    return sale
+
+
+def _stock_out_movements(sale):
+    """Stock movements for a flushed sale"""
+    return [StockMovement(
+        store_id=sale.store_id,
+        product_id=item.product_id,
+        movement_type='out',
+        quantity=item.quantity,
+        reason='sale',
+        user_id=sale.cashier_id,
+        reference_id=sale.id,
+        reference_type='sale'
+    ) for item in sale.items]
+
+
+def _load_products(carts):
+    """Load every product referenced by a list of carts in one query.
+
+    Items whose id doesn't parse are skipped here; _build_sale rejects
+    their cart, so one malformed sale doesn't fail the whole batch.
+    """
+    product_ids = set()
+    for cart in carts:
+        for item in cart.get('items') or []:
+            try:
+                product_ids.add(int(item['id']))
+            except (ValueError, KeyError, TypeError):
+                continue
+    if not product_ids:
+        return {}
+    return {p.id: p for p in Product.query.filter(Product.id.in_(product_ids)).all()}
+
+
+@bp.route('/cashier/process-sale', methods=['POST'])
+@login_required
+@idempotent
+def process_sale():
+    """Process a new sale"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        data = request.get_json()
+        items = data.get('items', [])
+        
+        if not items:
+            return jsonify({'success': False, 'message': 'No items in cart'})
+        
+        # A terminal retrying a queued sale gets the original receipt back
+        if data.get('client_id'):
+            existing = Sale.query.filter_by(client_id=data['client_id']).first()
+            if existing:
+                return receipts.response(receipts.body(existing.id))
+        
+        store_id = stores.current_store_id()
+        products = _load_products([data])
+        try:
+            sale = _build_sale(data, current_user.id, products, store_id, stores.stock_rows(store_id, products))
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)})
+        
+        db.session.add(sale)
+        db.session.flush()
+        db.session.add_all(_stock_out_movements(sale))
+        stores.record_late_sales([sale])
+        shifts.record_sales([sale])
+        receipt = receipts.record([sale], products, store_id)[0]
+        db.session.commit()
+        
+        return receipts.response(receipt.body.encode())
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error processing sale: {str(e)}'})
+
+
+def _sync_sale_chunk(queued, cashier_id, store_id):
+    """Post one chunk of queued sales in a single transaction"""
+    results = {}
+    client_ids = [s.get('client_id') for s in queued if s.get('client_id')]
+    existing = {}
+    if client_ids:
+        existing = {s.client_id: s for s in Sale.query.filter(Sale.client_id.in_(client_ids)).all()}
+    products = _load_products(queued)
+    stock = stores.stock_rows(store_id, products)
+
+    created = []
+    duplicates = []
+    for data in queued:
+        client_id = data.get('client_id')
+        if not client_id:
+            results[id(data)] = {'client_id': None, 'status': 'error', 'message': 'client_id is required'}
+            continue
+        if client_id in existing:
+            duplicates.append((data, existing[client_id]))
+            continue
+        try:
+            sale = _build_sale(data, cashier_id, products, store_id, stock)
+        except (ValueError, KeyError, TypeError) as e:
+            results[id(data)] = {'client_id': client_id, 'status': 'error', 'message': str(e)}
+            continue
+        existing[client_id] = sale
+        created.append((data, sale))
+
+    try:
+        db.session.add_all([sale for _, sale in created])
+        db.session.flush()
+        db.session.add_all([m for _, sale in created for m in _stock_out_movements(sale)])
+        stores.record_late_sales([sale for _, sale in created])
+        shifts.record_sales([sale for _, sale in created])
+        receipts.record([sale for _, sale in created], products, store_id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        for data, _ in created + duplicates:
+            results[id(data)] = {'client_id': data['client_id'], 'status': 'error',
+                                 'message': f'Error processing sale: {str(e)}', 'retry': True}
+    else:
+        for status, pairs in (('created', created), ('duplicate', duplicates)):
+            for data, sale in pairs:
+                results[id(data)] = {'client_id': data['client_id'], 'status': status,
+                                     'sale_id': sale.id, 'sale_number': sale.sale_number}
+
+    return [results[id(data)] for data in queued]
+
+
+@bp.route('/cashier/sync-sales', methods=['POST'])
+@login_required
+def sync_sales():
+    """Sync sales queued by a POS terminal while it was offline"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    queued = data.get('sales') or []
+    
+    if not isinstance(queued, list) or not queued:
+        return jsonify({'success': False, 'message': 'No sales to sync'})
+    
+    max_sales = current_app.config.get('SALE_SYNC_MAX_SALES', 5000)
+    if len(queued) > max_sales:
+        return jsonify({'success': False, 'message': f'Send at most {max_sales} sales per request'}), 413
+    
+    chunk_size = current_app.config.get('SALE_SYNC_CHUNK_SIZE', 200)
+    store_id = stores.current_store_id()
+    results = []
+    for start in range(0, len(queued), chunk_size):
+        results.extend(_sync_sale_chunk(queued[start:start + chunk_size], current_user.id, store_id))
+    
+    return jsonify({
+        'success': True,
+        'synced': sum(1 for r in results if r['status'] in ('created', 'duplicate')),
+        'failed': sum(1 for r in results if r['status'] == 'error'),
+        'results': results
+    })
+
+@bp.route('/cashier/shift')
+@login_required
+def current_shift():
+    """The open shift's running totals"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    shift = shifts.current(current_user.id)
+    return jsonify({'success': True, 'shift': shifts.summary(shift) if shift else None})
+
+@bp.route('/cashier/shift/open', methods=['POST'])
+@login_required
+def open_shift():
+    """Open a shift with the float counted into the drawer"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        shift = shifts.open_shift(current_user.id, stores.current_store_id(), float(data.get('opening_float') or 0))
+        db.session.commit()
+    except (ValueError, TypeError) as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    
+    return jsonify({'success': True, 'shift': shifts.summary(shift)})
+
+@bp.route('/cashier/shift/void', methods=['POST'])
+@login_required
+def void_cart():
+    """Count a cart cleared before checkout against the open shift"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        amount = sum(float(item['price']) * item['quantity'] for item in data.get('items') or [])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid cart'})
+    if amount <= 0:
+        return jsonify({'success': False, 'message': 'No items in cart'})
+    
+    shifts.record_void(current_user.id, stores.current_store_id(), amount)
+    db.session.commit()
+    return jsonify({'success': True})
+
+@bp.route('/cashier/shift/close', methods=['POST'])
+@login_required
+def close_shift():
+    """Close the open shift and return its Z-report"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        report = shifts.close(current_user.id)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    
+    return jsonify({'success': True, 'report': shifts.report_data(report)})
+
+@bp.route('/cashier/z-reports')
+@login_required
+def z_reports():
+    """Z-report history, newest first: a cashier's own, or the store's for managers and admins"""
+    if current_user.role not in ('cashier', 'manager', 'admin'):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    before = request.args.get('before', type=int)
+    if current_user.role == 'cashier':
+        rows = shifts.reports(cashier_id=current_user.id, before=before)
+    else:
+        rows = shifts.reports(store_id=stores.current_store_id(), before=before)
+    
+    return jsonify({'success': True, 'reports': [shifts.report_data(report) for report in rows]})
+
+@bp.route('/cashier/z-reports/<int:report_id>')
+@login_required
+def z_report(report_id):
+    """One Z-report"""
+    if current_user.role not in ('cashier', 'manager', 'admin'):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    report = db.session.get(ZReport, report_id)
+    if current_user.role == 'cashier':
+        allowed = report is not None and report.cashier_id == current_user.id
+    else:
+        allowed = report is not None and report.store_id == stores.current_store_id()
+    if not allowed:
+        return jsonify({'success': False, 'message': 'Z-report not found'})
+    
+    return jsonify({'success': True, 'report': shifts.report_data(report)})
+
+@bp.route('/cashier/sales-history')
+@login_required
+def sales_history():
+    """Get sales history for cashier"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    filter_date = request.args.get('date')
+    query = Sale.query.filter_by(cashier_id=current_user.id)
+    
+    if filter_date:
+        try:
+            filter_date = datetime.strptime(filter_date, '%Y-%m-%d').date()
+            query = query.filter(db.func.date(Sale.sale_date) == filter_date)
+        except ValueError:
+            pass
+    
+    sales = query.order_by(Sale.sale_date.desc()).limit(50).all()
+    
+    sales_data = []
+    for sale in sales:
+        items_count = len(sale.items)
+        sales_data.append({
+            'id': sale.id,
+            'sale_number': sale.sale_number,
+            'sale_date': sale.sale_date.isoformat(),
+            'customer_name': sale.customer_name,
+            'items_count': items_count,
+            'payment_method': sale.payment_method,
+            'total_amount': float(sale.total_amount)
+        })
+    
+    return jsonify({'sales': sales_data})
+
+@bp.route('/cashier/sale-receipt/<int:sale_id>')
+@login_required
+def sale_receipt(sale_id):
+    """Get sale receipt data"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    receipt = receipts.body(sale_id, current_user.id)
+    if receipt is None:
+        return jsonify({'success': False, 'message': 'Sale not found'})
+    
+    return receipts.response(receipt)
+
+@bp.route('/cashier/receipts/print')
+@login_required
+def print_receipts():
+    """Every receipt of a day on one printable page, for end-of-day reprints"""
+    if current_user.role not in ('cashier', 'manager', 'admin'):
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        day = date.today()
+    
+    # Cashiers reprint their own sales; managers and admins the whole store's
+    cashier_id = current_user.id if current_user.role == 'cashier' else None
+    return stream_template('cashier/receipts_print.html', day=day,
+                           receipts=receipts.for_day(day, stores.current_store_id(), cashier_id))
+
+@bp.route('/cashier/products')
+@login_required
+def cashier_products():
+    """Get all products for catalog"""
+    if current_user.role != 'cashier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    on_hand = stores.on_hand(stores.current_store_id())
+    products = db.session.query(
+        Product.id, Product.name, Product.sku, Product.selling_price, Product.description
+    ).filter(Product.is_active == True).yield_per(1000)
+    
+    # The whole catalog: streamed, so it is never built up as one list
+    return stream_array('products', ({
+        'id': product.id,
+        'name': product.name,
+        'sku': product.sku,
+        'selling_price': float(product.selling_price),
+        'quantity': on_hand.get(product.id, 0),
+        'description': product.description
+    } for product in products))
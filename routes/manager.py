@@ -0,0 +1,1308 @@
+"""Manager routes.
+
+Products, bulk repricing, categories, inventory, purchase orders and
+goods receipt, replenishment, supplier catalogs, reports and store
+switching. Admins can use most of them too.
+"""
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from models import db, Product, Category, Supplier, Sale, SaleItem, PurchaseOrder, StockMovement, SupplierProduct, Notification, Forecast, PurchaseOrderItem, PriceChange, PriceHistory, StoreStock
+from datetime import datetime, timedelta
+from db_routing import read_replica
+from idempotency import idempotent
+from json_provider import stream_array
+import audit
+import catalog_matching
+import category_tree
+import fragment_cache
+import pricing
+import receiving
+import replenishment
+import stores
+from stock_alerts import LOW_STOCK_STATUSES
+import uuid
+import json
+from routes import order_items_html
+
+bp = Blueprint('manager', __name__)
+
+
+@bp.route('/manager/dashboard')
+@login_required
+def manager_dashboard():
+    """Store Manager dashboard - UPDATED WITH NOTIFICATIONS"""
+    if current_user.role != 'manager':
+        flash('Access denied. Manager only.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    # Get notifications for current manager
+    notifications = Notification.query.filter_by(user_id=current_user.id)\
+        .order_by(Notification.created_at.desc())\
+        .limit(10).all()
+    
+    # Existing stats code...
+    total_products = Product.query.count()
+    total_categories = Category.query.count()
+    total_suppliers = Supplier.query.count()
+    
+    # Stock figures are for the store the manager is working at
+    store_id = stores.current_store_id()
+    
+    # Stock alerts
+    low_stock_rows = db.session.query(Product, StoreStock.quantity)\
+        .join(StoreStock, StoreStock.product_id == Product.id).filter(
+            StoreStock.store_id == store_id, StoreStock.stock_status.in_(LOW_STOCK_STATUSES)
+        ).all()
+    low_stock_products = [product for product, _ in low_stock_rows]
+    summary = stores.stock_summary(store_id)
+    out_of_stock_count = summary['out_of_stock']
+    
+    # Inventory value
+    total_stock_value = summary['stock_value']
+    store_units = db.session.query(db.func.coalesce(db.func.sum(StoreStock.quantity), 0))\
+        .filter(StoreStock.store_id == store_id).scalar()
+    average_stock_level = store_units / summary['products'] if summary['products'] else 0
+    
+    # Recent stock movements (last 10)
+    recent_movements = StockMovement.query.filter_by(store_id=store_id)\
+        .order_by(StockMovement.timestamp.desc()).limit(10).all()
+    
+    # Today's sales
+    from datetime import datetime, date
+    today_sales = Sale.query.filter(Sale.store_id == store_id, db.func.date(Sale.sale_date) == date.today()).all()
+    today_sales_total = sum(sale.total_amount for sale in today_sales)
+    
+    return render_template('manager/manager.html',
+                         notifications=notifications,  # Add this line
+                         total_products=total_products,
+                         total_categories=total_categories,
+                         total_suppliers=total_suppliers,
+                         low_stock_products=low_stock_products,
+                         store_quantities={product.id: quantity for product, quantity in low_stock_rows},
+                         store_list=stores.active_stores(),
+                         low_stock_count=len(low_stock_products),
+                         out_of_stock_count=out_of_stock_count,
+                         total_stock_value=total_stock_value,
+                         average_stock_level=round(average_stock_level, 1),
+                         recent_movements=recent_movements,
+                         today_sales_total=today_sales_total,
+                         today_sales_count=len(today_sales))
+
+
+#manager/products
+@bp.route('/manager/products')
+@login_required
+def manage_products():
+    """Product management - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        flash('Access denied. Manager access required.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    products = Product.query.all()
+    # Only loaded if the cached dropdowns have to be rendered again
+    categories = fragment_cache.lazy(Category.query.all)
+    suppliers = fragment_cache.lazy(Supplier.query.all)
+    
+    return render_template('manager/products.html',
+                         products=products,
+                         categories=categories,
+                         suppliers=suppliers)
+
+@bp.route('/manager/products/add', methods=['POST'])
+@login_required
+def add_product():
+    """Add new product - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        
+        name = request.form.get('name')
+        sku = request.form.get('sku')
+        description = request.form.get('description')
+        cost_price = float(request.form.get('cost_price', 0))
+        selling_price = float(request.form.get('selling_price', 0))
+        quantity = int(request.form.get('quantity', 0))
+        reorder_level = int(request.form.get('reorder_level', 10))
+        category_id = int(request.form.get('category_id'))
+        supplier_id = int(request.form.get('supplier_id'))
+        
+        
+        if not all([name, sku]):
+            return jsonify({'success': False, 'message': 'Name and SKU are required'})
+        
+        if Product.query.filter_by(sku=sku).first():
+            return jsonify({'success': False, 'message': 'SKU already exists'})
+        
+        if selling_price < cost_price:
+            return jsonify({'success': False, 'message': 'Selling price must be greater than cost price'})
+        
+        
+        product = Product(
+            name=name,
+            sku=sku,
+            description=description,
+            cost_price=cost_price,
+            selling_price=selling_price,
+            quantity=0,
+            reorder_level=reorder_level,
+            category_id=category_id,
+            supplier_id=supplier_id
+        )
+        
+        db.session.add(product)
+        db.session.flush()
+        # Opening stock goes to the store the manager is working at
+        store_id = stores.current_store_id()
+        stores.adjust(store_id, product, quantity)
+        db.session.commit()
+        
+        
+        if quantity > 0:
+            movement = StockMovement(
+                product_id=product.id,
+                store_id=store_id,
+                movement_type='in',
+                quantity=quantity,
+                reason='initial_stock',
+                user_id=current_user.id,
+                reference_type='product_creation'
+            )
+            db.session.add(movement)
+            db.session.commit()
+        
+        audit.record('create', 'product', product.id, f'Added product {name} ({sku})',
+                     changes={'quantity': [0, quantity]} if quantity else None)
+        return jsonify({'success': True, 'message': 'Product added successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/manager/products/edit/<int:product_id>', methods=['POST'])
+@login_required
+def edit_product(product_id):
+    """Edit product - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        product = Product.query.get_or_404(product_id)
+        
+        # Get form data
+        name = request.form.get('name')
+        sku = request.form.get('sku')
+        description = request.form.get('description')
+        cost_price = float(request.form.get('cost_price', 0))
+        selling_price = float(request.form.get('selling_price', 0))
+        reorder_level = int(request.form.get('reorder_level', 10))
+        category_id = int(request.form.get('category_id'))
+        supplier_id = int(request.form.get('supplier_id'))
+        
+        # Check if SKU is taken by another product
+        existing_product = Product.query.filter_by(sku=sku).first()
+        if existing_product and existing_product.id != product_id:
+            return jsonify({'success': False, 'message': 'SKU already taken by another product'})
+        
+        if selling_price < cost_price:
+            return jsonify({'success': False, 'message': 'Selling price must be greater than cost price'})
+        
+        # Update product
+        before = audit.snapshot(product, ['name', 'sku', 'description', 'cost_price', 'selling_price', 'reorder_level', 'category_id', 'supplier_id'])
+        product.name = name
+        product.sku = sku
+        product.description = description
+        product.cost_price = cost_price
+        product.selling_price = selling_price
+        product.reorder_level = reorder_level
+        product.category_id = category_id
+        product.supplier_id = supplier_id
+        pricing.record_edit(product, before['selling_price'])
+        if reorder_level != before['reorder_level']:
+            stores.refresh_statuses([product.id])
+        
+        db.session.commit()
+        audit.record('update', 'product', product.id, f'Edited product {product.name}',
+                     changes=audit.diff(before, product))
+        return jsonify({'success': True, 'message': 'Product updated successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/manager/products/delete/<int:product_id>', methods=['POST'])
+@login_required
+def delete_product(product_id):
+    """Delete product - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        product = Product.query.get_or_404(product_id)
+        
+        # Allow deletion if product is inactive, regardless of sales history
+        if not product.is_active:
+            # Delete associated records first
+            # Delete sale items
+            SaleItem.query.filter_by(product_id=product_id).delete()
+            
+            # Delete stock movements
+            StockMovement.query.filter_by(product_id=product_id).delete()
+            
+            # Delete purchase order lines
+            PurchaseOrderItem.query.filter_by(product_id=product_id).delete()
+            
+            # Now delete the product
+            product_label = f'{product.name} ({product.sku})'
+            db.session.delete(product)
+            db.session.commit()
+            audit.record('delete', 'product', product_id, f'Deleted inactive product {product_label}')
+            
+            return jsonify({'success': True, 'message': 'Inactive product deleted successfully'})
+        else:
+            # For active products, keep the existing restrictions
+            if product.sale_items:
+                sale_count = len(product.sale_items)
+                return jsonify({
+                    'success': False, 
+                    'message': f'Cannot delete active product with {sale_count} sales records. Deactivate it first.'
+                })
+            
+            if product.stock_movements:
+                movement_count = len(product.stock_movements)
+                return jsonify({
+                    'success': False, 
+                    'message': f'Cannot delete active product with {movement_count} stock movements. Deactivate it first.'
+                })
+            
+            product_label = f'{product.name} ({product.sku})'
+            db.session.delete(product)
+            db.session.commit()
+            audit.record('delete', 'product', product_id, f'Deleted product {product_label}')
+            return jsonify({'success': True, 'message': 'Product deleted successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+
+@bp.route('/manager/products/<int:product_id>/details')
+@login_required
+def get_product_details(product_id):
+    """Get product details for deletion confirmation"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        product = Product.query.get_or_404(product_id)
+        
+        return jsonify({
+            'success': True,
+            'product': {
+                'id': product.id,
+                'name': product.name,
+                'is_active': product.is_active,
+                'sku': product.sku
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})    
+    
+@bp.route('/manager/products/toggle/<int:product_id>', methods=['POST'])
+@login_required
+def toggle_product(product_id):
+    """Toggle product active status - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        product = Product.query.get_or_404(product_id)
+        product.is_active = not product.is_active
+        
+        db.session.commit()
+        
+        status = "activated" if product.is_active else "deactivated"
+        audit.record('update', 'product', product.id, f'Product {product.name} {status}',
+                     changes={'is_active': [not product.is_active, product.is_active]})
+        return jsonify({
+            'success': True, 
+            'message': f'Product {status} successfully',
+            'is_active': product.is_active
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})   
+
+@bp.route('/manager/products/stock/<int:product_id>', methods=['POST'])
+@login_required
+def adjust_stock(product_id):
+    """Adjust product stock - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        product = Product.query.get_or_404(product_id)
+        adjustment = int(request.form.get('adjustment', 0))
+        adjustment_type = request.form.get('adjustment_type', 'add')  # Add this line
+        reason = request.form.get('reason', 'stock_adjustment')
+        
+        if adjustment == 0:
+            return jsonify({'success': False, 'message': 'No stock change specified'})
+        
+        # Adjustments apply to the store the manager is working at
+        store_id = stores.current_store_id()
+        old_quantity = stores.on_hand(store_id, [product_id]).get(product_id, 0)
+        
+        # Handle different adjustment types
+        if adjustment_type == 'add':
+            new_quantity = old_quantity + adjustment
+            movement_type = 'in'
+        elif adjustment_type == 'remove':
+            new_quantity = old_quantity - adjustment
+            movement_type = 'out'
+        elif adjustment_type == 'set':
+            new_quantity = adjustment
+            # Calculate the difference for movement tracking
+            adjustment_amount = adjustment - old_quantity
+            movement_type = 'in' if adjustment_amount > 0 else 'out'
+            adjustment = abs(adjustment_amount)
+        else:
+            return jsonify({'success': False, 'message': 'Invalid adjustment type'})
+        
+        if new_quantity < 0:
+            return jsonify({'success': False, 'message': 'Stock cannot be negative'})
+        
+        # Update stock
+        stores.adjust(store_id, product, new_quantity - old_quantity)
+        
+        # Record stock movement
+        movement = StockMovement(
+            product_id=product_id,
+            store_id=store_id,
+            movement_type=movement_type,
+            quantity=abs(adjustment),
+            reason=reason,
+            user_id=current_user.id,
+            reference_type='manual_adjustment'
+        )
+        db.session.add(movement)
+        db.session.commit()
+        audit.record('adjust', 'stock', product_id,
+                     f'Stock for {product.name} {adjustment_type} {adjustment} ({reason})',
+                     changes={'quantity': [old_quantity, new_quantity]})
+        
+        action = "updated"
+        return jsonify({
+            'success': True, 
+            'message': f'Stock {action} successfully. New quantity: {new_quantity}'
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+
+# BULK REPRICING
+@bp.route('/manager/pricing/preview', methods=['POST'])
+@login_required
+def preview_price_change():
+    """Preview a bulk price change - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        data = request.get_json() or {}
+        filters = pricing.parse_filters(data)
+        return jsonify({'success': True, 'preview': pricing.preview(data.get('mode'), data.get('value', 0), filters)})
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/manager/pricing/apply', methods=['POST'])
+@login_required
+@idempotent
+def apply_price_change():
+    """Apply a bulk price change now or schedule it - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        data = request.get_json() or {}
+        filters = pricing.parse_filters(data)
+        change = pricing.create_change(data.get('mode'), data.get('value', 0), filters, current_user.id,
+                                       scheduled_for=pricing.parse_when(data.get('scheduled_for')))
+        db.session.commit()
+        
+        if change.status == 'applied':
+            audit.record('update', 'price_change', change.id, pricing.describe(change),
+                         changes={'products_changed': change.products_changed})
+            message = f'{change.products_changed} prices updated'
+            if change.products_skipped:
+                message += f', {change.products_skipped} skipped (would be below cost)'
+        else:
+            audit.record('create', 'price_change', change.id, f'Scheduled {pricing.describe(change)}')
+            message = f"Price change scheduled for {change.scheduled_for.strftime('%Y-%m-%d %H:%M')} UTC"
+        return jsonify({'success': True, 'message': message, 'change': pricing.change_to_dict(change)})
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/manager/pricing/changes')
+@login_required
+@read_replica()
+def price_changes_data():
+    """Recent and scheduled bulk price changes"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    query = PriceChange.query
+    if request.args.get('status'):
+        query = query.filter(PriceChange.status == request.args['status'])
+    changes = query.order_by(PriceChange.id.desc()).limit(50).all()
+    return jsonify({'success': True, 'changes': [pricing.change_to_dict(c) for c in changes]})
+
+
+@bp.route('/manager/pricing/changes/<int:change_id>/cancel', methods=['POST'])
+@login_required
+def cancel_price_change(change_id):
+    """Cancel a scheduled price change - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        change = PriceChange.query.get_or_404(change_id)
+        pricing.cancel(change)
+        db.session.commit()
+        audit.record('update', 'price_change', change.id, f'Cancelled {pricing.describe(change)}')
+        return jsonify({'success': True, 'message': 'Price change cancelled'})
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/manager/products/<int:product_id>/price-history')
+@login_required
+@read_replica()
+def product_price_history(product_id):
+    """Selling price changes for a product, newest first"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    Product.query.get_or_404(product_id)
+    history = PriceHistory.query.filter_by(product_id=product_id)\
+        .order_by(PriceHistory.changed_at.desc(), PriceHistory.id.desc()).limit(100).all()
+    return jsonify({
+        'success': True,
+        'history': [{
+            'old_price': float(h.old_price),
+            'new_price': float(h.new_price),
+            'changed_at': h.changed_at.isoformat(),
+            'price_change_id': h.price_change_id
+        } for h in history]
+    })
+
+
+
+# CATEGORIES ROUTE
+@bp.route('/manager/categories')
+@login_required
+def manage_categories():
+    """Category management - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        flash('Access denied. Manager access required.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    # Departments first, each followed by its sub-categories, with their subtree totals
+    today = datetime.utcnow().date()
+    return render_template('manager/categories.html', categories=category_tree.ordered(),
+                           totals=category_tree.rollup(today - timedelta(days=29), today, stores.current_store_id()))
+
+@bp.route('/manager/categories/report')
+@login_required
+def category_report():
+    """Stock value and sales at this store rolled up to every category, sub-categories included"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        today = datetime.utcnow().date()
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else today
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') \
+            else end - timedelta(days=29)
+        if start > end:
+            return jsonify({'success': False, 'message': 'Start date must be before end date'}), 400
+        if (end - start).days > 366:
+            return jsonify({'success': False, 'message': 'Reports cover at most a year'}), 400
+        
+        # Like the other manager reports, for the store the manager is working at
+        totals = category_tree.rollup(start, end, stores.current_store_id())
+        return jsonify({
+            'success': True,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'categories': [{
+                'id': category.id,
+                'name': category.name,
+                'parent_id': category.parent_id,
+                'depth': depth,
+                **totals[category.id]
+            } for category, depth in category_tree.ordered()]
+        })
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+#crud
+@bp.route('/manager/categories/add', methods=['POST'])
+@login_required
+def add_category():
+    """Add new category - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        name = request.form.get('name')
+        description = request.form.get('description')
+        parent_id = request.form.get('parent_id', type=int)
+        
+        # Validation
+        if not name:
+            return jsonify({'success': False, 'message': 'Category name is required'})
+        
+        if Category.query.filter_by(name=name).first():
+            return jsonify({'success': False, 'message': 'Category name already exists'})
+        
+        if parent_id is not None and db.session.get(Category, parent_id) is None:
+            return jsonify({'success': False, 'message': 'Parent category not found'})
+        
+        # Create new category
+        category = Category(name=name, description=description, parent_id=parent_id)
+        db.session.add(category)
+        db.session.flush()
+        category_tree.attach(category)
+        db.session.commit()
+        audit.record('create', 'category', category.id, f'Added category {name}')
+        
+        return jsonify({'success': True, 'message': 'Category created successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/manager/categories/edit/<int:category_id>', methods=['POST'])
+@login_required
+def edit_category(category_id):
+    """Edit category - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        category = Category.query.get_or_404(category_id)
+        name = request.form.get('name')
+        description = request.form.get('description')
+        
+        # Check if name is taken by another category
+        existing_category = Category.query.filter_by(name=name).first()
+        if existing_category and existing_category.id != category_id:
+            return jsonify({'success': False, 'message': 'Category name already taken'})
+        
+        before = audit.snapshot(category, ['name', 'description', 'parent_id'])
+        category.name = name
+        category.description = description
+        # A form without parent_id leaves the category where it is; an empty one makes it a department
+        if 'parent_id' in request.form:
+            try:
+                category_tree.move(category, request.form.get('parent_id', type=int))
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({'success': False, 'message': str(e)})
+        db.session.commit()
+        audit.record('update', 'category', category.id, f'Edited category {category.name}',
+                     changes=audit.diff(before, category))
+        
+        return jsonify({'success': True, 'message': 'Category updated successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/manager/categories/delete/<int:category_id>', methods=['POST'])
+@login_required
+def delete_category(category_id):
+    """Delete category - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        category = Category.query.get_or_404(category_id)
+        
+        
+        if category.products:
+            return jsonify({
+                'success': False, 
+                'message': f'Cannot delete category with {len(category.products)} products. Move products first.'
+            })
+        
+        if category.children:
+            return jsonify({
+                'success': False,
+                'message': f'Cannot delete category with {len(category.children)} sub-categories. Move them first.'
+            })
+        
+        category_name = category.name
+        category_tree.detach(category)
+        db.session.delete(category)
+        db.session.commit()
+        audit.record('delete', 'category', category_id, f'Deleted category {category_name}')
+        
+        return jsonify({'success': True, 'message': 'Category deleted successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+# INVENTORY ROUTE  
+@bp.route('/manager/inventory')
+@login_required
+def manage_inventory():
+    if current_user.role not in ['admin', 'manager']:
+        flash('Access denied', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    products = Product.query.all()
+    stock_movements = StockMovement.query.order_by(StockMovement.timestamp.desc()).limit(50).all()
+    total_stock_value = sum(p.cost_price * p.quantity for p in products)
+    low_stock_count = Product.query.filter(Product.stock_status.in_(LOW_STOCK_STATUSES)).count()
+    
+    return render_template('manager/inventory.html',
+                         products=products,
+                         stock_movements=stock_movements,
+                         total_stock_value=total_stock_value,
+                         low_stock_count=low_stock_count)
+
+#Purchase order
+@bp.route('/manager/purchase-orders')
+@login_required
+def manage_purchase_orders():
+    """Purchase orders management - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        flash('Access denied. Manager access required.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    purchase_orders = PurchaseOrder.query.order_by(PurchaseOrder.order_date.desc()).all()
+    suppliers = fragment_cache.lazy(Supplier.query.filter_by(is_active=True).all)
+    
+    return render_template('manager/purchaseorders.html',
+                         purchase_orders=purchase_orders,
+                         suppliers=suppliers)
+
+@bp.route('/manager/purchase-orders/add', methods=['POST'])
+@login_required
+@idempotent
+def add_purchase_order():
+    """Add new purchase order - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier_id = int(request.form.get('supplier_id'))
+        expected_delivery = request.form.get('expected_delivery')
+        notes = request.form.get('notes')
+        
+        # Order lines: a JSON list in `items`, or the single product fields
+        if request.form.get('items'):
+            lines = json.loads(request.form.get('items'))
+        elif request.form.get('product_id'):
+            lines = [{
+                'product_id': request.form.get('product_id'),
+                'quantity': request.form.get('quantity', 1),
+                'unit_price': request.form.get('unit_price', 0)
+            }]
+        else:
+            lines = []
+        
+        # Generate order number
+        from datetime import datetime
+        order_number = f"PO-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4].upper()}"
+        
+        # Get supplier information
+        supplier = Supplier.query.get(supplier_id)
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier not found'})
+        
+        # Create purchase order
+        purchase_order = PurchaseOrder(
+            order_number=order_number,
+            supplier_id=supplier_id,
+            store_id=stores.current_store_id(),
+            status='pending',
+            expected_delivery=datetime.strptime(expected_delivery, '%Y-%m-%d') if expected_delivery else None,
+            notes=notes,
+            created_by=current_user.id
+        )
+        
+        for line in lines:
+            quantity = int(line.get('quantity', 1))
+            unit_price = float(line.get('unit_price', 0))
+            if quantity <= 0:
+                return jsonify({'success': False, 'message': 'Quantity must be at least 1'})
+            purchase_order.items.append(PurchaseOrderItem(
+                product_id=int(line['product_id']),
+                quantity_ordered=quantity,
+                quantity_received=0,
+                unit_price=unit_price,
+                subtotal=quantity * unit_price
+            ))
+        
+        # Calculate total amount
+        total_amount = sum(item.subtotal for item in purchase_order.items)
+        purchase_order.total_amount = total_amount
+        
+        db.session.add(purchase_order)
+        db.session.flush()
+        
+        
+        if supplier.user_id:
+            notification = Notification(
+                user_id=supplier.user_id,
+                title='New Purchase Order',
+                message=f'New purchase order #{order_number} has been created for you. Total: KES {total_amount:,.2f}',
+                type='info',
+                related_type='purchase_order',
+                related_id=purchase_order.id
+            )
+            db.session.add(notification)
+        
+        db.session.commit()
+        audit.record('create', 'purchase_order', purchase_order.id,
+                     f'Created purchase order {order_number} for {supplier.name} (KES {total_amount:,.2f})')
+        
+        return jsonify({
+            'success': True, 
+            'message': 'Purchase order created successfully',
+            'order_id': purchase_order.id
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/manager/purchase-orders/update-status/<int:order_id>', methods=['POST'])
+@login_required
+def update_po_status(order_id):
+    """Update purchase order status - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        purchase_order = PurchaseOrder.query.get_or_404(order_id)
+        new_status = request.form.get('status')
+        
+        valid_statuses = ['draft', 'pending', 'approved', 'ordered', 'delivered', 'cancelled']
+        if new_status not in valid_statuses:
+            return jsonify({'success': False, 'message': 'Invalid status'})
+        
+        old_status = purchase_order.status
+        if new_status == 'delivered' and old_status != 'delivered':
+            # Receive everything still outstanding into stock
+            receiving.receive_goods(purchase_order, current_user.id)
+        purchase_order.status = new_status
+        
+        # Drafts are hidden from the supplier until a manager sends them
+        if old_status == 'draft' and new_status == 'pending' and purchase_order.supplier.user_id:
+            db.session.add(Notification(
+                user_id=purchase_order.supplier.user_id,
+                title='New Purchase Order',
+                message=f'New purchase order #{purchase_order.order_number} has been created for you. Total: KES {purchase_order.total_amount:,.2f}',
+                type='info',
+                related_type='purchase_order',
+                related_id=purchase_order.id
+            ))
+        
+        # If delivered, update delivery date
+        if new_status == 'delivered':
+            purchase_order.delivery_date = datetime.utcnow()
+        
+        db.session.commit()
+        audit.record('update', 'purchase_order', purchase_order.id,
+                     f'Purchase order {purchase_order.order_number} marked {new_status}',
+                     changes={'status': [old_status, new_status]})
+        
+        return jsonify({'success': True, 'message': f'Order status updated to {new_status}'})
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+
+@bp.route('/manager/purchase-orders/<int:order_id>/receive', methods=['POST'])
+@login_required
+@idempotent
+def receive_purchase_order(order_id):
+    """Receive a full or partial delivery into stock - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        purchase_order = PurchaseOrder.query.get_or_404(order_id)
+        
+        # {"items": [{"product_id": 1, "quantity": 5}, ...]}; no items receives everything outstanding
+        data = request.get_json(silent=True) or {}
+        quantities = None
+        if data.get('items'):
+            quantities = {}
+            for line in data['items']:
+                product_id = int(line['product_id'])
+                quantities[product_id] = quantities.get(product_id, 0) + int(line['quantity'])
+        
+        old_status = purchase_order.status
+        received = receiving.receive_goods(purchase_order, current_user.id, quantities)
+        db.session.commit()
+        audit.record('receive', 'purchase_order', purchase_order.id,
+                     f'Received {sum(received.values())} units on {purchase_order.order_number}',
+                     changes={'status': [old_status, purchase_order.status], 'received': received})
+        
+        return jsonify({
+            'success': True,
+            'message': f'Received {sum(received.values())} units',
+            'status': purchase_order.status,
+            'received': received
+        })
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/manager/replenishment')
+@login_required
+@read_replica()
+def replenishment_suggestions():
+    """Suggested reorder quantities for the whole catalog - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    suggestions = replenishment.suggest_orders()
+    return jsonify({'success': True, 'suggestions': suggestions})
+
+@bp.route('/manager/replenishment/draft', methods=['POST'])
+@login_required
+@idempotent
+def draft_replenishment_orders():
+    """Draft one purchase order per supplier from the current suggestions - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        suggestions = replenishment.suggest_orders()
+        if not suggestions:
+            return jsonify({'success': True, 'message': 'Nothing needs reordering', 'orders': []})
+        
+        orders = replenishment.draft_purchase_orders(suggestions, current_user.id)
+        db.session.commit()
+        for order in orders:
+            audit.record('create', 'purchase_order', order.id,
+                         f'Drafted purchase order {order.order_number} (KES {order.total_amount:,.2f})')
+        
+        return jsonify({
+            'success': True,
+            'message': f'Drafted {len(orders)} purchase order(s) for {len(suggestions)} product(s)',
+            'orders': [{'id': o.id, 'order_number': o.order_number, 'supplier_id': o.supplier_id,
+                        'total_amount': o.total_amount} for o in orders]
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/manager/orders/<int:order_id>/details')
+@login_required
+def manager_get_order_details(order_id):
+    """Manager views purchase order details"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    order = PurchaseOrder.query.get_or_404(order_id)
+    
+    html = f"""
+        <div class="space-y-4">
+            <div class="grid grid-cols-2 gap-4">
+                <div><strong>Order Number:</strong> {order.order_number}</div>
+                <div><strong>Status:</strong> <span class="px-2 py-1 bg-blue-100 rounded">{order.status}</span></div>
+            </div>
+            
+            <div class="grid grid-cols-2 gap-4">
+                <div><strong>Supplier:</strong> {order.supplier.name}</div>
+                <div><strong>Contact:</strong> {order.supplier.email}</div>
+            </div>
+            
+            <div class="grid grid-cols-2 gap-4">
+                <div><strong>Order Date:</strong> {order.order_date.strftime('%b %d, %Y')}</div>
+                <div><strong>Expected Delivery:</strong> {order.expected_delivery.strftime('%b %d, %Y') if order.expected_delivery else 'Not set'}</div>
+            </div>
+            
+            <div><strong>Total Amount:</strong> <span class="text-green-600 font-bold">KES {order.total_amount:,.2f}</span></div>
+            
+            {order_items_html(order)}
+            
+            <div><strong>Notes:</strong><br>{order.notes or 'No notes'}</div>
+        </div>
+    """
+    
+    return jsonify({'success': True, 'html': html}) 
+
+@bp.route('/manager/orders/<int:order_id>/edit-data')
+@login_required
+def get_order_edit_data(order_id):
+    """Get order data for editing"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    order = PurchaseOrder.query.get_or_404(order_id)
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'id': order.id,
+            'supplier_id': order.supplier_id,
+            'expected_delivery': order.expected_delivery.strftime('%Y-%m-%d') if order.expected_delivery else '',
+            'notes': order.notes or '',
+            'total_amount': float(order.total_amount)
+        }
+    })  
+
+@bp.route('/manager/purchase-orders/update/<int:order_id>', methods=['POST'])
+@login_required
+def update_purchase_order(order_id):
+    """Update purchase order"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        order = PurchaseOrder.query.get_or_404(order_id)
+        
+        supplier_id = request.form.get('supplier_id')
+        expected_delivery = request.form.get('expected_delivery')
+        notes = request.form.get('notes')
+        
+        # Update order
+        before = audit.snapshot(order, ['supplier_id', 'expected_delivery', 'notes'])
+        order.supplier_id = int(supplier_id)
+        order.expected_delivery = datetime.strptime(expected_delivery, '%Y-%m-%d') if expected_delivery else None
+        order.notes = notes
+        
+        db.session.commit()
+        audit.record('update', 'purchase_order', order.id, f'Edited purchase order {order.order_number}',
+                     changes=audit.diff(before, order))
+        
+        return jsonify({'success': True, 'message': 'Purchase order updated successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}) 
+    
+
+@bp.route('/manager/suppliers')
+@login_required
+def manage_sup():
+    """Supplier management - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        flash('Access denied. Manager access required.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    return render_template('manager/sup.html')
+
+#reports
+@bp.route('/manager/reports')
+@login_required
+@read_replica()
+def manage_reports():
+    """Enhanced Reports - manager only"""
+    if current_user.role not in ['admin', 'manager']:
+        flash('Access denied. Manager access required.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    # Stock and sales figures are for the store the manager is working at
+    store_id = stores.current_store_id()
+    stock = stores.stock_summary(store_id)
+    
+    # Basic inventory stats
+    total_products = Product.query.count()
+    total_categories = Category.query.count()
+    low_stock_count = stock['low_stock'] + stock['out_of_stock']
+    out_of_stock_count = stock['out_of_stock']
+    
+    # SALES ANALYTICS
+    from datetime import datetime, timedelta, date
+    
+    # Today's sales
+    today_sales = Sale.query.filter(Sale.store_id == store_id, db.func.date(Sale.sale_date) == date.today()).all()
+    today_total = sum(sale.total_amount for sale in today_sales)
+    today_count = len(today_sales)
+    
+    # Yesterday's sales for comparison
+    yesterday = date.today() - timedelta(days=1)
+    yesterday_sales = Sale.query.filter(Sale.store_id == store_id, db.func.date(Sale.sale_date) == yesterday).all()
+    yesterday_total = sum(sale.total_amount for sale in yesterday_sales) if yesterday_sales else 0
+    
+    # Weekly sales (last 7 days)
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    weekly_sales = Sale.query.filter(Sale.store_id == store_id, Sale.sale_date >= week_ago).all()
+    weekly_total = sum(sale.total_amount for sale in weekly_sales)
+    
+    # Monthly sales (current month)
+    start_of_month = date.today().replace(day=1)
+    monthly_sales = Sale.query.filter(Sale.store_id == store_id, Sale.sale_date >= start_of_month).all()
+    monthly_total = sum(sale.total_amount for sale in monthly_sales)
+    
+    # Top selling products (last 30 days)
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    top_products = db.session.query(
+        Product.name,
+        db.func.sum(SaleItem.quantity).label('total_sold'),
+        db.func.sum(SaleItem.subtotal).label('total_revenue')
+    ).join(SaleItem, Product.id == SaleItem.product_id)\
+     .join(Sale, SaleItem.sale_id == Sale.id)\
+     .filter(Sale.store_id == store_id, Sale.sale_date >= thirty_days_ago)\
+     .group_by(Product.id)\
+     .order_by(db.desc('total_sold'))\
+     .limit(10).all()
+    
+    # Sales by payment method
+    payment_methods = db.session.query(
+        Sale.payment_method,
+        db.func.count(Sale.id).label('count'),
+        db.func.sum(Sale.total_amount).label('total')
+    ).filter(Sale.store_id == store_id).group_by(Sale.payment_method).all()
+    
+    # Daily sales for the last 14 days (for charts)
+    daily_sales_data = {}
+    for i in range(14):
+        day = date.today() - timedelta(days=i)
+        day_sales = Sale.query.filter(Sale.store_id == store_id, db.func.date(Sale.sale_date) == day).all()
+        daily_sales_data[day.strftime('%Y-%m-%d')] = sum(sale.total_amount for sale in day_sales)
+    
+    # Sales growth calculation
+    sales_growth = 0
+    if yesterday_total > 0:
+        sales_growth = ((today_total - yesterday_total) / yesterday_total) * 100
+    
+    # Forecast demand (precomputed nightly by `flask forecast`)
+    forecast_products = db.session.query(
+        Product.name,
+        Product.quantity,
+        Forecast.next_7_days,
+        Forecast.next_28_days,
+        Forecast.as_of
+    ).join(Forecast, Forecast.product_id == Product.id)\
+     .filter(Product.is_active == True)\
+     .order_by(Forecast.next_7_days.desc())\
+     .limit(10).all()
+    forecast_as_of = max((row.as_of for row in forecast_products), default=None)
+    
+    return render_template('manager/reports.html',
+                         total_products=total_products,
+                         total_categories=total_categories,
+                         low_stock_count=low_stock_count,
+                         out_of_stock_count=out_of_stock_count,
+                         
+                         # Sales data
+                         today_total=today_total,
+                         today_count=today_count,
+                         yesterday_total=yesterday_total,
+                         weekly_total=weekly_total,
+                         monthly_total=monthly_total,
+                         sales_growth=sales_growth,
+                         top_products=top_products,
+                         payment_methods=payment_methods,
+                         daily_sales_data=daily_sales_data,
+                         forecast_products=forecast_products,
+                         forecast_as_of=forecast_as_of)
+
+
+# STORE ROUTES
+@bp.route('/stores')
+@login_required
+def list_stores():
+    """Stores the signed-in manager or admin can work at"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    current_id = stores.current_store_id()
+    return jsonify({
+        'success': True,
+        'current_store_id': current_id,
+        'stores': [{
+            'id': store.id,
+            'code': store.code,
+            'name': store.name,
+            'address': store.address,
+        } for store in stores.active_stores()]
+    })
+
+@bp.route('/stores/switch', methods=['POST'])
+@login_required
+def switch_store():
+    """Work at another store for the rest of this session"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        data = request.get_json(silent=True) or request.form
+        store = stores.switch_store(int(data.get('store_id') or 0))
+        return jsonify({'success': True, 'message': f'Now working at {store.name}'})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+
+@bp.route('/stores/report')
+@login_required
+def store_report():
+    """Sales and stock per store and for the whole chain, from the daily rollups"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        today = datetime.utcnow().date()
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else today
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') \
+            else end - timedelta(days=6)
+        if start > end:
+            return jsonify({'success': False, 'message': 'Start date must be before end date'}), 400
+        if (end - start).days > 366:
+            return jsonify({'success': False, 'message': 'Reports cover at most a year'}), 400
+        
+        return jsonify({'success': True, 'report': stores.consolidated_report(start, end)})
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/manager/suppliers/json')
+@login_required
+def manager_suppliers_data():
+    """Get suppliers data for manager - includes supplier products"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    def suppliers_data():
+        for supplier in Supplier.query.all():
+            # Get supplier's product catalog
+            supplier_products = db.session.query(SupplierProduct, Category.name)\
+                .outerjoin(Category, Category.id == SupplierProduct.category_id)\
+                .filter(SupplierProduct.supplier_id == supplier.id).all()
+            
+            yield {
+                'id': supplier.id,
+                'name': supplier.name,
+                'contact_person': supplier.contact_person,
+                'email': supplier.email,
+                'phone': supplier.phone,
+                'address': supplier.address,
+                'is_active': supplier.is_active,
+                'products': [{
+                    'id': product.id,
+                    'name': product.name,
+                    'sku': product.sku,
+                    'selling_price': float(product.price),  
+                    'price': float(product.price),          
+                    'quantity': 0,                          
+                    'reorder_level': 0,                     
+                    'description': product.description,
+                    'image_url': product.image_url,
+                    'unit': product.unit,
+                    'category': category_name or 'General'
+                } for product, category_name in supplier_products],
+                'products_count': len(supplier_products),
+                'last_product_added': max(p.created_at for p, _ in supplier_products).strftime('%Y-%m-%d') if supplier_products else None
+            }
+    
+    # Every supplier's full catalog: streamed one supplier at a time
+    return stream_array('suppliers', suppliers_data(), extra={'success': True})
+    
+
+@bp.route('/manager/suppliers/<int:supplier_id>/products')
+@login_required
+def get_supplier_catalog_products(supplier_id):
+    """Get products for a specific supplier"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.get_or_404(supplier_id)
+        
+        # Get supplier's catalog products
+        supplier_products = SupplierProduct.query.filter_by(supplier_id=supplier_id).all()
+        
+        products_data = []
+        for product in supplier_products:
+            products_data.append({
+                'id': product.id,
+                'name': product.name,
+                'sku': product.sku,
+                'price': float(product.price),
+                'unit': product.unit,
+                'description': product.description,
+                'category': product.category.name if product.category else 'General'
+            })
+        
+        return jsonify({
+            'success': True, 
+            'products': products_data,
+            'supplier_name': supplier.name
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})    
+
+
+@bp.route('/manager/catalog-matches')
+@login_required
+@read_replica()
+def catalog_matches_data():
+    """Supplier prices against our cost for matched catalog lines"""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        rows, next_cursor = catalog_matching.margin_page(
+            supplier_id=request.args.get('supplier_id', type=int),
+            flagged=request.args.get('flagged') in ('1', 'true'),
+            after=request.args.get('after', type=int),
+            limit=request.args.get('limit', 50)
+        )
+        return jsonify({
+            'success': True,
+            'matches': rows,
+            'next_cursor': next_cursor,
+            'alert_pct': current_app.config['MATCH_PRICE_ALERT_PCT']
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
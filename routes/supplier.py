@@ -0,0 +1,653 @@
+"""Supplier portal routes: purchase orders, catalog products and price lists."""
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from models import db, Category, Supplier, PurchaseOrder, SupplierProduct, Notification, PriceListImport
+from datetime import datetime
+import audit
+import catalog_matching
+import price_lists
+import receiving
+import supplier_portal
+import uuid
+import os
+from routes import order_items_html
+
+bp = Blueprint('supplier', __name__)
+
+
+@bp.route('/supplier/dashboard')
+@login_required
+def supplier_dashboard():
+    """Supplier dashboard - shows their product catalog WITH NOTIFICATIONS"""
+    if current_user.role != 'supplier':
+        flash('Access denied. Supplier only.', 'danger')
+        return redirect(url_for('auth.index'))
+    
+    # Get supplier info
+    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    
+    if not supplier:
+        flash('Supplier profile not found.', 'warning')
+        return render_template('supplier/supplier.html', supplier=None)
+    
+    # Stats from one grouped query; the Orders and Products tabs page in their rows as JSON
+    counts = supplier_portal.status_counts(supplier.id)
+    recent_orders, _ = supplier_portal.orders_page(supplier.id, limit=5)
+    recent_products, _ = supplier_portal.catalog_page(supplier.id, limit=5)
+    
+    # Get notifications for current supplier
+    notifications = Notification.query.filter_by(user_id=current_user.id)\
+        .order_by(Notification.created_at.desc())\
+        .limit(10).all()
+    
+    return render_template('supplier/supplier.html',
+                         supplier=supplier,
+                         recent_orders=recent_orders,
+                         recent_products=recent_products,
+                         total_orders=counts['total'],
+                         pending_orders=counts.get('pending', 0),
+                         delivered_orders=counts.get('delivered', 0),
+                         total_products=supplier_portal.catalog_size(supplier.id),
+                         notifications=notifications)  
+
+
+@bp.route('/supplier/orders')
+@login_required
+def supplier_orders_data():
+    """One page of the supplier's purchase orders, newest first"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    if not supplier:
+        return jsonify({'success': False, 'message': 'Supplier profile not found'})
+    
+    orders, next_cursor = supplier_portal.orders_page(
+        supplier.id,
+        status=request.args.get('status') or None,
+        before=request.args.get('before', type=int),
+        limit=request.args.get('limit', 20)
+    )
+    return jsonify({
+        'success': True,
+        'orders': [supplier_portal.order_to_dict(order) for order in orders],
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/supplier/orders/<int:order_id>/confirm', methods=['POST'])
+@login_required
+def supplier_confirm_order(order_id):
+    """Supplier confirms they can fulfill the order - FIXED VERSION"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        order = PurchaseOrder.query.filter_by(id=order_id, supplier_id=supplier.id).first()
+        if not order:
+            return jsonify({'success': False, 'message': 'Order not found'})
+        
+        
+        if order.status != 'pending':
+            return jsonify({'success': False, 'message': 'Order is not in pending status'})
+        
+        
+        order.status = 'approved'
+        
+        
+        notification = Notification(
+            user_id=order.created_by,  
+            title='Order Accepted by Supplier',
+            message=f'Supplier {supplier.name} has accepted purchase order #{order.order_number}',
+            type='success',
+            related_type='purchase_order',
+            related_id=order.id
+        )
+        db.session.add(notification)
+        
+        db.session.commit()
+        audit.record('update', 'purchase_order', order.id,
+                     f'{supplier.name} accepted purchase order {order.order_number}',
+                     changes={'status': ['pending', 'approved']})
+        
+        return jsonify({'success': True, 'message': 'Order confirmed successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+# @bp.route('/supplier/orders/<int:order_id>/decline', methods=['POST'])
+# @login_required
+# def supplier_decline_order(order_id):
+#     """Supplier declines the order - FIXED VERSION"""
+#     if current_user.role != 'supplier':
+#         return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+#     try:
+#         supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+#         if not supplier:
+#             return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+#         order = PurchaseOrder.query.filter_by(id=order_id, supplier_id=supplier.id).first()
+#         if not order:
+#             return jsonify({'success': False, 'message': 'Order not found'})
+        
+#         data = request.get_json()
+#         reason = data.get('reason', 'No reason provided')
+        
+#         # Update order status to cancelled
+#         order.status = 'cancelled'
+        
+#         # Create notification for manager
+#         notification = Notification(
+#             user_id=order.created_by,
+#             title='Order Declined by Supplier',
+#             message=f'Supplier {supplier.name} declined order {order.order_number}. Reason: {reason}',
+#             type='error',
+#             related_type='purchase_order',
+#             related_id=order.id
+#         )
+#         db.session.add(notification)
+        
+#         db.session.commit()
+        
+#         return jsonify({'success': True, 'message': 'Order declined successfully'})
+        
+#     except Exception as e:
+#         db.session.rollback()
+#         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/supplier/orders/<int:order_id>/update-status', methods=['POST'])
+@login_required
+def supplier_update_order_status(order_id):
+    """Supplier updates order status for shipping/delivery"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        order = PurchaseOrder.query.filter_by(id=order_id, supplier_id=supplier.id).first()
+        if not order:
+            return jsonify({'success': False, 'message': 'Order not found'})
+        
+        data = request.get_json()
+        new_status = data.get('status')
+        
+        # Validate status
+        valid_statuses = ['ordered', 'delivered']
+        if new_status not in valid_statuses:
+            return jsonify({'success': False, 'message': 'Invalid status'})
+        
+        # Update order status
+        old_status = order.status
+        if new_status == 'delivered' and old_status != 'delivered':
+            # Receive everything still outstanding into stock
+            receiving.receive_goods(order, current_user.id)
+        order.status = new_status
+        
+        # If delivered, update delivery date
+        if new_status == 'delivered':
+            order.delivery_date = datetime.utcnow()
+            
+        # Create notification for manager
+        status_messages = {
+            'ordered': f'Supplier {supplier.name} has shipped order {order.order_number}',
+            'delivered': f'Supplier {supplier.name} has delivered order {order.order_number}'
+        }
+        
+        notification = Notification(
+            user_id=order.created_by,
+            title=f'Order {new_status.title()} by Supplier',
+            message=status_messages.get(new_status, f'Order status updated to {new_status}'),
+            type='info',
+            related_type='purchase_order',
+            related_id=order.id
+        )
+        db.session.add(notification)
+        
+        db.session.commit()
+        audit.record('update', 'purchase_order', order.id,
+                     f'{supplier.name} marked purchase order {order.order_number} {new_status}',
+                     changes={'status': [old_status, new_status]})
+        
+        return jsonify({'success': True, 'message': f'Order status updated to {new_status}'})
+        
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/supplier/orders/<int:order_id>/details')
+@login_required
+def get_order_details(order_id):
+    """Get order details for supplier"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    order = PurchaseOrder.query.get_or_404(order_id)
+    
+    html = f"""
+    <div class="space-y-4">
+        <div class="grid grid-cols-2 gap-4">
+            <div><strong>Order Number:</strong> {order.order_number}</div>
+            <div><strong>Status:</strong> <span class="px-2 py-1 bg-blue-100 rounded">{order.status}</span></div>
+        </div>
+        
+        <div class="grid grid-cols-2 gap-4">
+            <div><strong>Supplier:</strong> {order.supplier.name}</div>
+            <div><strong>Contact:</strong> {order.supplier.email}</div>
+        </div>
+        
+        <div class="grid grid-cols-2 gap-4">
+            <div><strong>Order Date:</strong> {order.order_date.strftime('%b %d, %Y')}</div>
+            <div><strong>Expected Delivery:</strong> {order.expected_delivery.strftime('%b %d, %Y') if order.expected_delivery else 'Not set'}</div>
+        </div>
+        
+        <div class="grid grid-cols-2 gap-4">
+            <div><strong>Created By:</strong> {order.creator.username}</div>
+            <div><strong>Total Amount:</strong> <span class="text-green-600 font-bold">KES {order.total_amount:,.2f}</span></div>
+        </div>
+        
+        {order_items_html(order)}
+        
+        <div><strong>Notes:</strong><br>{order.notes or 'No special instructions'}</div>
+        
+        {f'<div><strong>Delivered On:</strong> {order.delivery_date.strftime("%b %d, %Y")}</div>' if order.delivery_date else ''}
+    </div>
+"""
+    
+    return jsonify({'success': True, 'html': html})
+
+# @bp.route('/supplier/orders/<int:order_id>/update-status', methods=['POST'])
+# @login_required
+# def supplier_update_order_status(order_id):
+#     """Supplier updates order status"""
+#     if current_user.role != 'supplier':
+#         return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+#     try:
+#         order = PurchaseOrder.query.get_or_404(order_id)
+#         data = request.get_json()
+#         new_status = data.get('status')
+        
+#         order.status = new_status
+#         db.session.commit()
+        
+#         return jsonify({'success': True, 'message': 'Status updated'})
+#     except Exception as e:
+#         db.session.rollback()
+#         return jsonify({'success': False, 'message': str(e)})
+
+# ====================
+# SUPPLIER PRODUCT ROUTES
+# ====================
+
+@bp.route('/supplier/products/add', methods=['POST'])
+@login_required
+def add_supplier_product():
+    """Add product to supplier's catalog"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        data = request.get_json()
+        
+        # Validation
+        if not data.get('name'):
+            return jsonify({'success': False, 'message': 'Product name is required'})
+        
+        if not data.get('sku'):
+            return jsonify({'success': False, 'message': 'SKU is required'})
+        
+        if not data.get('price'):
+            return jsonify({'success': False, 'message': 'Price is required'})
+        
+        if not data.get('category_id'):
+            return jsonify({'success': False, 'message': 'Category is required'})
+        
+        if SupplierProduct.query.filter_by(supplier_id=supplier.id, sku=data['sku']).first():
+            return jsonify({'success': False, 'message': f"You already have a product with SKU {data['sku']}"})
+        
+        # Create supplier product (separate from main inventory)
+        supplier_product = SupplierProduct(
+            name=data['name'],
+            sku=data['sku'],
+            description=data.get('description', ''),
+            price=float(data['price']),
+            category_id=int(data['category_id']),
+            supplier_id=supplier.id,
+            image_url=data.get('image_url'),
+            unit=data.get('unit', 'piece')
+        )
+        
+        db.session.add(supplier_product)
+        db.session.flush()
+        catalog_matching.rematch([supplier_product.id])
+        db.session.commit()
+        
+        return jsonify({
+            'success': True, 
+            'message': 'Product added to your catalog!',
+            'product': {
+                'id': supplier_product.id,
+                'name': supplier_product.name,
+                'price': supplier_product.price
+            }
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+
+@bp.route('/supplier/products/<int:product_id>/edit', methods=['POST'])
+@login_required
+def edit_supplier_product(product_id):
+    """Edit supplier product"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        # Get supplier profile
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        product = SupplierProduct.query.filter_by(id=product_id, supplier_id=supplier.id).first()
+        if not product:
+            return jsonify({'success': False, 'message': 'Product not found'})
+        
+        data = request.get_json()
+        
+        # Update product fields
+        if 'name' in data:
+            product.name = data['name']
+        if 'sku' in data:
+            # Check if SKU is taken by another of this supplier's products
+            existing_product = SupplierProduct.query.filter_by(supplier_id=supplier.id, sku=data['sku']).first()
+            if existing_product and existing_product.id != product_id:
+                return jsonify({'success': False, 'message': 'SKU already taken'})
+            product.sku = data['sku']
+        if 'description' in data:
+            product.description = data['description']
+        if 'price' in data:
+            product.price = float(data['price'])
+        if 'category_id' in data:
+            product.category_id = int(data['category_id'])
+        if 'unit' in data:
+            product.unit = data['unit']
+        if 'image_url' in data:
+            product.image_url = data['image_url']
+        
+        if 'name' in data or 'sku' in data:
+            db.session.flush()
+            catalog_matching.rematch([product.id])
+        
+        db.session.commit()
+        return jsonify({'success': True, 'message': 'Product updated successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+
+@bp.route('/supplier/products', methods=['GET'])
+@login_required
+def get_supplier_products():
+    """One page of the current supplier's catalog (?q=, ?after=<id>, ?limit=)"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'products': []})
+        
+        products, next_cursor = supplier_portal.catalog_page(
+            supplier.id,
+            search=request.args.get('q') or None,
+            after=request.args.get('after', type=int),
+            limit=request.args.get('limit', 24)
+        )
+        products_data = [supplier_portal.product_to_dict(product) for product in products]
+        
+        return jsonify({'success': True, 'products': products_data, 'next_cursor': next_cursor})
+    
+    except Exception as e:
+        print(f"Error fetching products: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)})
+    
+
+@bp.route('/supplier/price-list', methods=['POST'])
+@login_required
+def upload_price_list():
+    """Upload a CSV/JSON price list; it is imported in the background"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        # Either a multipart `file` field or the raw file as the request body
+        upload = request.files.get('file')
+        if upload:
+            filename, stream = upload.filename, upload.stream
+        else:
+            filename = request.args.get('filename') or ('price-list.json' if request.is_json else 'price-list.csv')
+            stream = request.stream
+        filename = os.path.basename(filename or 'price-list.csv')
+        if not filename.lower().endswith(('.csv', '.json', '.jsonl')):
+            return jsonify({'success': False, 'message': 'Price lists must be .csv, .json or .jsonl files'})
+        
+        path = os.path.join(price_lists.upload_folder(current_app), f'{uuid.uuid4().hex}-{filename}')
+        size = price_lists.save_upload(stream, path, current_app.config['PRICE_LIST_MAX_BYTES'])
+        
+        job = PriceListImport(
+            supplier_id=supplier.id,
+            created_by=current_user.id,
+            filename=filename,
+            path=path,
+            size_bytes=size
+        )
+        db.session.add(job)
+        db.session.commit()
+        price_lists.start_import(job.id)
+        
+        return jsonify({
+            'success': True,
+            'message': 'Price list uploaded, importing...',
+            'import': price_lists.import_to_dict(job)
+        }), 202
+        
+    except price_lists.PriceListError as e:
+        return jsonify({'success': False, 'message': str(e)})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+
+@bp.route('/supplier/price-list/<int:import_id>')
+@login_required
+def price_list_status(import_id):
+    """Progress and results of a price-list import"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+    job = PriceListImport.query.filter_by(id=import_id, supplier_id=supplier.id if supplier else None).first()
+    if not job:
+        return jsonify({'success': False, 'message': 'Import not found'}), 404
+    
+    # Its worker may have died with the process (restart, crash)
+    price_lists.expire_stale(job)
+    return jsonify({'success': True, 'import': price_lists.import_to_dict(job)})
+
+
+@bp.route('/supplier/products/<int:product_id>/delete', methods=['POST'])
+@login_required
+def delete_supplier_product(product_id):
+    """Delete supplier product"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        product = SupplierProduct.query.filter_by(id=product_id, supplier_id=supplier.id).first()
+        if not product:
+            return jsonify({'success': False, 'message': 'Product not found'})
+        
+        db.session.delete(product)
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': 'Product deleted successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+    
+
+@bp.route('/supplier/products/<int:product_id>')
+@login_required
+def get_supplier_product(product_id):
+    """Get single supplier product for editing"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        product = SupplierProduct.query.filter_by(id=product_id, supplier_id=supplier.id).first()
+        if not product:
+            return jsonify({'success': False, 'message': 'Product not found'})
+        
+        product_data = {
+            'id': product.id,
+            'name': product.name,
+            'sku': product.sku,
+            'description': product.description,
+            'price': float(product.price),
+            'category_id': product.category_id,
+            'image_url': product.image_url,
+            'unit': product.unit
+        }
+        
+        return jsonify({'success': True, 'product': product_data})
+    
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})   
+
+
+# @bp.route('/supplier/orders/<int:order_id>/confirm', methods=['POST'])
+# @login_required
+# def supplier_confirm_order(order_id):
+#     """Supplier confirms they can fulfill the order"""
+#     if current_user.role != 'supplier':
+#         return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+#     try:
+#         supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+#         if not supplier:
+#             return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+#         order = PurchaseOrder.query.filter_by(id=order_id, supplier_id=supplier.id).first()
+#         if not order:
+#             return jsonify({'success': False, 'message': 'Order not found'})
+        
+#         if order.status != 'approved':
+#             return jsonify({'success': False, 'message': 'Order must be approved first'})
+        
+#         # Update order status
+#         order.status = 'confirmed'
+        
+#         # Create notification for manager
+#         notification = Notification(
+#             user_id=order.created_by,  # Notify the manager who created the order
+#             title='Order Confirmed by Supplier',
+#             message=f'Supplier {supplier.name} has confirmed order {order.order_number}',
+#             type='success',
+#             related_type='purchase_order',
+#             related_id=order.id
+#         )
+#         db.session.add(notification)
+        
+#         db.session.commit()
+        
+#         return jsonify({'success': True, 'message': 'Order confirmed successfully'})
+        
+#     except Exception as e:
+#         db.session.rollback()
+#         return jsonify({'success': False, 'message': f'Error: {str(e)}'})
+
+@bp.route('/supplier/orders/<int:order_id>/decline', methods=['POST'])
+@login_required
+def supplier_decline_order(order_id):
+    """Supplier declines the order"""
+    if current_user.role != 'supplier':
+        return jsonify({'success': False, 'message': 'Access denied'}), 403
+    
+    try:
+        supplier = Supplier.query.filter_by(user_id=current_user.id).first()
+        if not supplier:
+            return jsonify({'success': False, 'message': 'Supplier profile not found'})
+        
+        order = PurchaseOrder.query.filter_by(id=order_id, supplier_id=supplier.id).first()
+        if not order:
+            return jsonify({'success': False, 'message': 'Order not found'})
+        
+        data = request.get_json()
+        reason = data.get('reason', 'No reason provided')
+        
+        # Update order status
+        old_status = order.status
+        order.status = 'cancelled'
+        
+        # Create notification for manager
+        notification = Notification(
+            user_id=order.created_by,
+            title='Order Declined by Supplier',
+            message=f'Supplier {supplier.name} declined order {order.order_number}. Reason: {reason}',
+            type='error',
+            related_type='purchase_order',
+            related_id=order.id
+        )
+        db.session.add(notification)
+        
+        db.session.commit()
+        audit.record('update', 'purchase_order', order.id,
+                     f'{supplier.name} declined purchase order {order.order_number}: {reason}',
+                     changes={'status': [old_status, 'cancelled']})
+        
+        return jsonify({'success': True, 'message': 'Order declined successfully'})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'})     
+
+@bp.route('/api/categories')
+@login_required
+def get_categories():
+    """Get all categories for product forms"""
+    categories = Category.query.all()
+    return jsonify({
+        'categories': [{'id': c.id, 'name': c.name} for c in categories]
+    })
@@ -0,0 +1,203 @@
+"""Cashier shifts and Z-reports.
+
+A cashier opens a shift with the float in the drawer, rings up sales
+and closes it at the end of the day. Each sale posts to the cashier's
+open shift in the sale's own transaction, adding to running totals:
+- sales_count, items_sold and total_amount on the shift
+- sale count and amount per payment method, in shift_payments
+- voids: carts cleared at the POS after items were rung up, and their
+  value
+
+Those are increments on one row each, so posting doesn't depend on how
+much the shift has sold. A sale from a cashier with no open shift opens
+one, so offline sales synced later and terminals that never open a shift
+keep working. Synced sales post to whichever shift is open when they
+arrive.
+
+Closing a shift copies its final totals into a z_reports row. Triggers
+keep that table append-only, as for audit_logs. The cashier dashboard,
+the close-out and the Z-report history read shifts and z_reports only,
+never the sales behind them.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from json_provider import dumps_bytes
+from models import db, Shift, ShiftPayment, User, ZReport
+
+REPORTS_PAGE_SIZE = 50
+
+
+def current(cashier_id):
+    """The cashier's open shift, or None"""
+    return Shift.query.filter(Shift.cashier_id == cashier_id, Shift.closed_at.is_(None)).first()
+
+
+def open_shift(cashier_id, store_id, opening_float=0):
+    """Open a shift. Raises ValueError if the cashier already has one open."""
+    if current(cashier_id) is not None:
+        raise ValueError('A shift is already open')
+    if opening_float < 0:
+        raise ValueError('Opening float cannot be negative')
+    shift = Shift(cashier_id=cashier_id, store_id=store_id, opening_float=opening_float, opened_at=datetime.utcnow())
+    db.session.add(shift)
+    db.session.flush()
+    return shift
+
+
+def _add(cashier_id, store_id, **increments):
+    """Add to the counters of the cashier's open shift, opening one if needed. Returns its id."""
+    add = update(Shift)\
+        .where(Shift.cashier_id == cashier_id, Shift.closed_at.is_(None))\
+        .values({name: getattr(Shift, name) + value for name, value in increments.items()})\
+        .returning(Shift.id)\
+        .execution_options(synchronize_session=False)
+    shift_id = db.session.execute(add).scalar()
+    if shift_id is None:
+        shift = Shift(cashier_id=cashier_id, store_id=store_id, opened_at=datetime.utcnow(), **increments)
+        try:
+            with db.session.begin_nested():
+                db.session.add(shift)
+        except IntegrityError:
+            # Another first sale opened the shift (ix_shifts_open_cashier) since; add to that one
+            shift_id = db.session.execute(add).scalar()
+        else:
+            shift_id = shift.id
+    return shift_id
+
+
+def record_sales(sales):
+    """Add flushed sales to their cashiers' open shifts"""
+    totals = {}
+    for sale in sales:
+        shift = totals.setdefault(sale.cashier_id, {
+            'store_id': sale.store_id, 'sales_count': 0, 'items_sold': 0, 'total_amount': 0.0,
+            'payments': defaultdict(lambda: [0, 0.0])
+        })
+        shift['sales_count'] += 1
+        shift['items_sold'] += sum(item.quantity for item in sale.items)
+        shift['total_amount'] += sale.total_amount
+        payment = shift['payments'][sale.payment_method or 'cash']
+        payment[0] += 1
+        payment[1] += sale.total_amount
+
+    for cashier_id, shift in totals.items():
+        shift_id = _add(cashier_id, shift['store_id'], sales_count=shift['sales_count'],
+                        items_sold=shift['items_sold'], total_amount=shift['total_amount'])
+        for method, (count, amount) in shift['payments'].items():
+            add = update(ShiftPayment)\
+                .where(ShiftPayment.shift_id == shift_id, ShiftPayment.payment_method == method)\
+                .values(sales_count=ShiftPayment.sales_count + count, amount=ShiftPayment.amount + amount)\
+                .execution_options(synchronize_session=False)
+            if db.session.execute(add).rowcount:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ShiftPayment(shift_id=shift_id, payment_method=method, sales_count=count,
+                                                amount=amount))
+            except IntegrityError:
+                # A concurrent sale took the shift's first payment by this method
+                db.session.execute(add)
+
+
+def record_void(cashier_id, store_id, amount):
+    """Count a cart cleared at the POS, worth `amount`, against the cashier's open shift"""
+    _add(cashier_id, store_id, void_count=1, void_amount=amount)
+
+
+def _expected_cash(opening_float, payments):
+    cash = sum(payment['amount'] for payment in payments if payment['payment_method'] == 'cash')
+    return round(opening_float + cash, 2)
+
+
+def summary(shift):
+    """A shift's running totals, as JSON-ready data"""
+    payments = [{'payment_method': p.payment_method, 'sales_count': p.sales_count, 'amount': round(p.amount, 2)}
+                for p in shift.payments]
+    return {
+        'id': shift.id,
+        'store_id': shift.store_id,
+        'opened_at': shift.opened_at.isoformat(),
+        'closed_at': shift.closed_at.isoformat() if shift.closed_at else None,
+        'opening_float': round(shift.opening_float, 2),
+        'sales_count': shift.sales_count,
+        'items_sold': shift.items_sold,
+        'total_amount': round(shift.total_amount, 2),
+        'void_count': shift.void_count,
+        'void_amount': round(shift.void_amount, 2),
+        'payments': payments,
+        'expected_cash': _expected_cash(shift.opening_float, payments),
+    }
+
+
+def close(cashier_id):
+    """Close the cashier's open shift and write its Z-report. Raises ValueError if none is open."""
+    shift = current(cashier_id)
+    if shift is None:
+        raise ValueError('No open shift')
+    # Sales posting from now on find no open shift and start a new one
+    closed = db.session.execute(
+        update(Shift).where(Shift.id == shift.id, Shift.closed_at.is_(None))
+        .values(closed_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not closed:
+        raise ValueError('No open shift')
+    # The row is locked by the update, so these are its final totals
+    db.session.refresh(shift)
+    totals = summary(shift)
+    report = ZReport(
+        shift_id=shift.id,
+        store_id=shift.store_id,
+        cashier_id=shift.cashier_id,
+        cashier_name=db.session.get(User, shift.cashier_id).username,
+        opened_at=shift.opened_at,
+        closed_at=shift.closed_at,
+        opening_float=totals['opening_float'],
+        sales_count=totals['sales_count'],
+        items_sold=totals['items_sold'],
+        total_amount=totals['total_amount'],
+        void_count=totals['void_count'],
+        void_amount=totals['void_amount'],
+        payments=dumps_bytes(totals['payments']).decode(),
+    )
+    db.session.add(report)
+    db.session.flush()
+    return report
+
+
+def report_data(report):
+    """A Z-report as JSON-ready data"""
+    payments = current_app.json.loads(report.payments)
+    return {
+        'z_number': report.id,
+        'shift_id': report.shift_id,
+        'store_id': report.store_id,
+        'cashier': report.cashier_name,
+        'opened_at': report.opened_at.isoformat(),
+        'closed_at': report.closed_at.isoformat(),
+        'opening_float': report.opening_float,
+        'sales_count': report.sales_count,
+        'items_sold': report.items_sold,
+        'total_amount': report.total_amount,
+        'void_count': report.void_count,
+        'void_amount': report.void_amount,
+        'payments': payments,
+        'expected_cash': _expected_cash(report.opening_float, payments),
+    }
+
+
+def reports(cashier_id=None, store_id=None, before=None, limit=REPORTS_PAGE_SIZE):
+    """Z-reports of one cashier or one store, newest first, `limit` at a time before Z number `before`"""
+    query = ZReport.query
+    if cashier_id is not None:
+        query = query.filter(ZReport.cashier_id == cashier_id)
+    if store_id is not None:
+        query = query.filter(ZReport.store_id == store_id)
+    if before:
+        query = query.filter(ZReport.id < before)
+    return query.order_by(ZReport.id.desc()).limit(limit).all()
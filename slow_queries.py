@@ -0,0 +1,170 @@
+"""Slow query log with captured query plans.
+
+Any statement slower than SLOW_QUERY_THRESHOLD_MS is recorded with its
+normalized SQL, the shape of its bound parameters, the route and the
+line of our code that issued it, and the database's plan for it
+(EXPLAIN QUERY PLAN on SQLite, EXPLAIN on Postgres). The last
+SLOW_QUERY_LOG_SIZE entries are kept in memory per worker and shown on
+/admin/slow-queries.
+
+Plans are captured once per normalized statement, so a hot slow query
+only pays for EXPLAIN the first time.
+"""
+import os
+import re
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+_PG_PARAM = re.compile(r'%\(\w+\)s|%s')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_lock = threading.Lock()
+_entries = deque(maxlen=200)
+_plans = {}
+_MAX_PLANS = 500
+
+
+def normalize_sql(statement):
+    """Collapse literals, placeholders and IN lists so equal queries match"""
+    sql = _PG_PARAM.sub('?', statement)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def parameter_shape(parameters, executemany):
+    """Types of the bound parameters, never their values"""
+    if executemany:
+        rows = list(parameters or [])
+        first = parameter_shape(rows[0], False) if rows else '()'
+        return f'{len(rows)} x {first}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in parameters.items()) + '}'
+    if parameters:
+        return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+    return '()'
+
+
+def _calling_frame():
+    """The innermost frame in our own code that isn't this module"""
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith('<'):
+            continue
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(ROOT) and filename != _THIS_FILE and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, ROOT)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+def _explain(cursor, statement, parameters, dialect):
+    """Run the dialect's EXPLAIN on a fresh DBAPI cursor (no engine events)"""
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        return None
+
+    # A failed statement aborts a Postgres transaction, so EXPLAIN inside a
+    # savepoint: the caller's transaction carries on whatever happens here
+    savepoint = dialect == 'postgresql' and not getattr(cursor.connection, 'autocommit', False)
+    explain_cursor = cursor.connection.cursor()
+    try:
+        if savepoint:
+            explain_cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            explain_cursor.execute(prefix + statement, parameters or ())
+            rows = explain_cursor.fetchall()
+        except Exception as e:
+            if savepoint:
+                explain_cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return f'(plan unavailable: {e})'
+        finally:
+            if savepoint:
+                explain_cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    except Exception as e:
+        return f'(plan unavailable: {e})'
+    finally:
+        explain_cursor.close()
+
+    if dialect == 'sqlite':
+        # (id, parent, notused, detail) - indent children under their parent
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node_id] + detail)
+        return '\n'.join(lines)
+    return '\n'.join(row[0] for row in rows)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['slow_query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info.get('slow_query_start', time.perf_counter())
+    if not has_app_context():
+        return
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 100)
+    if threshold is None or duration * 1000 < threshold:
+        return
+
+    normalized = normalize_sql(statement)
+    with _lock:
+        plan = _plans.get(normalized)
+    if plan is None and not executemany and statement.lstrip()[:6].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+        plan = _explain(cursor, statement, parameters, conn.dialect.name)
+        with _lock:
+            if len(_plans) >= _MAX_PLANS:
+                _plans.pop(next(iter(_plans)))
+            _plans[normalized] = plan
+
+    entry = {
+        'recorded_at': datetime.utcnow(),
+        'duration_ms': round(duration * 1000, 2),
+        'sql': normalized,
+        'parameters': parameter_shape(parameters, executemany),
+        'route': f'{request.method} {request.path} ({request.endpoint})' if has_request_context() else None,
+        'frame': _calling_frame(),
+        'plan': plan,
+    }
+    current_app.logger.warning('Slow query (%.1f ms) from %s: %s', entry['duration_ms'], entry['frame'], normalized)
+    with _lock:
+        _entries.appendleft(entry)
+
+
+def recent_slow_queries():
+    """Newest first"""
+    with _lock:
+        return list(_entries)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+        _plans.clear()
+
+
+def init_app(app):
+    global _entries
+    size = app.config.get('SLOW_QUERY_LOG_SIZE', 200)
+    if _entries.maxlen != size:
+        _entries = deque(_entries, maxlen=size)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
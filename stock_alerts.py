@@ -0,0 +1,108 @@
+"""Incremental low/out-of-stock tracking.
+
+`Product.stock_status` ('ok', 'low' or 'out') is kept in step with
+quantity and reorder_level so dashboards can read the low-stock set
+from an index instead of comparing two columns across the whole table.
+
+ORM changes are picked up automatically in before_flush (sales, stock
+adjustments, product edits, offline sync...). Set-based UPDATEs that
+bypass the ORM must call refresh_statuses() with the product ids they
+touched.
+
+When a product crosses into 'low' or 'out', every active manager gets
+one notification. A second one isn't sent while the first is unread.
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models import db, Product, Notification, User
+
+LOW_STOCK_STATUSES = ('low', 'out')
+
+
+def stock_status(quantity, reorder_level):
+    quantity = quantity or 0
+    if quantity <= 0:
+        return 'out'
+    if quantity <= (reorder_level if reorder_level is not None else 10):
+        return 'low'
+    return 'ok'
+
+
+def _notify_managers(session, product_id, name, status):
+    if status == 'out':
+        title, kind = f'Out of stock: {name}', 'error'
+        message = f'{name} is out of stock.'
+    else:
+        title, kind = f'Low stock: {name}', 'warning'
+        message = f'{name} is at or below its reorder level.'
+
+    with session.no_autoflush:
+        manager_ids = [row.id for row in session.query(User.id).filter_by(role='manager', is_active=True)]
+        already_told = {row.user_id for row in session.query(Notification.user_id).filter(
+            Notification.related_type == 'product',
+            Notification.related_id == product_id,
+            Notification.title == title,
+            Notification.is_read == False
+        )}
+
+    for user_id in manager_ids:
+        if user_id not in already_told:
+            session.add(Notification(
+                user_id=user_id,
+                title=title,
+                message=message,
+                type=kind,
+                related_type='product',
+                related_id=product_id
+            ))
+
+
+def _crossed(old, new):
+    """Worse than before: ok -> low/out or low -> out"""
+    rank = {'ok': 0, 'low': 1, 'out': 2}
+    return rank[new] > rank.get(old, 0)
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_stock_status(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Product):
+            continue
+        state = inspect(obj)
+        if not state.pending and not (state.attrs.quantity.history.has_changes()
+                                      or state.attrs.reorder_level.history.has_changes()):
+            continue
+        new_status = stock_status(obj.quantity, obj.reorder_level)
+        old_status = obj.stock_status
+        if new_status == old_status:
+            continue
+        obj.stock_status = new_status
+        # New products just get their status; existing ones announce the crossing
+        if not state.pending and _crossed(old_status, new_status):
+            _notify_managers(session, obj.id, obj.name, new_status)
+
+
+def refresh_statuses(product_ids):
+    """Recompute stock_status after a set-based quantity UPDATE.
+
+    Runs in the current db.session transaction; the caller commits.
+    """
+    if not product_ids:
+        return
+    rows = db.session.query(
+        Product.id, Product.name, Product.quantity, Product.reorder_level, Product.stock_status
+    ).filter(Product.id.in_(list(product_ids))).all()
+
+    changes = {}
+    for row in rows:
+        new_status = stock_status(row.quantity, row.reorder_level)
+        if new_status != row.stock_status:
+            changes.setdefault(new_status, []).append(row.id)
+            if _crossed(row.stock_status, new_status):
+                _notify_managers(db.session, row.id, row.name, new_status)
+
+    for status, ids in changes.items():
+        Product.query.filter(Product.id.in_(ids)).update(
+            {'stock_status': status}, synchronize_session='fetch'
+        )
@@ -0,0 +1,295 @@
+"""Branches: per-store stock, store-scoped queries and cross-store rollups.
+
+Every sale, stock movement and purchase order belongs to a store, and
+each store has its own StoreStock rows. Product.quantity stays as the
+total across stores. That keeps chain-wide features such as
+replenishment, forecasting and the stock_alerts.py notifications
+working. Stock changes go through adjust() or receive(), so the store
+row and the total always move together.
+
+Store-facing screens (POS, stock adjustment, the manager dashboard and
+reports) read only their own store's rows. They go through indexes that
+lead with store_id (sales, stock_movements, store_stock), so a query
+touches one branch's data however many branches there are.
+
+Cross-store reporting never scans every branch's raw sales at once.
+store_daily_sales holds one row per store per day. rollup() builds it
+one store at a time, nightly via `flask rollup-stores`. The report only
+reads: days a store hasn't rolled up yet (today, or days a missed
+nightly run left behind) come from one query of that store's raw
+sales. A sale synced late, for a day that is already rolled up, is
+added to that day's row as it is posted.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+import click
+from flask import session
+from flask_login import current_user
+from sqlalchemy import case, event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from models import db, MAIN_STORE_ID, Product, Sale, SaleItem, Store, StoreDailySales, StoreStock
+from stock_alerts import stock_status
+
+SESSION_KEY = 'store_id'
+
+
+def current_store_id():
+    """The store the signed-in user is working at"""
+    if not current_user.is_authenticated:
+        return MAIN_STORE_ID
+    # Admins and managers can look at another branch for this session
+    if current_user.role in ('admin', 'manager') and session.get(SESSION_KEY):
+        return session[SESSION_KEY]
+    return current_user.store_id or MAIN_STORE_ID
+
+
+def switch_store(store_id):
+    store = db.session.get(Store, store_id)
+    if store is None or not store.is_active:
+        raise ValueError('Store not found')
+    session[SESSION_KEY] = store.id
+    return store
+
+
+def active_stores():
+    return Store.query.filter_by(is_active=True).order_by(Store.id).all()
+
+
+def stock_rows(store_id, product_ids):
+    """{product_id: StoreStock} at one store, for ORM updates"""
+    if not product_ids:
+        return {}
+    return {row.product_id: row for row in StoreStock.query.filter(
+        StoreStock.store_id == store_id, StoreStock.product_id.in_(list(product_ids))
+    )}
+
+
+def on_hand(store_id, product_ids=None):
+    """{product_id: quantity} at one store (every product it stocks if product_ids is None)"""
+    query = db.session.query(StoreStock.product_id, StoreStock.quantity).filter(StoreStock.store_id == store_id)
+    if product_ids is not None:
+        if not product_ids:
+            return {}
+        query = query.filter(StoreStock.product_id.in_(list(product_ids)))
+    return dict(query)
+
+
+def adjust(store_id, product, delta, rows=None):
+    """Move a product's stock at one store, and the chain total, by `delta` units.
+
+    `rows` is an optional stock_rows() dict shared by several calls;
+    rows created here are added to it.
+    """
+    row = rows.get(product.id) if rows is not None else db.session.get(StoreStock, (store_id, product.id))
+    if row is None:
+        row = StoreStock(store_id=store_id, product_id=product.id, quantity=0)
+        db.session.add(row)
+        if rows is not None:
+            rows[product.id] = row
+    row.quantity += delta
+    product.quantity = (product.quantity or 0) + delta
+    return row
+
+
+def receive(store_id, received):
+    """Add {product_id: units} to one store's stock with set-based statements.
+
+    Product.quantity is left to the caller (receiving.py updates it in
+    the same way). Runs in the current transaction.
+    """
+    if not received:
+        return
+    stocked = {product_id for (product_id,) in db.session.query(StoreStock.product_id).filter(
+        StoreStock.store_id == store_id, StoreStock.product_id.in_(list(received))
+    )}
+    now = datetime.utcnow()
+    missing = [{'store_id': store_id, 'product_id': product_id, 'quantity': 0, 'stock_status': 'out', 'updated_at': now}
+               for product_id in received if product_id not in stocked]
+    if missing:
+        db.session.execute(insert(StoreStock.__table__), missing)
+    StoreStock.query.filter(StoreStock.store_id == store_id, StoreStock.product_id.in_(list(received))).update(
+        {'quantity': StoreStock.quantity + case(received, value=StoreStock.product_id, else_=0)},
+        synchronize_session='fetch'
+    )
+    refresh_statuses(received.keys(), store_id)
+
+
+def refresh_statuses(product_ids, store_id=None):
+    """Recompute StoreStock.stock_status after a set-based change (all stores unless store_id is given)"""
+    if not product_ids:
+        return
+    reorder_level = select(Product.reorder_level).where(Product.id == StoreStock.product_id).scalar_subquery()
+    query = StoreStock.query.filter(StoreStock.product_id.in_(list(product_ids)))
+    if store_id is not None:
+        query = query.filter(StoreStock.store_id == store_id)
+    query.update({'stock_status': case(
+        (StoreStock.quantity <= 0, 'out'),
+        (StoreStock.quantity <= db.func.coalesce(reorder_level, 10), 'low'),
+        else_='ok'
+    )}, synchronize_session='fetch')
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_store_status(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, StoreStock):
+            continue
+        state = inspect(obj)
+        if state.pending or state.attrs.quantity.history.has_changes():
+            with session.no_autoflush:
+                product = obj.product or session.get(Product, obj.product_id)
+            obj.stock_status = stock_status(obj.quantity, product.reorder_level if product else None)
+
+
+def _as_date(value):
+    # func.date() gives a string on SQLite and a date on Postgres
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def sales_by_day(store_id, start, end):
+    """{day: [sales_count, items_sold, revenue]} for one store, from its raw sales"""
+    scope = (
+        Sale.store_id == store_id,
+        Sale.sale_date >= datetime.combine(start, time.min),
+        Sale.sale_date < datetime.combine(end + timedelta(days=1), time.min),
+    )
+    day = db.func.date(Sale.sale_date)
+    days = {}
+    for value, count, revenue in db.session.query(day, db.func.count(Sale.id), db.func.sum(Sale.total_amount))\
+            .filter(*scope).group_by(day):
+        days[_as_date(value)] = [count, 0, float(revenue or 0)]
+    for value, items in db.session.query(day, db.func.sum(SaleItem.quantity))\
+            .join(SaleItem, SaleItem.sale_id == Sale.id).filter(*scope).group_by(day):
+        days.setdefault(_as_date(value), [0, 0, 0.0])[1] = int(items or 0)
+    return days
+
+
+def rollup(store, through):
+    """Roll one store's sales up to and including `through`. Returns the number of days written."""
+    if store.rolled_up_through:
+        start = store.rolled_up_through + timedelta(days=1)
+    else:
+        first = db.session.query(db.func.min(Sale.sale_date)).filter(Sale.store_id == store.id).scalar()
+        start = first.date() if first else through + timedelta(days=1)
+    if start <= through:
+        days = sales_by_day(store.id, start, through)
+        StoreDailySales.query.filter(
+            StoreDailySales.store_id == store.id, StoreDailySales.day >= start, StoreDailySales.day <= through
+        ).delete(synchronize_session=False)
+        if days:
+            db.session.execute(insert(StoreDailySales.__table__), [{
+                'store_id': store.id, 'day': day, 'sales_count': count, 'items_sold': items, 'revenue': revenue
+            } for day, (count, items, revenue) in days.items()])
+    else:
+        days = {}
+    store.rolled_up_through = max(store.rolled_up_through or through, through)
+    return len(days)
+
+
+def ensure_rollups(through=None):
+    """Bring every store's rollup up to `through` (default: yesterday). Commits per store."""
+    through = through or datetime.utcnow().date() - timedelta(days=1)
+    written = 0
+    for store in Store.query.order_by(Store.id).all():
+        if store.rolled_up_through is None or store.rolled_up_through < through:
+            written += rollup(store, through)
+            db.session.commit()
+    return written
+
+
+def record_late_sales(sales):
+    """Add flushed sales dated on already rolled-up days to their rollup rows"""
+    rolled = dict(db.session.query(Store.id, Store.rolled_up_through).filter(
+        Store.id.in_({sale.store_id for sale in sales}), Store.rolled_up_through.isnot(None)
+    )) if sales else {}
+    for sale in sales:
+        day = sale.sale_date.date()
+        if sale.store_id not in rolled or day > rolled[sale.store_id]:
+            continue
+        items = sum(item.quantity for item in sale.items)
+        updated = db.session.execute(
+            update(StoreDailySales)
+            .where(StoreDailySales.store_id == sale.store_id, StoreDailySales.day == day)
+            .values(sales_count=StoreDailySales.sales_count + 1,
+                    items_sold=StoreDailySales.items_sold + items,
+                    revenue=StoreDailySales.revenue + sale.total_amount)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            db.session.add(StoreDailySales(store_id=sale.store_id, day=day, sales_count=1,
+                                           items_sold=items, revenue=sale.total_amount))
+
+
+def stock_summary(store_id):
+    """Stock value and low/out counts at one store"""
+    products, value, low, out = db.session.query(
+        db.func.count(StoreStock.product_id),
+        db.func.coalesce(db.func.sum(StoreStock.quantity * Product.cost_price), 0),
+        db.func.coalesce(db.func.sum(case((StoreStock.stock_status == 'low', 1), else_=0)), 0),
+        db.func.coalesce(db.func.sum(case((StoreStock.stock_status == 'out', 1), else_=0)), 0),
+    ).join(Product, Product.id == StoreStock.product_id).filter(StoreStock.store_id == store_id).one()
+    return {'products': products, 'stock_value': round(float(value), 2), 'low_stock': int(low), 'out_of_stock': int(out)}
+
+
+def consolidated_report(start, end):
+    """Sales per store and across the chain for start..end (dates, inclusive), plus stock per store.
+
+    Read-only: rolled-up days come from store_daily_sales, later ones from raw sales.
+    """
+    last = min(end, datetime.utcnow().date())
+
+    stores = Store.query.order_by(Store.id).all()
+    per_store = {store.id: {'store_id': store.id, 'code': store.code, 'name': store.name, 'is_active': store.is_active,
+                            'sales_count': 0, 'items_sold': 0, 'revenue': 0.0} for store in stores}
+    daily = defaultdict(float)
+
+    def add(store_id, day, count, items, revenue):
+        totals = per_store[store_id]
+        totals['sales_count'] += count
+        totals['items_sold'] += items
+        totals['revenue'] += revenue
+        daily[day] += revenue
+
+    rolled = {store.id: store.rolled_up_through for store in stores}
+    for row in StoreDailySales.query.filter(StoreDailySales.day >= start, StoreDailySales.day <= last):
+        if rolled[row.store_id] and row.day <= rolled[row.store_id]:
+            add(row.store_id, row.day, row.sales_count, row.items_sold, row.revenue)
+    for store in stores:
+        unrolled = max(start, rolled[store.id] + timedelta(days=1)) if rolled[store.id] else start
+        if unrolled <= last:
+            for day, (count, items, revenue) in sales_by_day(store.id, unrolled, last).items():
+                add(store.id, day, count, items, revenue)
+
+    for store in stores:
+        per_store[store.id].update(stock_summary(store.id))
+        per_store[store.id]['revenue'] = round(per_store[store.id]['revenue'], 2)
+
+    rows = list(per_store.values())
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'stores': rows,
+        'totals': {
+            field: sum(row[field] for row in rows)
+            for field in ('sales_count', 'items_sold', 'revenue', 'stock_value', 'low_stock', 'out_of_stock')
+        },
+        'daily': [{'day': day.isoformat(), 'revenue': round(revenue, 2)} for day, revenue in sorted(daily.items())],
+    }
+
+
+def init_app(app):
+    @app.context_processor
+    def inject_store():
+        if not current_user.is_authenticated or current_user.role not in ('admin', 'manager', 'cashier'):
+            return {}
+        return {'current_store': db.session.get(Store, current_store_id())}
+
+    @app.cli.command('rollup-stores')
+    @click.option('--through', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Last day to roll up (default: yesterday).')
+    def rollup_stores_command(through):
+        """Roll each store's sales up into store_daily_sales."""
+        written = ensure_rollups(through.date() if through else None)
+        click.echo(f'Rolled up {written} store-days')
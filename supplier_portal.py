@@ -0,0 +1,100 @@
+"""Data layer for the supplier portal.
+
+The dashboard used to load every purchase order and catalog line for a
+supplier and count statuses in Python. Large distributors have
+thousands of both, so instead:
+
+- status counts come from one GROUP BY query
+- orders and catalog lines are served a page at a time as JSON, with
+  keyset pagination on id (`before` for orders, newest first; `after`
+  for the catalog, oldest first) so deep pages cost the same as the first
+- the dashboard only renders a few recent rows; the Orders and Products
+  tabs load their pages when first opened
+"""
+from models import db, PurchaseOrder, SupplierProduct
+
+# Drafts aren't sent to the supplier until a manager moves them to pending
+HIDDEN_STATUSES = ('draft',)
+MAX_PAGE_SIZE = 100
+
+
+def status_counts(supplier_id):
+    """{status: count} for the supplier's orders, plus 'total'"""
+    rows = db.session.query(PurchaseOrder.status, db.func.count(PurchaseOrder.id)).filter(
+        PurchaseOrder.supplier_id == supplier_id,
+        PurchaseOrder.status.notin_(HIDDEN_STATUSES)
+    ).group_by(PurchaseOrder.status).all()
+    counts = {status: count for status, count in rows}
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def catalog_size(supplier_id):
+    return db.session.query(db.func.count(SupplierProduct.id)).filter(
+        SupplierProduct.supplier_id == supplier_id
+    ).scalar()
+
+
+def _page_size(limit, default):
+    try:
+        return max(1, min(int(limit), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def orders_page(supplier_id, status=None, before=None, limit=20):
+    """One page of orders, newest first. Returns (orders, next_before)."""
+    limit = _page_size(limit, 20)
+    query = PurchaseOrder.query.filter(
+        PurchaseOrder.supplier_id == supplier_id,
+        PurchaseOrder.status.notin_(HIDDEN_STATUSES)
+    )
+    if status:
+        query = query.filter(PurchaseOrder.status == status)
+    if before:
+        query = query.filter(PurchaseOrder.id < before)
+    orders = query.order_by(PurchaseOrder.id.desc()).limit(limit + 1).all()
+    next_cursor = orders[limit - 1].id if len(orders) > limit else None
+    return orders[:limit], next_cursor
+
+
+def catalog_page(supplier_id, search=None, after=None, limit=24):
+    """One page of catalog lines in the order they were added. Returns (products, next_after)."""
+    limit = _page_size(limit, 24)
+    query = SupplierProduct.query.options(db.joinedload(SupplierProduct.category)).filter(
+        SupplierProduct.supplier_id == supplier_id
+    )
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(db.or_(SupplierProduct.name.ilike(pattern), SupplierProduct.sku.ilike(pattern)))
+    if after:
+        query = query.filter(SupplierProduct.id > after)
+    products = query.order_by(SupplierProduct.id).limit(limit + 1).all()
+    next_cursor = products[limit - 1].id if len(products) > limit else None
+    return products[:limit], next_cursor
+
+
+def order_to_dict(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'status': order.status,
+        'order_date': order.order_date.isoformat() if order.order_date else None,
+        'expected_delivery': order.expected_delivery.isoformat() if order.expected_delivery else None,
+        'total_amount': float(order.total_amount),
+        'notes': order.notes,
+    }
+
+
+def product_to_dict(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'sku': product.sku,
+        'description': product.description,
+        'price': float(product.price),
+        'category_id': product.category_id,
+        'category': product.category.name if product.category else 'General',
+        'image_url': product.image_url,
+        'unit': product.unit
+    }
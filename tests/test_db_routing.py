@@ -0,0 +1,76 @@
+"""Read replica routing with two SQLite files (db_routing.py)"""
+import os
+import sys
+import time
+
+import pytest
+from flask import Flask
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def app(tmp_path):
+    import db_routing
+    from models import db, Category
+
+    # Just the database; importing config or app would fix the main app's DATABASE_URL
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI=f'sqlite:///{tmp_path / "primary.db"}',
+                      REPLICA_DATABASE_URI=f'sqlite:///{tmp_path / "replica.db"}', REPLICA_MAX_LAG_SECONDS=300,
+                      REPLICA_LAG_CHECK_INTERVAL=0)
+    shared = db_routing.REPLICA_BIND in db.metadatas
+    db_routing.init_app(app, db)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Category(name='Replicated'))
+        db.session.commit()
+        db_routing.refresh_sqlite_replica(db.engine, db.engines[db_routing.REPLICA_BIND])
+        # Only on the primary, so a read shows which database answered it
+        db.session.add(Category(name='Primary only'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    if not shared:
+        # db is shared with the main app, whose create_all() would look for a replica bind
+        del db.metadatas[db_routing.REPLICA_BIND]
+
+
+def _names():
+    from models import Category
+    return {category.name for category in Category.query.all()}
+
+
+def test_reads_in_read_replica_go_to_the_replica(app):
+    from db_routing import read_replica
+    with app.app_context():
+        assert _names() == {'Replicated', 'Primary only'}
+        with read_replica():
+            assert _names() == {'Replicated'}
+
+
+def test_reads_after_a_flush_stay_on_the_primary(app):
+    from db_routing import read_replica
+    from models import db, Category
+    with app.app_context():
+        with read_replica():
+            db.session.add(Category(name='Unsaved'))
+            db.session.flush()
+            # The session sees its own uncommitted row, not the replica
+            assert _names() == {'Replicated', 'Primary only', 'Unsaved'}
+            db.session.rollback()
+            assert _names() == {'Replicated'}
+
+
+def test_lagging_replica_falls_back_to_the_primary(app):
+    from db_routing import read_replica
+    replica = app.config['REPLICA_DATABASE_URI'][len('sqlite:///'):]
+    stale = time.time() - app.config['REPLICA_MAX_LAG_SECONDS'] - 60
+    os.utime(replica, (stale, stale))
+    with app.app_context():
+        with read_replica():
+            assert _names() == {'Replicated', 'Primary only'}
@@ -0,0 +1,181 @@
+"""Idempotency-Key claims under concurrent retries (idempotency.py)"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+THREADS = 8
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + str(tmp_path_factory.mktemp('db') / 'test.db')
+    from app import app, init_db
+    from models import db, Product, StoreStock, MAIN_STORE_ID
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, IDEMPOTENCY_WAIT_SECONDS=30)
+    init_db()
+    with app.app_context():
+        product = Product(name='Kettle', sku='KET-1', cost_price=10, selling_price=15, quantity=10,
+                          reorder_level=1, category_id=1, supplier_id=1)
+        db.session.add(product)
+        db.session.flush()
+        db.session.add(StoreStock(store_id=MAIN_STORE_ID, product_id=product.id, quantity=10))
+        db.session.commit()
+    return app
+
+
+def _client(app):
+    client = app.test_client()
+    assert client.post('/login', data={'username': 'cashier', 'password': 'cashier123'}).status_code == 302
+    return client
+
+
+def _stock():
+    from models import db, Product, Sale, StoreStock, MAIN_STORE_ID
+    product = Product.query.filter_by(sku='KET-1').one()
+    db.session.refresh(product)
+    return Sale.query.count(), db.session.get(StoreStock, (MAIN_STORE_ID, product.id)).quantity, product.quantity
+
+
+def _sale(app):
+    from models import Product
+    with app.app_context():
+        product_id = Product.query.filter_by(sku='KET-1').one().id
+    return {'items': [{'id': product_id, 'price': 15.0, 'quantity': 2}], 'payment_method': 'cash'}
+
+
+def test_concurrent_retries_run_the_sale_once(app):
+    clients = [_client(app) for _ in range(THREADS)]
+    sale = _sale(app)
+    with app.app_context():
+        sales, store_qty, total_qty = _stock()
+
+    barrier = threading.Barrier(THREADS)
+    responses = [None] * THREADS
+
+    def post(i):
+        barrier.wait()
+        responses[i] = clients[i].post('/cashier/process-sale', json=sale, headers={'Idempotency-Key': 'retry-1'})
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(r.status_code == 200 and r.get_json()['success'] for r in responses)
+    replayed = [r for r in responses if r.headers.get('Idempotent-Replayed') == 'true']
+    assert len(replayed) == THREADS - 1
+    assert len({r.get_json()['sale']['id'] for r in responses}) == 1
+    with app.app_context():
+        assert _stock() == (sales + 1, store_qty - 2, total_qty - 2)
+
+
+def test_expired_lease_is_taken_over(app):
+    from models import db, IdempotencyKey, User
+    sale = _sale(app)
+    now = datetime.utcnow()
+    with app.app_context():
+        cashier = User.query.filter_by(username='cashier').one()
+        # A worker died holding these keys: one lease has run out, one hasn't
+        for key, locked_until in (('stale', now - timedelta(seconds=1)), ('live', now + timedelta(minutes=5))):
+            db.session.add(IdempotencyKey(user_id=cashier.id, key=key, endpoint='cashier.process_sale',
+                                          request_hash='x' * 64, created_at=now, expires_at=now + timedelta(hours=1),
+                                          locked_until=locked_until))
+        db.session.commit()
+        sales, store_qty, total_qty = _stock()
+
+    client = _client(app)
+    response = client.post('/cashier/process-sale', json=sale, headers={'Idempotency-Key': 'stale'})
+    assert response.get_json()['success'] and 'Idempotent-Replayed' not in response.headers
+    replay = client.post('/cashier/process-sale', json=sale, headers={'Idempotency-Key': 'stale'})
+    assert replay.headers.get('Idempotent-Replayed') == 'true'
+
+    app.config['IDEMPOTENCY_WAIT_SECONDS'] = 0.2
+    try:
+        held = client.post('/cashier/process-sale', json=sale, headers={'Idempotency-Key': 'live'})
+    finally:
+        app.config['IDEMPOTENCY_WAIT_SECONDS'] = 30
+    assert held.status_code == 409
+    with app.app_context():
+        assert _stock() == (sales + 1, store_qty - 2, total_qty - 2)
+
+
+def _slow_requests(app, key, delays, view_seconds):
+    """POST to a slow idempotent view with `key`, one thread per delay. Returns (responses, calls)."""
+    from flask import jsonify
+    from flask_login import login_user
+    from idempotency import idempotent
+    from models import User
+
+    calls = []
+
+    @idempotent
+    def slow():
+        calls.append(len(calls) + 1)
+        time.sleep(view_seconds)
+        return jsonify({'success': True, 'call': len(calls)})
+
+    responses = [None] * len(delays)
+
+    def post(i):
+        time.sleep(delays[i])
+        # process-sale's URL, for request.endpoint
+        with app.test_request_context('/cashier/process-sale', method='POST', json={},
+                                      headers={'Idempotency-Key': key}):
+            login_user(User.query.filter_by(username='cashier').one())
+            responses[i] = slow()
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(len(delays))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses, calls
+
+
+def test_long_request_keeps_its_lease(app):
+    app.config['IDEMPOTENCY_LEASE_SECONDS'] = 0.3
+    try:
+        # The retry arrives well after the first lease would have run out
+        responses, calls = _slow_requests(app, 'slow-1', (0, 0.6), view_seconds=1)
+    finally:
+        app.config['IDEMPOTENCY_LEASE_SECONDS'] = 30
+    assert calls == [1]
+    assert responses[1].headers.get('Idempotent-Replayed') == 'true'
+    assert responses[1].get_json()['call'] == 1
+
+
+def test_stalled_holder_cannot_complete_a_taken_over_key(app, monkeypatch):
+    import idempotency
+    from models import db, IdempotencyKey
+
+    # The first worker stalls: its renewals never reach the database
+    renew = idempotency._renew
+    stalled = []
+
+    def stalled_renew(user_id, key, lease, locked_until):
+        if not stalled:
+            stalled.append(threading.current_thread())
+        if threading.current_thread() is stalled[0]:
+            return True
+        return renew(user_id, key, lease, locked_until)
+
+    monkeypatch.setattr(idempotency, '_renew', stalled_renew)
+    app.config['IDEMPOTENCY_LEASE_SECONDS'] = 0.3
+    try:
+        responses, calls = _slow_requests(app, 'slow-2', (0, 0.5), view_seconds=1)
+    finally:
+        app.config['IDEMPOTENCY_LEASE_SECONDS'] = 30
+
+    # The retry took the expired claim over; the first worker's late completion is fenced off
+    assert calls == [1, 2]
+    with app.app_context():
+        row = db.session.query(IdempotencyKey).filter_by(key='slow-2').one()
+        assert row.response_status == 200 and '"call":2' in row.response_body.replace(' ', '')
@@ -0,0 +1,55 @@
+"""Price-list import counters across chunk boundaries (price_lists.py)"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + str(tmp_path_factory.mktemp('db') / 'test.db')
+    from app import app, init_db
+    from models import db, SupplierProduct
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    init_db()
+    with app.app_context():
+        db.session.add(SupplierProduct(supplier_id=1, sku='PL-KEEP', name='Kept', price=1.0, category_id=1))
+        db.session.commit()
+    return app
+
+
+def test_duplicates_split_across_chunks_are_counted_once(app, tmp_path):
+    from models import db, PriceListImport, SupplierProduct, User
+    from price_lists import run_import
+
+    # Chunks of two: [A, KEEP] [A, C] [C, KEEP]
+    path = tmp_path / 'prices.csv'
+    path.write_text('sku,name,price,category\n'
+                    'PL-A,Apple,1,1\n'
+                    'PL-KEEP,Kept,2,1\n'
+                    'PL-A,Apple,3,1\n'
+                    'PL-C,Corn,4,1\n'
+                    'PL-C,Corn,5,1\n'
+                    'PL-KEEP,Kept,6,1\n')
+    app.config['PRICE_LIST_CHUNK_SIZE'] = 2
+    try:
+        with app.app_context():
+            job = PriceListImport(supplier_id=1, created_by=User.query.filter_by(username='admin').one().id,
+                                  filename='prices.csv', path=str(path), size_bytes=path.stat().st_size)
+            db.session.add(job)
+            db.session.commit()
+            job = run_import(job.id)
+
+            assert job.status == 'done'
+            assert (job.processed_rows, job.added, job.changed, job.unchanged, job.duplicates, job.failed) == \
+                (6, 2, 1, 0, 3, 0)
+            assert job.added + job.changed + job.unchanged + job.duplicates + job.failed == job.processed_rows
+            # The last line for each SKU wins
+            prices = dict(db.session.query(SupplierProduct.sku, SupplierProduct.price)
+                          .filter(SupplierProduct.sku.like('PL-%')))
+            assert prices == {'PL-A': 3.0, 'PL-C': 5.0, 'PL-KEEP': 6.0}
+    finally:
+        app.config['PRICE_LIST_CHUNK_SIZE'] = 500